@@ -1,6 +1,21 @@
 import os
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ChatApp.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AI_Powered_Insurance_App.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+from llm.client import warm_up_on_server_start
+from users.middleware import JWTAuthMiddleware
+from generalchat.routing import websocket_urlpatterns as generalchat_websocket_urlpatterns
+from premiumchat.routing import websocket_urlpatterns as premiumchat_websocket_urlpatterns
+
+application = ProtocolTypeRouter({
+    "http": django_asgi_app,
+    "websocket": JWTAuthMiddleware(
+        URLRouter(generalchat_websocket_urlpatterns + premiumchat_websocket_urlpatterns)
+    ),
+})
+
+warm_up_on_server_start()
@@ -0,0 +1,145 @@
+"""
+Request-scoped deadlines for outbound calls.
+
+DeadlineMiddleware gives every request a time budget from REQUEST_DEADLINES,
+picked by the `deadline_class` attribute of the view class ("default" when
+unset). Code that calls another service wraps the call in `outbound()`,
+which hands it a timeout no longer than the time left and records how long
+each dependency took; the totals go out in the Server-Timing header.
+Outside a request (Celery, websockets, streamed bodies) there is no
+deadline and callers get their own cap.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(APIException):
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    default_detail = "The request ran out of time."
+
+    def __init__(self, dependency):
+        super().__init__({"error": self.default_detail, "dependency": dependency})
+
+
+class DependencyUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "An upstream service did not respond in time."
+
+    def __init__(self, dependency):
+        super().__init__({"error": self.default_detail, "dependency": dependency})
+
+
+class Deadline:
+    def __init__(self, budget):
+        self.started = time.monotonic()
+        self.budget = budget
+        self.spent = {}
+
+    @property
+    def expires_at(self):
+        return self.started + self.budget
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def spend(self, dependency, seconds):
+        self.spent[dependency] = self.spent.get(dependency, 0) + seconds
+
+    def server_timing(self):
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spent.items())
+
+
+def current():
+    return _current.get()
+
+
+def remaining():
+    """Seconds left for the current request, or None outside one."""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def timeout(dependency, cap):
+    """
+    `cap` cut to what is left of the request deadline. Raises DeadlineExceeded
+    when less than DEADLINE_MIN_TIMEOUT is left, instead of starting a call
+    that cannot finish.
+    """
+    left = remaining()
+    if left is None:
+        return cap
+    if left < settings.DEADLINE_MIN_TIMEOUT:
+        raise DeadlineExceeded(dependency)
+    return min(cap, left) if cap else left
+
+
+@contextmanager
+def outbound(dependency, cap, timeout_errors=()):
+    """
+    Time a call to `dependency`, yielding the timeout it should use.
+    `timeout_errors` raised inside become DeadlineExceeded if the request is
+    out of time, else DependencyUnavailable.
+    """
+    seconds = timeout(dependency, cap)
+    started = time.monotonic()
+    try:
+        yield seconds
+    except timeout_errors as e:
+        left = remaining()
+        logger.warning("%s call failed after %.2fs: %s", dependency, time.monotonic() - started, e)
+        if left is not None and left < settings.DEADLINE_MIN_TIMEOUT:
+            raise DeadlineExceeded(dependency) from e
+        raise DependencyUnavailable(dependency) from e
+    finally:
+        deadline = _current.get()
+        if deadline is not None:
+            deadline.spend(dependency, time.monotonic() - started)
+
+
+class DeadlineMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _current.set(Deadline(settings.REQUEST_DEADLINES["default"]))
+        try:
+            return self.finish(request, self.get_response(request))
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        token = _current.set(Deadline(settings.REQUEST_DEADLINES["default"]))
+        try:
+            return self.finish(request, await self.get_response(request))
+        finally:
+            _current.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = getattr(getattr(view_func, "cls", None), "deadline_class", "default")
+        _current.get().budget = settings.REQUEST_DEADLINES.get(name, settings.REQUEST_DEADLINES["default"])
+
+    def finish(self, request, response):
+        deadline = _current.get()
+        if deadline.spent:
+            response["Server-Timing"] = deadline.server_timing()
+            if deadline.remaining() < 0:
+                logger.warning("%s %s overran its deadline: %s", request.method, request.path, deadline.server_timing())
+        return response
@@ -33,6 +33,9 @@ INSTALLED_APPS = [
     'case',
     'payments',
     'notification',
+    'llm',
+    'search',
+    'archive',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
@@ -40,6 +43,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'AI_Powered_Insurance_App.deadlines.DeadlineMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -68,6 +72,20 @@ TEMPLATES = [
 ASGI_APPLICATION = 'AI_Powered_Insurance_App.asgi.application'
 WSGI_APPLICATION = 'AI_Powered_Insurance_App.wsgi.application'
 
+CHANNEL_REDIS_URL = os.environ.get('CHANNEL_REDIS_URL')
+
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [CHANNEL_REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+    }
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -128,9 +146,135 @@ EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+EMAIL_TIMEOUT = float(os.environ.get('EMAIL_TIMEOUT', 10))
+
+# Time budget per request, chosen by a view's `deadline_class`; every
+# outbound call gets at most what is left (see deadlines.outbound).
+REQUEST_DEADLINES = {
+    'default': float(os.environ.get('REQUEST_DEADLINE', 30)),
+    'auth': float(os.environ.get('REQUEST_DEADLINE_AUTH', 15)),
+    'payments': float(os.environ.get('REQUEST_DEADLINE_PAYMENTS', 20)),
+    'chat': float(os.environ.get('REQUEST_DEADLINE_CHAT', 90)),
+}
+DEADLINE_MIN_TIMEOUT = float(os.environ.get('DEADLINE_MIN_TIMEOUT', 0.5))
+GOOGLE_AUTH_TIMEOUT = float(os.environ.get('GOOGLE_AUTH_TIMEOUT', 5))
+GOOGLE_PLAY_TIMEOUT = float(os.environ.get('GOOGLE_PLAY_TIMEOUT', 10))
 
 GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
 
+LLM_MODEL = os.environ.get('LLM_MODEL', 'llama-3.1-8b-instant')
+LLM_MODEL_STRONG = os.environ.get('LLM_MODEL_STRONG', 'llama-3.3-70b-versatile')
+# Chat prompts go to the route with the highest min_score their routing
+# score reaches (see llm.router); failed attempts move to the fallback model.
+LLM_ROUTING = os.environ.get('LLM_ROUTING', 'True') == 'True'
+LLM_ROUTES = {
+    'fast': {'model': LLM_MODEL, 'min_score': 0},
+    'strong': {'model': LLM_MODEL_STRONG, 'min_score': int(os.environ.get('LLM_ROUTE_STRONG_MIN_SCORE', 4))},
+}
+LLM_MODEL_FALLBACKS = {LLM_MODEL_STRONG: LLM_MODEL}
+if os.environ.get('LLM_MODEL_FALLBACK'):
+    LLM_MODEL_FALLBACKS[LLM_MODEL] = os.environ['LLM_MODEL_FALLBACK']
+LLM_BACKEND = {
+    'BACKEND': 'llm.backends.OpenAICompatibleBackend',
+    'URL': os.environ.get('LLM_API_URL', 'https://api.groq.com/openai/v1/chat/completions'),
+    'API_KEY': GROQ_API_KEY,
+}
+LLM_ATTEMPT_TIMEOUT = float(os.environ.get('LLM_ATTEMPT_TIMEOUT', 30))
+LLM_MAX_ATTEMPTS = int(os.environ.get('LLM_MAX_ATTEMPTS', 3))
+LLM_RETRY_BACKOFF = float(os.environ.get('LLM_RETRY_BACKOFF', 0.25))
+LLM_RETRY_BACKOFF_MAX = float(os.environ.get('LLM_RETRY_BACKOFF_MAX', 4))
+LLM_BREAKER_THRESHOLD = int(os.environ.get('LLM_BREAKER_THRESHOLD', 5))
+LLM_BREAKER_RESET_TIMEOUT = float(os.environ.get('LLM_BREAKER_RESET_TIMEOUT', 30))
+
+# Admission budgets are per process: give each worker its share of the
+# provider quota. Setting either rate to 0 disables admission control.
+LLM_RATE_LIMIT_RPM = int(os.environ.get('LLM_RATE_LIMIT_RPM', 300))
+LLM_RATE_LIMIT_TPM = int(os.environ.get('LLM_RATE_LIMIT_TPM', 250000))
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.environ.get('LLM_EXPECTED_COMPLETION_TOKENS', 512))
+LLM_QUEUE_LIMITS = {
+    'premium': int(os.environ.get('LLM_QUEUE_LIMIT_PREMIUM', 200)),
+    'general': int(os.environ.get('LLM_QUEUE_LIMIT_GENERAL', 100)),
+    'background': int(os.environ.get('LLM_QUEUE_LIMIT_BACKGROUND', 20)),
+}
+LLM_QUEUE_MAX_WAIT = float(os.environ.get('LLM_QUEUE_MAX_WAIT', 10))
+
+# Per-user quotas over a rolling LLM_QUOTA_PERIOD, by tier (subscribed users
+# or not); 0 means unlimited. Counters live in Redis when a URL is set.
+LLM_QUOTA_PERIOD = int(os.environ.get('LLM_QUOTA_PERIOD', 60 * 60 * 24))
+LLM_QUOTAS = {
+    'free': {
+        'messages': int(os.environ.get('LLM_QUOTA_FREE_MESSAGES', 100)),
+        'tokens': int(os.environ.get('LLM_QUOTA_FREE_TOKENS', 200000)),
+    },
+    'subscribed': {
+        'messages': int(os.environ.get('LLM_QUOTA_SUBSCRIBED_MESSAGES', 1000)),
+        'tokens': int(os.environ.get('LLM_QUOTA_SUBSCRIBED_TOKENS', 2000000)),
+    },
+}
+LLM_QUOTA_REDIS_URL = os.environ.get('LLM_QUOTA_REDIS_URL')
+
+# Hedged completions for send_message: once a request has been waiting for
+# the LLM_HEDGE_PERCENTILE latency of recent ones, a second is sent (to
+# LLM_HEDGE_MODEL if set). Each request earns LLM_HEDGE_BUDGET hedges, so
+# at most about that fraction of extra calls are made.
+LLM_HEDGE_ENABLED = os.environ.get('LLM_HEDGE_ENABLED', 'False') == 'True'
+LLM_HEDGE_PERCENTILE = float(os.environ.get('LLM_HEDGE_PERCENTILE', 95))
+LLM_HEDGE_BUDGET = float(os.environ.get('LLM_HEDGE_BUDGET', 0.05))
+LLM_HEDGE_BURST = float(os.environ.get('LLM_HEDGE_BURST', 5))
+LLM_HEDGE_MIN_DELAY = float(os.environ.get('LLM_HEDGE_MIN_DELAY', 0.5))
+LLM_HEDGE_WINDOW = int(os.environ.get('LLM_HEDGE_WINDOW', 500))
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get('LLM_HEDGE_MIN_SAMPLES', 50))
+LLM_HEDGE_MODEL = os.environ.get('LLM_HEDGE_MODEL') or None
+
+# Identical sends to a room (same text, or same Idempotency-Key header when the
+# client sends one) share one turn while it runs and for GRACE seconds after.
+LLM_SINGLEFLIGHT_REDIS_URL = os.environ.get('LLM_SINGLEFLIGHT_REDIS_URL')
+LLM_SINGLEFLIGHT_LOCK_TTL = float(os.environ.get('LLM_SINGLEFLIGHT_LOCK_TTL', 120))
+LLM_SINGLEFLIGHT_GRACE = float(os.environ.get('LLM_SINGLEFLIGHT_GRACE', 5))
+
+LLM_HTTP_TIMEOUT = float(os.environ.get('LLM_HTTP_TIMEOUT', 60))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.environ.get('LLM_HTTP_CONNECT_TIMEOUT', 5))
+LLM_HTTP_MAX_CONNECTIONS = int(os.environ.get('LLM_HTTP_MAX_CONNECTIONS', 100))
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS', 20))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get('LLM_HTTP_KEEPALIVE_EXPIRY', 120))
+LLM_PREWARM_URL = os.environ.get('LLM_PREWARM_URL', 'https://api.groq.com/openai/v1/models')
+
+LLM_HISTORY_TOKEN_BUDGET = int(os.environ.get('LLM_HISTORY_TOKEN_BUDGET', 3000))
+LLM_HISTORY_MAX_MESSAGES = int(os.environ.get('LLM_HISTORY_MAX_MESSAGES', 50))
+LLM_SUMMARY_BATCH = int(os.environ.get('LLM_SUMMARY_BATCH', 10))
+
+# Premium chat retrieval over case details, case files and earlier turns.
+LLM_RETRIEVAL_TOP_K = int(os.environ.get('LLM_RETRIEVAL_TOP_K', 4))
+LLM_RETRIEVAL_TOKEN_BUDGET = int(os.environ.get('LLM_RETRIEVAL_TOKEN_BUDGET', 800))
+LLM_RETRIEVAL_MAX_FILE_BYTES = int(os.environ.get('LLM_RETRIEVAL_MAX_FILE_BYTES', 2 * 1024 * 1024))
+
+# Messages older than this move from the hot tables into compressed archive
+# blobs; the newest CHAT_ARCHIVE_KEEP_RECENT per room always stay hot.
+CHAT_ARCHIVE_AFTER_DAYS = int(os.environ.get('CHAT_ARCHIVE_AFTER_DAYS', 180))
+CHAT_ARCHIVE_KEEP_RECENT = int(os.environ.get('CHAT_ARCHIVE_KEEP_RECENT', 100))
+CHAT_ARCHIVE_BATCH = int(os.environ.get('CHAT_ARCHIVE_BATCH', 500))
+
+# Resumable case file uploads are assembled here before they move into
+# MEDIA_ROOT; every web worker must see the same directory, ideally on the
+# same filesystem as MEDIA_ROOT so finishing an upload is a rename.
+CASE_UPLOAD_TEMP_DIR = os.environ.get('CASE_UPLOAD_TEMP_DIR', os.path.join(BASE_DIR, 'case_uploads'))
+CASE_UPLOAD_CHUNK_SIZE = int(os.environ.get('CASE_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+CASE_UPLOAD_MAX_BYTES = int(os.environ.get('CASE_UPLOAD_MAX_BYTES', 100 * 1024 * 1024))
+CASE_UPLOAD_TTL = int(os.environ.get('CASE_UPLOAD_TTL', 60 * 60 * 24))
+
+# General chat messages whose TF-IDF similarity to an active FAQEntry
+# question reaches this are answered with the stored answer, without the LLM.
+FAQ_MATCH_THRESHOLD = float(os.environ.get('FAQ_MATCH_THRESHOLD', 0.8))
+FAQ_INDEX_TTL = float(os.environ.get('FAQ_INDEX_TTL', 300))
+
+# General chat replies are cached by system prompt and normalized user
+# message. Only replies to a room's first message are stored; later messages
+# read the cache unless they refer back to the conversation ("what about
+# that?"), see llm.cache.standalone.
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 2048))
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 60 * 60 * 24))
+LLM_CACHE_REDIS_URL = os.environ.get('LLM_CACHE_REDIS_URL')
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 firebase_credentials_path = os.environ.get(
@@ -148,6 +292,31 @@ CELERY_BEAT_SCHEDULE = {
         "task": "notifications.tasks.send_monthly_notification",
         "schedule": 60 * 60 * 24 * 30,  # roughly every 30 days
     },
+    "rollup-llm-usage": {
+        "task": "llm.tasks.rollup_usage",
+        "schedule": 60 * 15,
+    },
+    "prune-llm-quota-counters": {
+        "task": "llm.tasks.prune_quota_counters",
+        "schedule": 60 * 60 * 24,
+    },
+    "archive-chat-messages": {
+        "task": "archive.tasks.archive_messages",
+        "schedule": 60 * 60 * 24,
+    },
+    "purge-expired-case-uploads": {
+        "task": "case.tasks.purge_expired_uploads",
+        "schedule": 60 * 60,
+    },
+}
+
+# Background chat replies run on their own queue so that worker pool can be
+# sized independently: celery -A notification worker -Q llm
+LLM_JOB_QUEUE = os.environ.get('LLM_JOB_QUEUE', 'llm')
+LLM_JOB_PUSH = os.environ.get('LLM_JOB_PUSH', 'True') == 'True'
+CELERY_TASK_ROUTES = {
+    "generalchat.tasks.complete_reply_job": {"queue": LLM_JOB_QUEUE},
+    "premiumchat.tasks.complete_reply_job": {"queue": LLM_JOB_QUEUE},
 }
 
 print("ALLOWED_HOSTS =", ALLOWED_HOSTS)
@@ -15,6 +15,8 @@ urlpatterns = [
     path('api/generalchats/', include('generalchat.urls')),
     path('api/premiumchats/', include('premiumchat.urls')),
     path('api/payments/', include('payments.urls')),
+    path('api/llm/', include('llm.urls')),
+    path('api/search/', include('search.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
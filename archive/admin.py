@@ -0,0 +1,4 @@
+from django.contrib import admin
+from .models import MessageArchive
+
+admin.site.register(MessageArchive)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from archive.store import SOURCES, archive_old_messages
+
+
+class Command(BaseCommand):
+    help = "Move chat messages older than --days into compressed per-room archive blobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("apps", nargs="*", choices=sorted(SOURCES))
+        parser.add_argument("--days", type=int, default=settings.CHAT_ARCHIVE_AFTER_DAYS)
+
+    def handle(self, *args, **options):
+        for app_label in options["apps"] or sorted(SOURCES):
+            moved = archive_old_messages(app_label, options["days"])
+            self.stdout.write(f"{app_label}: archived {moved} messages")
@@ -0,0 +1,26 @@
+from django.db import models
+
+class MessageArchive(models.Model):
+    """
+    Gzip-compressed NDJSON blob holding a contiguous run of one room's oldest
+    messages, moved out of the hot message table.
+    """
+    app_label = models.CharField(max_length=50)
+    room_id = models.PositiveBigIntegerField()
+    first_id = models.PositiveBigIntegerField()
+    last_id = models.PositiveBigIntegerField()
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+    message_count = models.PositiveIntegerField()
+    raw_size = models.PositiveIntegerField()
+    codec = models.CharField(max_length=10, default="gzip")
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["app_label", "room_id", "last_id"], name="archive_room_last_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.app_label} room {self.room_id}: {self.first_id}-{self.last_id}"
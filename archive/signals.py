@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from case.models import Case
+from generalchat.models import ChatRoom
+from search import index as search_index
+from .models import MessageArchive
+from .store import decode
+
+def drop_archives(app_label, room_id):
+    # Archived messages keep their search entries, which the message table's
+    # delete trigger can no longer reach.
+    archives = MessageArchive.objects.filter(app_label=app_label, room_id=room_id)
+    for archive in archives.iterator():
+        search_index.remove(app_label, [row[0] for row in decode(archive)])
+    archives.delete()
+
+@receiver(post_delete, sender=ChatRoom)
+def drop_chatroom_archives(sender, instance, **kwargs):
+    drop_archives("generalchat", instance.pk)
+
+@receiver(post_delete, sender=Case)
+def drop_case_archives(sender, instance, **kwargs):
+    drop_archives("premiumchat", instance.pk)
@@ -0,0 +1,194 @@
+"""
+Tiered storage for chat messages. A room's oldest messages are moved out
+of the hot table into compressed MessageArchive blobs. Only an id prefix
+is ever archived, so every archived id of a room sits below every hot id.
+That lets readers treat "archive, then hot table" as one id-ordered
+sequence.
+"""
+import gzip
+import json
+from itertools import islice
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.encoders import JSONEncoder
+from case.models import Case
+from generalchat.models import ChatRoom, Message
+from premiumchat.models import PremiumMessage
+from search import index as search_index
+from .models import MessageArchive
+
+# app_label -> (message model, room model, room owner field)
+SOURCES = {
+    "generalchat": (Message, ChatRoom, "owner_id"),
+    "premiumchat": (PremiumMessage, Case, "user_id"),
+}
+
+ROW_FIELDS = ("id", "room_id", "sender", "content", "timestamp")
+
+
+def encode(rows):
+    encoder = JSONEncoder(ensure_ascii=False)
+    raw = "".join(encoder.encode([id, sender, content, timestamp]) + "\n" for id, _, sender, content, timestamp in rows)
+    raw = raw.encode()
+    return gzip.compress(raw), len(raw)
+
+
+def decode(archive):
+    """Rows of one blob as (id, room_id, sender, content, timestamp) tuples, oldest first."""
+    for line in gzip.decompress(archive.data).decode().splitlines():
+        id, sender, content, timestamp = json.loads(line)
+        yield id, archive.room_id, sender, content, parse_datetime(timestamp)
+
+
+def archive_room(app_label, room_id, cutoff, batch_size=None):
+    """Move the room's messages from before `cutoff` into archive blobs; returns how many moved."""
+    model, room_model, owner_field = SOURCES[app_label]
+    batch_size = batch_size or settings.CHAT_ARCHIVE_BATCH
+    hot = model.objects.filter(room_id=room_id)
+    # Stop at the first message newer than the cutoff, and always leave the
+    # latest CHAT_ARCHIVE_KEEP_RECENT hot so prompt history never needs the archive.
+    boundary = hot.order_by("-id").values_list("id", flat=True)[settings.CHAT_ARCHIVE_KEEP_RECENT - 1:].first()
+    if boundary is None:
+        return 0
+    newer = hot.filter(timestamp__gte=cutoff).order_by("id").values_list("id", flat=True).first()
+    if newer is not None:
+        boundary = min(boundary, newer)
+    hot = hot.filter(id__lt=boundary)
+    owner_id = room_model.objects.filter(pk=room_id).values_list(owner_field, flat=True).get()
+
+    moved = 0
+    while True:
+        rows = list(hot.order_by("id").values_list(*ROW_FIELDS)[:batch_size])
+        if not rows:
+            return moved
+        data, raw_size = encode(rows)
+        with transaction.atomic():
+            MessageArchive.objects.create(
+                app_label=app_label,
+                room_id=room_id,
+                first_id=rows[0][0],
+                last_id=rows[-1][0],
+                first_at=rows[0][4],
+                last_at=rows[-1][4],
+                message_count=len(rows),
+                raw_size=raw_size,
+                data=data,
+            )
+            # Plain SQL so no delete signals run: the messages are moved, not
+            # deleted, and keep their retrieval chunks. The FTS trigger does
+            # fire, so the search entries are put back right after.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {model._meta.db_table} WHERE room_id = %s AND id BETWEEN %s AND %s",
+                    [room_id, rows[0][0], rows[-1][0]]
+                )
+            search_index.add(app_label, owner_id, rows)
+        moved += len(rows)
+
+
+def archive_old_messages(app_label, days=None):
+    """Archive every room of `app_label` whose oldest hot message is older than `days`."""
+    model, room_model, _ = SOURCES[app_label]
+    cutoff = timezone.now() - timedelta(days=days or settings.CHAT_ARCHIVE_AFTER_DAYS)
+    moved = 0
+    for room_id in room_model.objects.values_list("pk", flat=True).iterator():
+        # The (room, id) index makes this a single index probe per room.
+        oldest = model.objects.filter(room_id=room_id).order_by("id").values_list("timestamp", flat=True).first()
+        if oldest is not None and oldest < cutoff:
+            moved += archive_room(app_label, room_id, cutoff)
+    return moved
+
+
+def _archives(app_label, room_ids, before, after, descending):
+    archives = MessageArchive.objects.filter(app_label=app_label)
+    if room_ids is not None:
+        archives = archives.filter(room_id__in=room_ids)
+    if before is not None:
+        archives = archives.filter(first_id__lt=before)
+    if after is not None:
+        archives = archives.filter(last_id__gt=after)
+    order = ("room_id", "-last_id") if descending else ("room_id", "last_id")
+    return archives.order_by(*order)
+
+
+def _blob_rows(archive, before, after, descending):
+    rows = decode(archive)
+    for row in reversed(list(rows)) if descending else rows:
+        if (before is None or row[0] < before) and (after is None or row[0] > after):
+            yield row
+
+
+def archived_rows(app_label, room_ids=None, before=None, after=None, descending=False):
+    """
+    Archived rows in id order, decompressing one blob at a time. `before` and
+    `after` are exclusive id bounds.
+    """
+    for archive in _archives(app_label, room_ids, before, after, descending).iterator(chunk_size=20):
+        yield from _blob_rows(archive, before, after, descending)
+
+
+async def aarchived_rows(app_label, room_ids=None, before=None, after=None, descending=False):
+    """Async variant of archived_rows, for streamed responses."""
+    async for archive in _archives(app_label, room_ids, before, after, descending).aiterator(chunk_size=20):
+        for row in _blob_rows(archive, before, after, descending):
+            yield row
+
+
+def to_message(app_label, row):
+    model = SOURCES[app_label][0]
+    return model(**dict(zip(ROW_FIELDS, row)))
+
+
+class ArchivedHistory:
+    """
+    Stand-in for a room's message queryset in CursorPagination (ordering by
+    id only). Once the hot rows run out, it continues into the room's archive.
+    """
+
+    def __init__(self, queryset, app_label, room_id, descending=True, before=None, after=None):
+        self.queryset = queryset
+        self.app_label = app_label
+        self.room_id = room_id
+        self.descending = descending
+        self.before = before
+        self.after = after
+
+    def _clone(self, **changes):
+        state = dict(vars(self), **changes)
+        return ArchivedHistory(**state)
+
+    def order_by(self, *fields):
+        return self._clone(descending=fields[0].startswith("-"))
+
+    def filter(self, id__lt=None, id__gt=None):
+        # Cursor positions arrive as strings.
+        return self._clone(
+            before=int(id__lt) if id__lt is not None else None,
+            after=int(id__gt) if id__gt is not None else None,
+        )
+
+    def __getitem__(self, item):
+        limit = item.stop
+        hot = self.queryset.order_by("-id" if self.descending else "id")
+        if self.before is not None:
+            hot = hot.filter(id__lt=self.before)
+        if self.after is not None:
+            hot = hot.filter(id__gt=self.after)
+        archived = (
+            to_message(self.app_label, row)
+            for row in archived_rows(self.app_label, [self.room_id], self.before, self.after, self.descending)
+        )
+
+        # Archived ids all sit below hot ones: newest-first reads the hot
+        # table first, oldest-first reads the archive first.
+        if self.descending:
+            results = list(hot[:limit])
+            results += islice(archived, limit - len(results))
+        else:
+            results = list(islice(archived, limit))
+            if len(results) < limit:
+                results += hot[:limit - len(results)]
+        return results[item.start or 0:]
@@ -0,0 +1,6 @@
+from celery import shared_task
+from .store import SOURCES, archive_old_messages
+
+@shared_task
+def archive_messages():
+    return {app_label: archive_old_messages(app_label) for app_label in SOURCES}
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from generalchat.models import ChatRoom, Message
+from search.query import search_messages
+from users.models import CustomUser
+from .models import MessageArchive
+from .store import aarchived_rows, archive_room, archived_rows
+
+
+class ArchivedRowsTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email="archive@example.com", name="Archive", password="x")
+        self.room = ChatRoom.objects.create(owner=user)
+        Message.objects.add_messages([Message(room=self.room, sender="user", content=f"m{i}") for i in range(12)])
+        self.ids = list(Message.objects.order_by("id").values_list("id", flat=True))
+        with self.settings(CHAT_ARCHIVE_KEEP_RECENT=2):
+            archive_room("generalchat", self.room.pk, timezone.now() + timedelta(days=1), batch_size=4)
+
+    def test_rows_span_blobs_in_id_order(self):
+        rows = list(archived_rows("generalchat", [self.room.pk]))
+        self.assertEqual([row[0] for row in rows], self.ids[:10])
+        self.assertEqual(rows[0][2:4], ("user", "m0"))
+
+    def test_bounds_and_descending(self):
+        rows = archived_rows("generalchat", [self.room.pk], before=self.ids[7], after=self.ids[2], descending=True)
+        self.assertEqual([row[0] for row in rows], self.ids[3:7][::-1])
+
+    async def test_async_variant_matches(self):
+        rows = [row async for row in aarchived_rows("generalchat", [self.room.pk], after=self.ids[4])]
+        self.assertEqual([row[0] for row in rows], self.ids[5:10])
+
+
+class ArchiveRoomTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="cold@example.com", name="Cold", password="x")
+        self.room = ChatRoom.objects.create(owner=self.user)
+        Message.objects.add_messages([Message(room=self.room, sender="user", content=f"note {i}") for i in range(12)])
+        self.ids = list(self.room.messages.order_by("id").values_list("id", flat=True))
+
+    def archive(self, cutoff=None, keep=3, batch_size=4):
+        with self.settings(CHAT_ARCHIVE_KEEP_RECENT=keep):
+            return archive_room("generalchat", self.room.pk, cutoff or timezone.now() + timedelta(days=1), batch_size)
+
+    def test_keeps_the_latest_messages_hot_and_batches_blobs(self):
+        self.assertEqual(self.archive(), 9)
+        self.assertEqual(list(self.room.messages.values_list("id", flat=True)), self.ids[9:])
+        blobs = MessageArchive.objects.filter(room_id=self.room.pk).order_by("first_id")
+        self.assertEqual([b.message_count for b in blobs], [4, 4, 1])
+        self.assertEqual((blobs[0].first_id, blobs[2].last_id), (self.ids[0], self.ids[8]))
+        self.assertEqual(self.archive(), 0)
+
+    def test_stops_at_the_first_message_after_the_cutoff(self):
+        cutoff = timezone.now() - timedelta(days=1)
+        self.room.messages.filter(id__lt=self.ids[5]).update(timestamp=cutoff - timedelta(days=1))
+        self.assertEqual(self.archive(cutoff), 5)
+        self.assertEqual(self.room.messages.order_by("id").values_list("id", flat=True).first(), self.ids[5])
+
+    def test_archived_messages_stay_searchable(self):
+        self.archive()
+        hits = search_messages(self.user.pk, "note 0", 10)
+        self.assertEqual([hit["message"] for hit in hits], [self.ids[0]])
+
+    def test_message_count_includes_the_archive(self):
+        self.archive()
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.message_count, 12)
+        self.room.messages.get(pk=self.ids[-1]).delete()
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.message_count, self.room.last_message_preview), (11, "note 10"))
+
+
+class ArchivedHistoryTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email="pages@example.com", name="Pages", password="x")
+        self.room = ChatRoom.objects.create(owner=user)
+        Message.objects.add_messages([Message(room=self.room, sender="user", content=str(i)) for i in range(7)])
+        with self.settings(CHAT_ARCHIVE_KEEP_RECENT=3):
+            archive_room("generalchat", self.room.pk, timezone.now() + timedelta(days=1))
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def page(self, url):
+        body = self.client.get(url).json()
+        return [m["content"] for m in body["results"]], body["next"], body["previous"]
+
+    def test_cursors_cross_from_the_hot_table_into_the_archive_and_back(self):
+        url = f"/api/generalchats/chatrooms/{self.room.pk}/messages/?page_size=2"
+        pages = []
+        while url:
+            contents, url, _ = self.page(url)
+            pages.append(contents)
+        self.assertEqual(pages, [["6", "5"], ["4", "3"], ["2", "1"], ["0"]])
+
+        _, next_url, _ = self.page(f"/api/generalchats/chatrooms/{self.room.pk}/messages/?page_size=2")
+        _, next_url, _ = self.page(next_url)
+        _, _, previous_url = self.page(next_url)
+        self.assertEqual(self.page(previous_url)[0], ["4", "3"])
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Case, CaseFile
+from .models import Case, CaseFile, CaseFileUpload
 
 admin.site.register(Case)
-admin.site.register(CaseFile)
\ No newline at end of file
+admin.site.register(CaseFile)
+admin.site.register(CaseFileUpload)
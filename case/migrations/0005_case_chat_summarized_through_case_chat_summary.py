@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('case', '0004_remove_case_medical_visit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='case',
+            name='chat_summarized_through',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='case',
+            name='chat_summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from users.models import CustomUser
 
@@ -7,8 +8,47 @@ class Case(models.Model):
     date_of_incident = models.DateField()
     description = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    chat_summary = models.TextField(blank=True, default="")
+    chat_summarized_through = models.PositiveBigIntegerField(default=0)
 
 class CaseFile(models.Model):
     case = models.ForeignKey(Case, related_name="files", on_delete=models.CASCADE)
     file = models.FileField(upload_to="case_files/")
-    uploaded_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+class CaseFileUpload(models.Model):
+    """A resumable upload of one case file, received in fixed-size chunks (see case.uploads)."""
+    OPEN = 'open'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    statuses = (
+        (OPEN, 'Open'),
+        (COMPLETE, 'Complete'),
+        (FAILED, 'Failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    filename = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=statuses, default=OPEN)
+    case_file = models.ForeignKey(CaseFile, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+class CaseFileUploadChunk(models.Model):
+    upload = models.ForeignKey(CaseFileUpload, on_delete=models.CASCADE, related_name="chunks")
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["upload", "index"], name="case_upload_chunk_unique"),
+        ]
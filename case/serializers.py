@@ -1,11 +1,22 @@
 from rest_framework import serializers
-from .models import Case, CaseFile
+from .models import Case, CaseFile, CaseFileUpload
+from .uploads import missing_chunks
 
 class CaseFileSerializer(serializers.ModelSerializer):
     class Meta:
         model = CaseFile
         fields = ['id', 'file', 'uploaded_at']
 
+class CaseFileUploadSerializer(serializers.ModelSerializer):
+    missing_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CaseFileUpload
+        fields = ['id', 'case', 'filename', 'size', 'chunk_size', 'chunk_count', 'sha256', 'status', 'missing_chunks', 'expires_at']
+
+    def get_missing_chunks(self, obj):
+        return missing_chunks(obj) if obj.status == CaseFileUpload.OPEN else []
+
 class CaseSerializer(serializers.ModelSerializer):
     files = CaseFileSerializer(many=True, read_only=True)
 
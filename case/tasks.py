@@ -0,0 +1,6 @@
+from celery import shared_task
+from .uploads import purge_expired
+
+@shared_task
+def purge_expired_uploads():
+    return purge_expired()
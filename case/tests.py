@@ -1,3 +1,174 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+from django.core.files.storage import filesystem
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import CustomUser
+from . import uploads
+from .models import Case, CaseFile, CaseFileUpload
 
-# Create your tests here.
+
+class TrickleStream(io.BytesIO):
+    """A request body that hands out at most `step` bytes per read."""
+
+    def __init__(self, data, step=1):
+        super().__init__(data)
+        self.step = step
+
+    def read(self, size=-1):
+        return super().read(self.step if size < 0 else min(size, self.step))
+
+
+class ContentRangeTests(SimpleTestCase):
+    upload = CaseFileUpload(size=2500, chunk_size=1000)
+
+    def test_aligned_chunks(self):
+        self.assertEqual(uploads.parse_content_range(self.upload, "bytes 0-999/2500"), (0, 1000))
+        self.assertEqual(uploads.parse_content_range(self.upload, "bytes 2000-2499/2500"), (2, 500))
+        self.assertEqual(self.upload.chunk_count, 3)
+
+    def test_rejected_ranges(self):
+        for header, status in (
+            ("bytes 0-999", 400),
+            ("bytes 0-999/3000", 416),
+            ("bytes 500-1499/2500", 416),
+            ("bytes 0-499/2500", 416),
+            ("bytes 2000-2599/2500", 416),
+        ):
+            with self.subTest(header=header), self.assertRaises(uploads.UploadError) as raised:
+                uploads.parse_content_range(self.upload, header)
+            self.assertEqual(raised.exception.status, status)
+
+
+class WriteChunkTests(TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        settings = override_settings(CASE_UPLOAD_TEMP_DIR=temp_dir.name, CASE_UPLOAD_CHUNK_SIZE=1000)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = CustomUser.objects.create_user(email="uploads@example.com", name="Uploads", password="x")
+
+    def start(self, name, data):
+        return uploads.start(self.user, name, len(data), hashlib.sha256(data).hexdigest())
+
+    def test_signature_split_across_reads(self):
+        data = b"\x89PNG\r\n\x1a\n" + bytes(1500)
+        upload = self.start("scan.png", data)
+        for index in (1, 0):
+            chunk = data[index * 1000:(index + 1) * 1000]
+            uploads.write_chunk(upload, index, len(chunk), TrickleStream(chunk, step=3))
+        self.assertEqual(uploads.missing_chunks(upload), [])
+        with open(uploads.temp_path(upload), "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_wrong_signature(self):
+        upload = self.start("scan.png", b"GIF89a" + bytes(10))
+        with self.assertRaises(uploads.UploadError) as raised:
+            uploads.write_chunk(upload, 0, 16, TrickleStream(b"GIF89a" + bytes(10), step=2))
+        self.assertEqual(raised.exception.status, 415)
+
+    def test_chunk_after_abort_is_a_conflict(self):
+        upload = self.start("notes.txt", b"hello")
+        uploads.discard(upload)
+        with self.assertRaises(uploads.UploadError) as raised:
+            uploads.write_chunk(upload, 0, 5, io.BytesIO(b"hello"))
+        self.assertEqual(raised.exception.status, 409)
+
+    def test_expired_upload_is_purged(self):
+        upload = self.start("notes.txt", b"hello")
+        CaseFileUpload.objects.filter(pk=upload.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(uploads.purge_expired(), 1)
+        self.assertFalse(CaseFileUpload.objects.filter(pk=upload.pk).exists())
+
+
+class FinishTests(TestCase):
+    data = b"%PDF-1.7\n" + bytes(range(256)) * 14
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        settings = override_settings(
+            MEDIA_ROOT=os.path.join(temp_dir.name, "media"),
+            CASE_UPLOAD_TEMP_DIR=os.path.join(temp_dir.name, "uploads"),
+            CASE_UPLOAD_CHUNK_SIZE=1000,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = CustomUser.objects.create_user(email="finish@example.com", name="Finish", password="x")
+        self.case = Case.objects.create(user=self.user, type_of_injury="Back", date_of_incident=date(2024, 1, 1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, sha256=None):
+        response = self.client.post(reverse("case-upload-start"), {
+            "filename": "report.pdf",
+            "size": len(self.data),
+            "sha256": hashlib.sha256(self.data).hexdigest() if sha256 is None else sha256,
+            "case": self.case.pk,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        return CaseFileUpload.objects.get(pk=response.data["upload"]["id"])
+
+    def put(self, upload, index):
+        first = index * 1000
+        chunk = self.data[first:first + 1000]
+        return self.client.generic(
+            "PUT", reverse("case-upload", args=[upload.pk]), chunk, content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {first}-{first + len(chunk) - 1}/{len(self.data)}",
+        )
+
+    def finish(self, upload):
+        return self.client.post(reverse("case-upload-finish", args=[upload.pk]), {}, format="json")
+
+    def test_chunks_in_any_order_are_moved_into_storage(self):
+        upload = self.start()
+        self.assertEqual(upload.chunk_count, 4)
+        for index in (3, 1, 0, 2):
+            self.assertEqual(self.put(upload, index).status_code, 200)
+
+        with mock.patch.object(filesystem, "file_move_safe", wraps=filesystem.file_move_safe) as move:
+            response = self.finish(upload)
+        self.assertEqual(response.status_code, 201)
+        case_file = CaseFile.objects.get(case=self.case)
+        move.assert_called_once_with(uploads.temp_path(upload), case_file.file.path, allow_overwrite=False)
+        with case_file.file.open("rb") as f:
+            self.assertEqual(f.read(), self.data)
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.case_file), (CaseFileUpload.COMPLETE, case_file))
+        self.assertFalse(upload.chunks.exists())
+        self.assertEqual(os.listdir(uploads.settings.CASE_UPLOAD_TEMP_DIR), [])
+
+    def test_sha256_mismatch_is_refused(self):
+        upload = self.start(sha256="0" * 64)
+        for index in range(4):
+            self.put(upload, index)
+
+        response = self.finish(upload)
+        self.assertEqual(response.status_code, 422)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, CaseFileUpload.FAILED)
+        self.assertFalse(CaseFile.objects.exists())
+        self.assertFalse(os.path.exists(uploads.temp_path(upload)))
+
+    def test_missing_chunk_is_refused(self):
+        upload = self.start()
+        for index in (0, 1, 3):
+            self.put(upload, index)
+
+        response = self.finish(upload)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("[2]", response.data["detail"])
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, CaseFileUpload.OPEN)
+        self.assertTrue(os.path.exists(uploads.temp_path(upload)))
+
+        # The session stays open, so the client can send the chunk and retry.
+        self.put(upload, 2)
+        self.assertEqual(self.finish(upload).status_code, 201)
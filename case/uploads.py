@@ -0,0 +1,225 @@
+"""
+Resumable, chunked case file uploads.
+
+A session fixes the file's size, name and chunk size up front. Each PUT
+carries one chunk as the raw request body with a Content-Range header. The
+chunk is streamed into its slot of a preallocated temporary file and hashed
+on the way. Chunks may arrive in any order, in parallel and more than once.
+Finalizing checks every chunk is in, hashes the whole file with a streaming
+read and moves it into storage as a CaseFile. Nothing holds more than
+COPY_BUFFER bytes of a file in memory.
+"""
+import hashlib
+import logging
+import os
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from .models import CaseFile, CaseFileUpload, CaseFileUploadChunk
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER = 64 * 1024
+
+# Allowed extensions and the bytes such a file starts with (None: not checked).
+FILE_TYPES = {
+    ".pdf": (b"%PDF",),
+    ".png": (b"\x89PNG\r\n\x1a\n",),
+    ".jpg": (b"\xff\xd8\xff",),
+    ".jpeg": (b"\xff\xd8\xff",),
+    ".heic": None,
+    ".doc": (b"\xd0\xcf\x11\xe0",),
+    ".docx": (b"PK\x03\x04",),
+    ".txt": None,
+    ".md": None,
+    ".csv": None,
+}
+
+SIGNATURE_LENGTH = max(len(s) for signatures in FILE_TYPES.values() if signatures for s in signatures)
+
+_content_range = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def temp_path(upload):
+    return os.path.join(settings.CASE_UPLOAD_TEMP_DIR, f"{upload.pk}.part")
+
+
+def clean_filename(name):
+    base, ext = os.path.splitext(get_valid_filename(os.path.basename(name or "")) or "file")
+    # FileField names are capped at 100 characters, upload_to prefix included.
+    return base[:60] + ext.lower()[:10]
+
+
+def start(user, filename, size, sha256="", case=None):
+    """Open an upload session after checking the declared type and size."""
+    filename = clean_filename(filename)
+    if os.path.splitext(filename)[1] not in FILE_TYPES:
+        raise UploadError(f"File type not allowed; allowed: {', '.join(sorted(FILE_TYPES))}", 415)
+    if size <= 0:
+        raise UploadError("Empty files cannot be uploaded")
+    if size > settings.CASE_UPLOAD_MAX_BYTES:
+        raise UploadError(f"File is larger than {settings.CASE_UPLOAD_MAX_BYTES} bytes", 413)
+    if sha256 and not re.fullmatch(r"[0-9a-f]{64}", sha256):
+        raise UploadError("sha256 must be 64 lowercase hex digits")
+
+    upload = CaseFileUpload.objects.create(
+        user=user,
+        case=case,
+        filename=filename,
+        size=size,
+        chunk_size=settings.CASE_UPLOAD_CHUNK_SIZE,
+        sha256=sha256,
+        expires_at=timezone.now() + timedelta(seconds=settings.CASE_UPLOAD_TTL),
+    )
+    os.makedirs(settings.CASE_UPLOAD_TEMP_DIR, exist_ok=True)
+    with open(temp_path(upload), "wb") as f:
+        # Sparse on most filesystems; chunks fill it in place.
+        f.truncate(size)
+    return upload
+
+
+def parse_content_range(upload, header):
+    """(index, length) of the chunk a Content-Range header describes."""
+    match = _content_range.match(header or "")
+    if not match:
+        raise UploadError("Content-Range must be 'bytes start-end/total'")
+    first, last, total = (int(g) for g in match.groups())
+    if total != upload.size or last < first or last >= upload.size:
+        raise UploadError("Content-Range does not fit this upload", 416)
+    index, offset = divmod(first, upload.chunk_size)
+    expected = min(upload.chunk_size, upload.size - first)
+    if offset or last - first + 1 != expected:
+        raise UploadError(f"Chunks must be aligned to {upload.chunk_size} bytes", 416)
+    return index, expected
+
+
+def write_chunk(upload, index, length, stream):
+    """
+    Stream one chunk from `stream` into its slot, hashing it as it goes.
+    A chunk sent again replaces the earlier copy.
+    """
+    if upload.status != CaseFileUpload.OPEN or upload.expires_at <= timezone.now():
+        raise UploadError("Upload is no longer open", 409)
+
+    digest = hashlib.sha256()
+    received = 0
+    # The first chunk is checked against the type's magic bytes, which may
+    # span several reads.
+    head, head_size = b"", SIGNATURE_LENGTH if index == 0 else 0
+    try:
+        fd = os.open(temp_path(upload), os.O_WRONLY)
+    except FileNotFoundError:
+        # Finished or aborted by another request.
+        raise UploadError("Upload is no longer open", 409)
+    try:
+        position = index * upload.chunk_size
+        while received < length:
+            data = stream.read(min(COPY_BUFFER, length - received))
+            if not data:
+                break
+            if len(head) < head_size:
+                head += data[:head_size - len(head)]
+                if len(head) == head_size:
+                    check_signature(upload.filename, head)
+            os.pwrite(fd, data, position + received)
+            digest.update(data)
+            received += len(data)
+    finally:
+        os.close(fd)
+    if received != length or stream.read(1):
+        raise UploadError("Request body does not match Content-Range")
+    if len(head) < head_size:
+        check_signature(upload.filename, head)
+
+    with transaction.atomic():
+        # Serialized with finish(), which locks the same row.
+        if not CaseFileUpload.objects.select_for_update().filter(pk=upload.pk, status=CaseFileUpload.OPEN).exists():
+            raise UploadError("Upload is no longer open", 409)
+        chunk, _ = CaseFileUploadChunk.objects.update_or_create(
+            upload=upload, index=index, defaults={"size": length, "sha256": digest.hexdigest()}
+        )
+    return chunk
+
+
+def check_signature(filename, head):
+    signatures = FILE_TYPES[os.path.splitext(filename)[1]]
+    if signatures and not any(head.startswith(s) for s in signatures):
+        raise UploadError("File content does not match its type", 415)
+
+
+def missing_chunks(upload):
+    have = set(upload.chunks.values_list("index", flat=True))
+    return [i for i in range(upload.chunk_count) if i not in have]
+
+
+class _TempFile(File):
+    # FileSystemStorage moves a file that has a temporary path instead of
+    # copying it.
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def finish(upload, case):
+    """Verify the upload is whole and store it as a CaseFile of `case`."""
+    with transaction.atomic():
+        upload = CaseFileUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != CaseFileUpload.OPEN:
+            raise UploadError("Upload is no longer open", 409)
+        missing = missing_chunks(upload)
+        if missing:
+            raise UploadError(f"Missing chunks: {missing[:20]}", 409)
+        if upload.chunks.aggregate(total=Sum("size"))["total"] != upload.size:
+            raise UploadError("Received size does not match", 409)
+
+        path = temp_path(upload)
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(COPY_BUFFER), b""):
+                digest.update(block)
+
+        if upload.sha256 and digest.hexdigest() != upload.sha256:
+            upload.status = CaseFileUpload.FAILED
+        else:
+            with open(path, "rb") as f:
+                case_file = CaseFile(case=case)
+                case_file.file.save(upload.filename, _TempFile(f, name=upload.filename), save=True)
+            upload.case = case
+            upload.case_file = case_file
+            upload.sha256 = digest.hexdigest()
+            upload.status = CaseFileUpload.COMPLETE
+        upload.save(update_fields=["case", "case_file", "sha256", "status"])
+        upload.chunks.all().delete()
+    discard(upload)
+
+    if upload.status == CaseFileUpload.FAILED:
+        raise UploadError("sha256 of the received file does not match", 422)
+    return upload.case_file
+
+
+def discard(upload):
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def purge_expired():
+    """Drop unfinished uploads past their expiry, and their temporary files."""
+    expired = CaseFileUpload.objects.filter(status=CaseFileUpload.OPEN, expires_at__lt=timezone.now())
+    count = 0
+    for upload in expired.iterator():
+        discard(upload)
+        upload.delete()
+        count += 1
+    return count
@@ -2,7 +2,8 @@ from django.urls import path
 from .views import (
     CaseListView,
     CaseCreateView, CaseUpdateView,
-    CaseDeleteView
+    CaseDeleteView,
+    CaseFileUploadStartView, CaseFileUploadView, CaseFileUploadFinishView
 )
 
 urlpatterns = [
@@ -10,4 +11,7 @@ urlpatterns = [
     path('create/', CaseCreateView.as_view(), name='case-create'),
     path('<int:pk>/update/', CaseUpdateView.as_view(), name='case-update'),
     path('<int:pk>/delete/', CaseDeleteView.as_view(), name='case-delete'),
+    path('uploads/', CaseFileUploadStartView.as_view(), name='case-upload-start'),
+    path('uploads/<uuid:pk>/', CaseFileUploadView.as_view(), name='case-upload'),
+    path('uploads/<uuid:pk>/finish/', CaseFileUploadFinishView.as_view(), name='case-upload-finish'),
 ]
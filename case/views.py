@@ -1,8 +1,9 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Case, CaseFile
-from .serializers import CaseSerializer, CaseCreateUpdateSerializer
+from .models import Case, CaseFile, CaseFileUpload
+from .serializers import CaseSerializer, CaseCreateUpdateSerializer, CaseFileSerializer, CaseFileUploadSerializer
+from . import uploads
 from rest_framework.permissions import IsAuthenticated
 
 class CaseListView(APIView):
@@ -54,3 +55,92 @@ class CaseDeleteView(APIView):
             return Response({'detail': 'Case not found'}, status=status.HTTP_404_NOT_FOUND)
         case.delete()
         return Response({"message": "Case deleted successfully",'detail': 'Case deleted'}, status=status.HTTP_204_NO_CONTENT)
+
+def _user_case(request, pk):
+    if pk in (None, ""):
+        return None
+    try:
+        return Case.objects.get(pk=pk, user=request.user)
+    except (Case.DoesNotExist, ValueError):
+        raise Case.DoesNotExist
+
+class CaseFileUploadStartView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            case = _user_case(request, request.data.get('case'))
+        except Case.DoesNotExist:
+            return Response({'detail': 'Case not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            size = int(request.data.get('size', 0))
+        except (TypeError, ValueError):
+            return Response({'detail': 'size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = uploads.start(
+                request.user, request.data.get('filename', ''), size, request.data.get('sha256', ''), case
+            )
+        except uploads.UploadError as e:
+            return Response({'detail': str(e)}, status=e.status)
+        return Response({"upload": CaseFileUploadSerializer(upload).data}, status=status.HTTP_201_CREATED)
+
+class CaseFileUploadView(APIView):
+    """Status (GET), one chunk (PUT, raw body with Content-Range) or abort (DELETE)."""
+    permission_classes = [IsAuthenticated]
+
+    def get_upload(self, request, pk):
+        try:
+            return CaseFileUpload.objects.get(pk=pk, user=request.user)
+        except CaseFileUpload.DoesNotExist:
+            return None
+
+    def get(self, request, pk):
+        upload = self.get_upload(request, pk)
+        if upload is None:
+            return Response({'detail': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"upload": CaseFileUploadSerializer(upload).data}, status=status.HTTP_200_OK)
+
+    def put(self, request, pk):
+        upload = self.get_upload(request, pk)
+        if upload is None:
+            return Response({'detail': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            index, length = uploads.parse_content_range(upload, request.headers.get('Content-Range'))
+            if request.META.get('CONTENT_LENGTH') not in (None, '', str(length)):
+                raise uploads.UploadError("Content-Length does not match Content-Range")
+            # The body is streamed from the underlying request; request.data
+            # would buffer the whole chunk.
+            uploads.write_chunk(upload, index, length, request._request)
+        except uploads.UploadError as e:
+            return Response({'detail': str(e)}, status=e.status)
+        return Response({"upload": CaseFileUploadSerializer(upload).data}, status=status.HTTP_200_OK)
+
+    def delete(self, request, pk):
+        upload = self.get_upload(request, pk)
+        if upload is None:
+            return Response({'detail': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        uploads.discard(upload)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class CaseFileUploadFinishView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            upload = CaseFileUpload.objects.get(pk=pk, user=request.user)
+        except CaseFileUpload.DoesNotExist:
+            return Response({'detail': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            case = _user_case(request, request.data.get('case')) or (
+                Case.objects.get(pk=upload.case_id, user=request.user) if upload.case_id else None
+            )
+        except Case.DoesNotExist:
+            return Response({'detail': 'Case not found'}, status=status.HTTP_404_NOT_FOUND)
+        if case is None:
+            return Response({'detail': 'case is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            case_file = uploads.finish(upload, case)
+        except uploads.UploadError as e:
+            return Response({'detail': str(e)}, status=e.status)
+        return Response({"message": "File uploaded successfully", "file": CaseFileSerializer(case_file).data}, status=status.HTTP_201_CREATED)
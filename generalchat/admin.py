@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import ChatRoom, Message
+from .models import ChatRoom, FAQEntry, Message
 
 admin.site.register(ChatRoom)
-admin.site.register(Message)
\ No newline at end of file
+admin.site.register(Message)
+
+@admin.register(FAQEntry)
+class FAQEntryAdmin(admin.ModelAdmin):
+    list_display = ["question", "language", "is_active", "updated_at"]
+    list_filter = ["language", "is_active"]
+    search_fields = ["question", "answer"]
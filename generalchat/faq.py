@@ -0,0 +1,92 @@
+"""
+Local FAQ index. Active FAQEntry questions are vectorized per language into
+an L2-normalized TF-IDF matrix over words and word bigrams; a batch of
+messages is scored against it with one matrix product, and the best entry
+answers a message when its cosine similarity clears FAQ_MATCH_THRESHOLD.
+"""
+import math
+import threading
+import time
+from collections import Counter
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from llm.cache import normalize
+from .models import FAQEntry
+
+
+def features(text):
+    words = normalize(text).split()
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class FAQTable:
+    """The TF-IDF matrix for one language."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        docs = [Counter(features(e.question)) for e in entries]
+        df = Counter(term for doc in docs for term in doc)
+        self.vocabulary = {term: i for i, term in enumerate(df)}
+        self.idf = np.array(
+            [math.log((1 + len(docs)) / (1 + df[term])) + 1 for term in self.vocabulary], dtype=np.float32
+        )
+        self.matrix = self.vectorize_counts(docs)
+
+    def vectorize_counts(self, docs):
+        matrix = np.zeros((len(docs), len(self.vocabulary)), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            for term, tf in doc.items():
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    matrix[row, column] = 1 + math.log(tf)
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def search(self, texts):
+        """(entry, score) of the best match for each text."""
+        scores = self.vectorize_counts([Counter(features(t)) for t in texts]) @ self.matrix.T
+        best = scores.argmax(axis=1)
+        return [(self.entries[i], float(scores[row, i])) for row, i in enumerate(best)]
+
+
+class FAQIndex:
+    """
+    Per-process index, rebuilt on first use after an entry changes in this
+    process (see signals) or after `ttl` seconds, for changes made elsewhere.
+    """
+
+    def __init__(self, threshold, ttl):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.tables = {}
+        self.built_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.built_at = None
+
+    def _tables(self):
+        with self._lock:
+            if self.built_at is None or time.monotonic() - self.built_at > self.ttl:
+                by_language = {}
+                for entry in FAQEntry.objects.filter(is_active=True).only("id", "question", "answer", "language"):
+                    by_language.setdefault(entry.language, []).append(entry)
+                self.tables = {language: FAQTable(entries) for language, entries in by_language.items()}
+                self.built_at = time.monotonic()
+            return self.tables
+
+    def match_many(self, texts, language):
+        """The FAQEntry answering each text, or None where nothing clears the threshold."""
+        table = self._tables().get(language)
+        if table is None or not texts:
+            return [None] * len(texts)
+        return [entry if score >= self.threshold else None for entry, score in table.search(texts)]
+
+    async def amatch(self, text, language):
+        return (await sync_to_async(self.match_many)([text], language))[0]
+
+
+faq_index = FAQIndex(threshold=settings.FAQ_MATCH_THRESHOLD, ttl=settings.FAQ_INDEX_TTL)
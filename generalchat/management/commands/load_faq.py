@@ -0,0 +1,37 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from generalchat.models import FAQEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Load FAQ entries from a JSON file: a list of {\"question\", \"answer\", \"language\"} "
+        "objects. Entries are matched on (question, language) and updated in place."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--replace", action="store_true", help="Deactivate existing entries that are not in the file."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        seen = []
+        with transaction.atomic():
+            for row in rows:
+                entry, _ = FAQEntry.objects.update_or_create(
+                    question=row["question"].strip(),
+                    language=row.get("language", "en"),
+                    defaults={"answer": row["answer"].strip(), "is_active": True},
+                )
+                seen.append(entry.pk)
+            if options["replace"]:
+                FAQEntry.objects.exclude(pk__in=seen).update(is_active=False)
+        self.stdout.write(f"Loaded {len(seen)} FAQ entries")
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_activity(apps, schema_editor):
+    ChatRoom = apps.get_model('generalchat', 'ChatRoom')
+    Message = apps.get_model('generalchat', 'Message')
+    for room in ChatRoom.objects.iterator():
+        messages = Message.objects.filter(room=room)
+        last = messages.order_by('-id').first()
+        if last is None:
+            continue
+        text = ' '.join(last.content.split())
+        if len(text) > 120:
+            text = text[:119] + '\u2026'
+        ChatRoom.objects.filter(pk=room.pk).update(
+            message_count=messages.count(),
+            last_message_at=last.timestamp,
+            last_message_preview=text,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generalchat', '0006_alter_message_room_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='chatroom',
+            options={'ordering': ['-last_message_at', '-id']},
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['owner', '-last_message_at', '-id'], name='generalchat_room_activity_idx'),
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generalchat', '0007_chatroom_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='prompt_version',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
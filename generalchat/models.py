@@ -1,16 +1,120 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
 from users.models import CustomUser as User
+from llm.history import estimate_tokens
+
+PREVIEW_LENGTH = 120
+
+def preview(text):
+    text = " ".join(text.split())
+    if len(text) <= PREVIEW_LENGTH:
+        return text
+    return text[:PREVIEW_LENGTH - 1] + "\u2026"
 
 class ChatRoom(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    summary = models.TextField(blank=True, default="")
+    summarized_through = models.PositiveBigIntegerField(default=0)
+    message_count = models.PositiveIntegerField(default=0, editable=False)
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True, default="", editable=False)
+
+    class Meta:
+        ordering = ["-last_message_at", "-id"]
+        indexes = [
+            models.Index(fields=["owner", "-last_message_at", "-id"], name="generalchat_room_activity_idx"),
+        ]
 
     def __str__(self):
         return self.name or f"Room-{self.id}"
 
+    def refresh_activity(self):
+        """
+        Recompute the denormalized activity fields from the room's messages,
+        counting the ones moved to the archive too.
+        """
+        from archive.models import MessageArchive
+
+        last = self.messages.order_by("-id").first()
+        archived = MessageArchive.objects.filter(app_label="generalchat", room_id=self.pk).aggregate(
+            count=Sum("message_count")
+        )["count"] or 0
+        ChatRoom.objects.filter(pk=self.pk).update(
+            message_count=self.messages.count() + archived,
+            last_message_at=last.timestamp if last else None,
+            last_message_preview=preview(last.content) if last else "",
+        )
+
+def advance_activity(room_id, count, last):
+    ChatRoom.objects.filter(pk=room_id).update(
+        message_count=F("message_count") + count,
+        last_message_at=last.timestamp,
+        last_message_preview=preview(last.content),
+    )
+
+class MessageManager(models.Manager):
+    def add_messages(self, messages):
+        """
+        Insert new messages with one bulk_create and advance each room's
+        activity fields once, all in one transaction.
+        """
+        by_room = {}
+        for m in messages:
+            if m.token_count is None:
+                m.token_count = estimate_tokens(m.content)
+            by_room.setdefault(m.room_id, []).append(m)
+        with transaction.atomic():
+            created = self.bulk_create(messages)
+            for room_id, room_messages in by_room.items():
+                advance_activity(room_id, len(room_messages), room_messages[-1])
+        return created
+
 class Message(models.Model):
-    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="messages")
+    # Indexed through the (room, id) composite index below.
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="messages", db_index=False)
     sender = models.CharField(max_length=50)
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    timestamp = models.DateTimeField(auto_now_add=True)
+    token_count = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Registry version of the system prompt an ai reply was generated with,
+    # or "faq/<id>" for replies answered from the FAQ index.
+    prompt_version = models.CharField(max_length=64, blank=True, default="", editable=False)
+
+    objects = MessageManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["room", "id"], name="generalchat_msg_room_id_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.token_count is None:
+            self.token_count = estimate_tokens(self.content)
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                advance_activity(self.room_id, 1, self)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.room.refresh_activity()
+        return result
+
+class FAQEntry(models.Model):
+    """Curated question/answer pair that can answer a general chat message without the LLM."""
+    question = models.TextField()
+    answer = models.TextField()
+    language = models.CharField(max_length=2, choices=User.languages, default="en")
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "FAQ entry"
+        verbose_name_plural = "FAQ entries"
+
+    def __str__(self):
+        return self.question[:80]
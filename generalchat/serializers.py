@@ -4,7 +4,7 @@ from .models import ChatRoom, Message
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
-        fields = '__all__'
+        exclude = ['token_count', 'prompt_version']
 
 class ChatRoomSerializer(serializers.ModelSerializer):
     messages = MessageSerializer(many=True, read_only=True)
@@ -12,4 +12,16 @@ class ChatRoomSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatRoom
         fields = ['id', 'name', 'owner', 'messages', 'created_at']
-        read_only_fields = ['owner', 'name', 'messages']
\ No newline at end of file
+        read_only_fields = ['owner', 'name', 'messages']
+
+class ChatRoomDetailSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatRoom
+        fields = ['id', 'name', 'owner', 'created_at', 'message_count', 'last_message_at', 'last_message_preview']
+        read_only_fields = ['owner', 'name', 'message_count', 'last_message_at', 'last_message_preview']
+
+class ChatRoomListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatRoom
+        fields = ['id', 'name', 'owner', 'created_at', 'message_count', 'last_message_at', 'last_message_preview']
+        read_only_fields = fields
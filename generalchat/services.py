@@ -0,0 +1,112 @@
+from django.conf import settings
+from llm.cache import response_cache, standalone
+from llm.chat import ChatService
+from llm import prompts, router, usage
+from llm.history import (
+    estimate_tokens, fold_history, load_history, schedule_summary_refresh, summary_message, to_chat_messages
+)
+from .faq import faq_index
+from .models import ChatRoom, Message
+
+async def build_payload(chatroom, pending=None, language=None):
+    """
+    Assemble the prompt from the system prompt for `language`, the rolling
+    summary and the recent turns. The new user message is either already
+    saved or passed unsaved as `pending`.
+    """
+    prompt = prompts.get("generalchat", language)
+    budget = settings.LLM_HISTORY_TOKEN_BUDGET - estimate_tokens(prompt.text) - estimate_tokens(chatroom.summary)
+    if pending is not None:
+        budget -= estimate_tokens(pending.content)
+    window, fold_before = await load_history(chatroom.messages.all(), chatroom.summarized_through, budget)
+    if pending is not None:
+        window.append(pending)
+
+    if fold_before:
+        schedule_summary_refresh(("generalchat", chatroom.pk), lambda: refresh_summary(chatroom, fold_before))
+
+    messages = [prompt.message()]
+    if chatroom.summary:
+        messages.append(summary_message(chatroom.summary))
+    messages += to_chat_messages(window)
+
+    return {
+        "model": router.route("generalchat", messages).model,
+        "messages": messages
+    }
+
+async def refresh_summary(chatroom, before):
+    async def save(summary, from_id, to_id):
+        # Only advance from the state the summary was built on; a concurrent
+        # refresh that got there first wins.
+        return await ChatRoom.objects.filter(pk=chatroom.pk, summarized_through=from_id).aupdate(
+            summary=summary,
+            summarized_through=to_id
+        )
+
+    await fold_history(
+        chatroom.messages.all(), chatroom.summary, chatroom.summarized_through, before, save, chat.usage_context(chatroom)
+    )
+
+def response_cache_key(payload, language):
+    """
+    Cache key for the completion, keyed on the latest user message. None
+    when the room has history (a summary or earlier turns) and the message
+    refers back into it, so it cannot be answered out of context.
+    """
+    system_message, *history, turn = payload["messages"]
+    if turn["role"] != "user" or (history and not standalone(turn["content"])):
+        return None
+    return response_cache.key(payload["model"], system_message["content"], turn["content"], language)
+
+async def cache_reply(payload, cache_key, ai_text):
+    # Only answers written without earlier context are stored, so a cached
+    # answer never leans on some other room's conversation.
+    if cache_key and len(payload["messages"]) == 2:
+        await response_cache.set(cache_key, ai_text)
+
+async def cached_reply(chatroom, payload, cache_key, context, streamed=False):
+    """The cached completion for cache_key, if any; hits are logged in the usage ledger."""
+    if not cache_key:
+        return None
+    ai_text = await response_cache.get(cache_key)
+    if ai_text is not None:
+        await usage.record(context, payload["model"], streamed=streamed, cache_hit=True)
+    return ai_text
+
+async def faq_match(user_msg, payload):
+    """The FAQEntry that answers user_msg in the payload's language, if any."""
+    prompt = prompts.lookup(payload)
+    return await faq_index.amatch(user_msg.content, prompt.language if prompt else prompts.DEFAULT_LANGUAGE)
+
+async def local_reply(chatroom, user_msg, payload, cache_key, context, streamed=False):
+    """
+    (ai_text, prompt_version) answered without calling the provider: from
+    the FAQ index, then the response cache. ai_text is None on a miss.
+    """
+    faq = await faq_match(user_msg, payload)
+    if faq is not None:
+        # Ledgered like a cache hit so usage reports count every answered
+        # turn; the "faq" route tells the two apart.
+        await usage.record(context, payload["model"], route="faq", streamed=streamed, cache_hit=True)
+        return faq.answer, f"faq/{faq.pk}"
+    return await cached_reply(chatroom, payload, cache_key, context, streamed), prompts.version_of(payload)
+
+class GeneralChat(ChatService):
+    app_label = "generalchat"
+    room_model = ChatRoom
+    message_model = Message
+
+    async def build_payload(self, chatroom, pending=None, language=None):
+        return await build_payload(chatroom, pending, language)
+
+    def cache_key(self, payload, language):
+        return response_cache_key(payload, language)
+
+    async def local_reply(self, chatroom, user_msg, payload, cache_key, context, streamed=False):
+        return await local_reply(chatroom, user_msg, payload, cache_key, context, streamed)
+
+    async def cache_reply(self, payload, cache_key, ai_text):
+        await cache_reply(payload, cache_key, ai_text)
+
+chat = GeneralChat()
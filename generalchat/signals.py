@@ -0,0 +1,9 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import FAQEntry
+from .faq import faq_index
+
+@receiver(post_save, sender=FAQEntry)
+@receiver(post_delete, sender=FAQEntry)
+def refresh_faq_index(sender, **kwargs):
+    faq_index.invalidate()
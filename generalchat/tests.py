@@ -1,3 +1,228 @@
-from django.test import TestCase
+import gzip
+import json
+from datetime import datetime, timezone
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from llm import views as llm_views
+from llm.singleflight import Flights, LocalFlightStore
+from users.models import CustomUser
+from . import consumers, export, services
+from .faq import FAQTable
+from .models import PREVIEW_LENGTH, ChatRoom, FAQEntry, Message, preview
 
-# Create your tests here.
+
+async def rows_of(rows):
+    for row in rows:
+        yield row
+
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+class ExportEncodingTests(SimpleTestCase):
+    rows = [(i, 7, "user", f"hello, {i}", datetime(2025, 1, 1, tzinfo=timezone.utc)) for i in range(450)]
+
+    async def test_ndjson(self):
+        lines = (await collect(export.encode(rows_of(self.rows), "ndjson"))).decode().splitlines()
+        self.assertEqual(len(lines), 450)
+        self.assertEqual(json.loads(lines[3]), {
+            "id": 3, "room": 7, "sender": "user", "content": "hello, 3", "timestamp": "2025-01-01T00:00:00Z",
+        })
+
+    async def test_gzipped_csv(self):
+        body = await collect(export.encode(rows_of(self.rows), "csv", compress=True))
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(export.FIELDS))
+        self.assertEqual(lines[-1], '449,7,user,"hello, 449",2025-01-01T00:00:00Z')
+
+    async def test_empty_csv_has_header(self):
+        body = await collect(export.encode(rows_of([]), "csv"))
+        self.assertEqual(body.decode().splitlines(), [",".join(export.FIELDS)])
+
+
+class MessageRowsTests(TestCase):
+    async def test_chunks_cover_every_row_in_order(self):
+        user = await CustomUser.objects.acreate(email="export@example.com", name="Export")
+        room = await ChatRoom.objects.acreate(owner=user)
+        await Message.objects.abulk_create([Message(room=room, sender="user", content=str(i)) for i in range(7)])
+        with mock.patch.object(export, "CHUNK_SIZE", 3):
+            rows = [row async for row in export.message_rows(room.messages.all())]
+        self.assertEqual([row[3] for row in rows], [str(i) for i in range(7)])
+
+
+class ResponseCacheKeyTests(SimpleTestCase):
+    system = {"role": "system", "content": "You are an insurance assistant."}
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello!"}]
+
+    def payload(self, text, history=()):
+        return {"model": "m", "messages": [self.system, *history, {"role": "user", "content": text}]}
+
+    def test_standalone_question_shares_the_first_message_key(self):
+        first = services.response_cache_key(self.payload("What is a deductible?"), "en")
+        later = services.response_cache_key(self.payload("what is a  DEDUCTIBLE", self.history), "en")
+        self.assertIsNotNone(first)
+        self.assertEqual(first, later)
+        self.assertNotEqual(first, services.response_cache_key(self.payload("What is a deductible?"), "es"))
+
+    def test_reference_to_the_conversation_is_not_cached(self):
+        self.assertIsNone(services.response_cache_key(self.payload("Is that covered too?", self.history), "en"))
+        self.assertIsNotNone(services.response_cache_key(self.payload("Is that covered too?"), "en"))
+
+    async def test_only_replies_without_history_are_stored(self):
+        with mock.patch.object(services.response_cache, "set") as cache_set:
+            await services.cache_reply(self.payload("What is a deductible?", self.history), "key", "answer")
+            cache_set.assert_not_called()
+            await services.cache_reply(self.payload("What is a deductible?"), "key", "answer")
+            cache_set.assert_awaited_once_with("key", "answer")
+
+
+class LocalReplyTests(SimpleTestCase):
+    async def test_faq_answers_are_ledgered(self):
+        context = {"app_label": "generalchat", "room_id": 1, "user_id": 1, "deferred": []}
+        payload = {"model": "m", "messages": [{"role": "user", "content": "How do I file a claim?"}]}
+        entry = FAQEntry(pk=4, question="How do I file a claim?", answer="Like this.")
+        with mock.patch.object(services, "faq_match", mock.AsyncMock(return_value=entry)):
+            reply = await services.local_reply(None, Message(content="How do I file a claim?"), payload, None, context)
+        self.assertEqual(reply, ("Like this.", "faq/4"))
+        [row] = context["deferred"]
+        self.assertEqual((row.route, row.cache_hit, row.model, row.room_id), ("faq", True, "m", 1))
+
+
+class FAQTableTests(SimpleTestCase):
+    entries = [
+        FAQEntry(pk=1, question="How do I file a claim?", answer="a"),
+        FAQEntry(pk=2, question="How do I cancel my policy?", answer="b"),
+        FAQEntry(pk=3, question="What does my deductible cover?", answer="c"),
+    ]
+
+    def test_best_match_and_score(self):
+        table = FAQTable(self.entries)
+        (exact, exact_score), (close, close_score), (_, unrelated_score) = table.search([
+            "how do I FILE a claim", "cancel my insurance policy", "is the weather nice",
+        ])
+        self.assertEqual(exact.pk, 1)
+        self.assertAlmostEqual(exact_score, 1.0, places=5)
+        self.assertEqual(close.pk, 2)
+        self.assertLess(close_score, exact_score)
+        self.assertEqual(unrelated_score, 0)
+
+
+class ConsumerReplyTests(TestCase):
+    async def test_unexpected_error_sends_an_error_frame(self):
+        user = await CustomUser.objects.acreate(email="socket@example.com", name="Socket")
+        consumer = consumers.ChatRoomConsumer()
+        consumer.scope = {"user": user}
+        consumer.chatroom = await ChatRoom.objects.acreate(owner=user)
+        consumer.send_json = mock.AsyncMock()
+        with mock.patch.object(services.chat, "build_payload", side_effect=RuntimeError("boom")), \
+                self.assertLogs("llm.consumers", "ERROR"):
+            await consumer.reply("hello")
+        consumer.send_json.assert_awaited_once_with({"type": "error", "error": "Reply generation failed"})
+
+
+class MessageHistoryTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="history@example.com", name="History", password="x")
+        self.room = ChatRoom.objects.create(owner=self.user)
+        Message.objects.bulk_create([Message(room=self.room, sender="user", content=str(i)) for i in range(5)])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_newest_first_by_cursor(self):
+        url = f"/api/generalchats/chatrooms/{self.room.pk}/messages/?page_size=2"
+        seen = []
+        while url:
+            body = self.client.get(url).json()
+            seen += [m["content"] for m in body["results"]]
+            url = body["next"]
+        self.assertEqual(seen, ["4", "3", "2", "1", "0"])
+
+    def test_other_users_rooms_are_hidden(self):
+        other = CustomUser.objects.create_user(email="other@example.com", name="Other", password="x")
+        self.client.force_authenticate(other)
+        response = self.client.get(f"/api/generalchats/chatrooms/{self.room.pk}/messages/")
+        self.assertEqual(response.status_code, 404)
+
+
+class RoomActivityTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="activity@example.com", name="Activity", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_preview_collapses_whitespace_and_truncates(self):
+        self.assertEqual(preview("a\n  b"), "a b")
+        self.assertEqual(len(preview("x" * 500)), PREVIEW_LENGTH)
+        self.assertTrue(preview("x" * 500).endswith("\u2026"))
+
+    def test_list_orders_by_latest_activity(self):
+        quiet = ChatRoom.objects.create(owner=self.user, name="quiet")
+        busy = ChatRoom.objects.create(owner=self.user, name="busy")
+        Message.objects.add_messages([Message(room=quiet, sender="user", content="old")])
+        Message.objects.add_messages([
+            Message(room=busy, sender="user", content="question"),
+            Message(room=busy, sender="ai", content="answer"),
+        ])
+        rooms = self.client.get("/api/generalchats/chatrooms/").json()
+        self.assertEqual(
+            [(r["name"], r["message_count"], r["last_message_preview"]) for r in rooms],
+            [("busy", 2, "answer"), ("quiet", 1, "old")],
+        )
+        self.assertNotIn("messages", rooms[0])
+
+    def test_refresh_activity_recounts(self):
+        room = ChatRoom.objects.create(owner=self.user)
+        Message.objects.add_messages([Message(room=room, sender="user", content=str(i)) for i in range(3)])
+        room.messages.filter(content="2").delete()
+        room.refresh_activity()
+        room.refresh_from_db()
+        self.assertEqual((room.message_count, room.last_message_preview), (2, "1"))
+
+
+class SendMessageResponseTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="delta@example.com", name="Delta", password="x")
+        self.room = ChatRoom.objects.create(owner=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch.object(llm_views, "flights", Flights(LocalFlightStore(), lock_ttl=1, grace=5))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def fake_reply(self, chatroom, user_msg, payload, cache_key=None):
+        ai_msg = Message(room=chatroom, sender="ai", content="Sure.")
+        await Message.objects.abulk_create([user_msg, ai_msg])
+        return user_msg, ai_msg
+
+    def send(self, message, headers=None, **data):
+        with mock.patch.object(services.chat, "build_payload", mock.AsyncMock(return_value={"model": "m", "messages": []})), \
+                mock.patch.object(services.chat, "cache_key", return_value=None), \
+                mock.patch.object(services.chat, "complete_reply", self.fake_reply):
+            return self.client.post(
+                f"/api/generalchats/chatrooms/{self.room.pk}/send_message/",
+                {"message": message, **data}, format="json", headers=headers,
+            )
+
+    def test_returns_only_the_new_messages(self):
+        body = self.send("hello").json()
+        self.assertEqual((body["user_message"]["content"], body["ai_message"]["content"]), ("hello", "Sure."))
+        self.assertEqual(body["room_version"], body["ai_message"]["id"])
+        self.assertNotIn("room", body)
+
+    def test_include_room_adds_the_full_room(self):
+        body = self.send("hello", include_room="true").json()
+        self.assertEqual(len(body["room"]["messages"]), 2)
+
+    def test_repeats_within_grace_share_the_turn(self):
+        first = self.send("hello").json()
+        self.assertEqual(self.send("hello").json()["ai_message"], first["ai_message"])
+        self.assertEqual(Message.objects.filter(room=self.room).count(), 2)
+
+    def test_idempotency_keys_tell_repeats_apart(self):
+        first = self.send("hello", headers={"Idempotency-Key": "a"}).json()
+        retry = self.send("hello", headers={"Idempotency-Key": "a"}).json()
+        repeat = self.send("hello", headers={"Idempotency-Key": "b"}).json()
+        self.assertEqual(retry["ai_message"], first["ai_message"])
+        self.assertNotEqual(repeat["ai_message"]["id"], first["ai_message"]["id"])
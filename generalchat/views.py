@@ -1,92 +1,65 @@
-import os
-import requests
-from rest_framework import viewsets, permissions, status
+from adrf import viewsets
+from asgiref.sync import sync_to_async
+from rest_framework import permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import ChatRoom, Message
-from .serializers import ChatRoomSerializer, MessageSerializer
-from django.conf import settings
+from .serializers import ChatRoomSerializer, ChatRoomDetailSerializer, ChatRoomListSerializer, MessageSerializer
+from .export import FORMATS, chain_rows, export_response, message_rows
+from .pagination import MessageCursorPagination
+from .services import chat
+from .tasks import complete_reply_job
+from archive.store import ArchivedHistory, aarchived_rows
+from llm.utils import request_flag
+from llm.views import SendMessageMixin
 
-MODEL_NAME = "llama-3.1-8b-instant"
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_API_KEY = settings.GROQ_API_KEY
-
-HEADERS = {
-    "Authorization": f"Bearer {GROQ_API_KEY}",
-    "Content-Type": "application/json",
-}
-
-class ChatRoomViewSet(viewsets.ModelViewSet):
+class ChatRoomViewSet(SendMessageMixin, viewsets.ModelViewSet):
     serializer_class = ChatRoomSerializer
     permission_classes = [permissions.IsAuthenticated]
+    deadline_class = "chat"
+    chat = chat
+    reply_job = complete_reply_job
+    message_serializer_class = MessageSerializer
 
     def get_queryset(self):
-        return ChatRoom.objects.filter(owner=self.request.user)
+        return self.chat.rooms(self.request.user)
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return ChatRoomListSerializer
+        if self.action == "retrieve":
+            return ChatRoomDetailSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-    @action(detail=True, methods=["post"])
-    def send_message(self, request, pk=None):
+    @action(detail=True, methods=["get"])
+    def messages(self, request, pk=None):
         chatroom = self.get_object()
-        user_text = request.data.get("message", "").strip()
-
-        if not user_text:
-            return Response({"error": "Message text is required"}, status=400)
-
-        user_msg = Message.objects.create(
-            room=chatroom,
-            sender="user",
-            content=user_text
-        )
-
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": user_text}
-            ]
-        }
+        paginator = MessageCursorPagination()
+        history = ArchivedHistory(chatroom.messages.all(), "generalchat", chatroom.pk)
+        page = paginator.paginate_queryset(history, request, view=self)
+        return paginator.get_paginated_response(MessageSerializer(page, many=True).data)
 
-        try:
-            resp = requests.post(GROQ_API_URL, headers=HEADERS, json=payload)
-        except Exception as e:
-            return Response(
-                {"error": "Failed to connect to Groq API", "details": str(e)},
-                status=500
-            )
-
-        if resp.status_code != 200:
-            return Response(
-                {
-                    "error": "Groq API returned an error",
-                    "status": resp.status_code,
-                    "details": resp.text
-                },
-                status=resp.status_code
-            )
-
-        data = resp.json()
-
-        try:
-            ai_text = data["choices"][0]["message"]["content"]
-        except Exception:
-            return Response(
-                {"error": "Invalid AI response format", "data": data},
-                status=500
-            )
-
-        ai_msg = Message.objects.create(
-            room=chatroom,
-            sender="ai",
-            content=ai_text
+    @action(detail=True, methods=["get"])
+    def export(self, request, pk=None):
+        chatroom = self.get_object()
+        fmt = request.query_params.get("fmt", "ndjson")
+        if fmt not in FORMATS:
+            return Response({"error": f"fmt must be one of: {', '.join(FORMATS)}"}, status=400)
+        return export_response(
+            chain_rows(aarchived_rows("generalchat", [chatroom.pk]), message_rows(chatroom.messages.all())),
+            fmt,
+            request_flag(request, "gzip"),
+            f"generalchat-{chatroom.pk}"
         )
 
-        return Response(
-            {
-                "room":ChatRoomSerializer(chatroom).data,
-                "user_message": MessageSerializer(user_msg).data,
-                "ai_message": MessageSerializer(ai_msg).data
-            },
-            status=200
-        )
+    async def turn_response(self, request, chatroom, user_msg, ai_msg):
+        # Clients append the new messages locally; room_version is the newest
+        # message id they now hold. The full room (every message) is only
+        # serialized for clients that still ask for it with include_room.
+        response = await super().turn_response(request, chatroom, user_msg, ai_msg)
+        response.data["room_version"] = ai_msg.id
+        if request_flag(request, "include_room"):
+            response.data["room"] = await sync_to_async(lambda: ChatRoomSerializer(chatroom).data)()
+        return response
@@ -0,0 +1,5 @@
+from django.contrib import admin
+from .models import LLMCall, ReplyJob
+
+admin.site.register(ReplyJob)
+admin.site.register(LLMCall)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class LlmConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'llm'
+
+    def ready(self):
+        # Compile the system prompts at startup rather than on the first request.
+        from . import prompts  # noqa: F401
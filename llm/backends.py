@@ -0,0 +1,78 @@
+import json
+from .client import get_client
+
+
+class ProviderError(Exception):
+    """The provider answered with a non-200 status."""
+
+    def __init__(self, status, details, retry_after=None):
+        super().__init__(f"LLM provider returned {status}")
+        self.status = status
+        self.details = details
+        self.retry_after = retry_after
+
+
+class MalformedResponse(Exception):
+    pass
+
+
+def _retry_after(resp):
+    try:
+        return float(resp.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+class OpenAICompatibleBackend:
+    """
+    Chat completions against any OpenAI-compatible endpoint: Groq in
+    production, or the local fake served by `manage.py run_fake_llm`.
+    """
+
+    def __init__(self, url, api_key=None):
+        self.url = url
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+
+    async def complete(self, payload, timeout, usage=None):
+        """Return the completion text; the provider's token usage is copied into `usage` if given."""
+        resp = await get_client().post(self.url, headers=self.headers, json=payload, timeout=timeout)
+        if resp.status_code != 200:
+            raise ProviderError(resp.status_code, resp.text, _retry_after(resp))
+        try:
+            body = resp.json()
+            text = body["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise MalformedResponse(resp.text) from e
+        if usage is not None:
+            usage.update(body.get("usage") or {})
+        return text
+
+    async def stream(self, payload, timeout, usage=None):
+        """Yield content deltas from a streaming completion, filling `usage` like complete()."""
+        async with get_client().stream(
+            "POST", self.url, headers=self.headers, json={**payload, "stream": True}, timeout=timeout
+        ) as resp:
+            if resp.status_code != 200:
+                body = await resp.aread()
+                raise ProviderError(resp.status_code, body.decode(errors="replace"), _retry_after(resp))
+
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                    # Usage rides on the last chunk: top level for OpenAI
+                    # (which sends it with empty choices), under x_groq for Groq.
+                    chunk_usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+                    delta = chunk["choices"][0]["delta"].get("content") if chunk["choices"] else None
+                except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                    raise MalformedResponse(data) from e
+                if chunk_usage and usage is not None:
+                    usage.update(chunk_usage)
+                if delta:
+                    yield delta
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+import weakref
+from collections import Counter
+from cachetools import TTLCache
+from django.conf import settings
+from redis import RedisError
+from redis import asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+_punctuation = re.compile(r"[^\w\s]")
+_whitespace = re.compile(r"\s+")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _punctuation.sub(" ", text)
+    return _whitespace.sub(" ", text).strip()
+
+
+# Words that point back into the conversation ("and what about that one?").
+REFERENCES = frozenset((
+    # en
+    "it", "its", "this", "that", "these", "those", "they", "them", "their", "he", "she", "him", "her",
+    "above", "earlier", "previous", "previously", "again", "also", "else", "same", "mentioned", "said",
+    "continue", "yes", "no", "ok", "okay",
+    # es ("la", "lo" and "los" are articles as often as pronouns, so they are left out)
+    "eso", "esto", "esa", "ese", "esos", "esas", "ello", "le", "les", "anterior", "antes",
+    "también", "tambien", "mismo", "misma", "mencionaste", "dijiste", "sí", "vale",
+))
+
+
+def standalone(text):
+    """Whether `text` reads the same without the conversation before it."""
+    return REFERENCES.isdisjoint(normalize(text).split())
+
+
+class ResponseCache:
+    """
+    Two-tier cache of completion texts: a per-process TTL/LRU map in front of
+    an optional shared Redis tier. Entries are partitioned by language so an
+    English answer is never served to a Spanish-speaking user.
+    """
+
+    def __init__(self, maxsize, ttl, redis_url=None, prefix="llm:response:"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis_url = redis_url
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._redis = weakref.WeakKeyDictionary()
+
+    def key(self, model, system_prompt, user_text, language):
+        raw = "\0".join((model, system_prompt, normalize(user_text)))
+        return f"{language}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    def _get_redis(self):
+        if not self.redis_url:
+            return None
+        loop = asyncio.get_running_loop()
+        client = self._redis.get(loop)
+        if client is None:
+            client = self._redis[loop] = aioredis.from_url(self.redis_url, decode_responses=True)
+        return client
+
+    async def get(self, key):
+        with self._lock:
+            value = self.local.get(key)
+        if value is not None:
+            self.counters["local_hits"] += 1
+            return value
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                value = await redis.get(self.prefix + key)
+            except RedisError as e:
+                logger.warning("Response cache read failed: %s", e)
+            if value is not None:
+                self.counters["redis_hits"] += 1
+                with self._lock:
+                    self.local[key] = value
+                return value
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key, value):
+        with self._lock:
+            self.local[key] = value
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                await redis.set(self.prefix + key, value, ex=self.ttl)
+            except RedisError as e:
+                logger.warning("Response cache write failed: %s", e)
+
+    def stats(self):
+        with self._lock:
+            size = len(self.local)
+        return {**self.counters, "size": size}
+
+
+response_cache = ResponseCache(
+    maxsize=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl=settings.LLM_CACHE_TTL,
+    redis_url=settings.LLM_CACHE_REDIS_URL,
+)
@@ -0,0 +1,105 @@
+"""
+The reply flow both chat apps run for a turn. Each app subclasses
+ChatService with its room and message models and its prompt; views and
+consumers get at it through llm.views.SendMessageMixin and
+llm.consumers.ChatConsumer.
+"""
+from . import gateway, prompts
+from .scheduler import PRIORITY_GENERAL
+from .turns import save_turn
+
+
+class ChatService:
+    app_label = None
+    room_model = None
+    message_model = None
+    # Room field pointing at the user who owns it.
+    owner_field = "owner"
+    # Room fields build_payload() reads the rolling summary from.
+    summary_fields = ("summary", "summarized_through")
+    priority = PRIORITY_GENERAL
+
+    def rooms(self, user):
+        return self.room_model.objects.filter(**{self.owner_field: user})
+
+    def usage_context(self, chatroom, deferred=False):
+        context = {
+            "app_label": self.app_label,
+            "room_id": chatroom.pk,
+            "user_id": getattr(chatroom, f"{self.owner_field}_id"),
+        }
+        if deferred:
+            context["deferred"] = []
+        return context
+
+    async def build_payload(self, chatroom, pending=None, language=None):
+        raise NotImplementedError
+
+    def cache_key(self, payload, language):
+        """Response cache key for the payload; None when it is not to be cached."""
+        return None
+
+    async def local_reply(self, chatroom, user_msg, payload, cache_key, context, streamed=False):
+        """
+        (ai_text, prompt_version) answered without calling the provider;
+        ai_text is None on a miss.
+        """
+        return None, prompts.version_of(payload)
+
+    async def cache_reply(self, payload, cache_key, ai_text):
+        pass
+
+    async def complete_reply(self, chatroom, user_msg, payload, cache_key=None):
+        """
+        Generate the whole reply in one call, then persist the turn. Returns the
+        saved (user_msg, ai_msg); user_msg may already be saved (job mode).
+        """
+        context = self.usage_context(chatroom, deferred=True)
+        ai_text, version = await self.local_reply(chatroom, user_msg, payload, cache_key, context)
+
+        if ai_text is None:
+            ai_text = await gateway.complete(payload, priority=self.priority, context=context, hedge=True)
+            await self.cache_reply(payload, cache_key, ai_text)
+
+        ai_msg = self.message_model(room=chatroom, sender="ai", content=ai_text, prompt_version=version)
+        return await save_turn([user_msg, ai_msg], context)
+
+    async def stream_reply(self, chatroom, user_msg, payload, cache_key=None):
+        """
+        Yield ("token", text) for each delta, then ("user_message", message)
+        and ("ai_message", message) once the turn is persisted.
+        """
+        context = self.usage_context(chatroom, deferred=True)
+        ai_text, version = await self.local_reply(chatroom, user_msg, payload, cache_key, context, streamed=True)
+
+        if ai_text is not None:
+            yield "token", ai_text
+        else:
+            parts = []
+            async for token in gateway.stream(payload, priority=self.priority, context=context):
+                parts.append(token)
+                yield "token", token
+            ai_text = "".join(parts)
+            await self.cache_reply(payload, cache_key, ai_text)
+
+        ai_msg = self.message_model(room=chatroom, sender="ai", content=ai_text, prompt_version=version)
+        user_msg, ai_msg = await save_turn([user_msg, ai_msg], context)
+        yield "user_message", user_msg
+        yield "ai_message", ai_msg
+
+    async def reply_to_job(self, job):
+        """Produce the ai message for a background ReplyJob."""
+        chatroom = await self.room_model.objects.aget(pk=job.room_id)
+        user_msg = await self.message_model.objects.aget(pk=job.user_message_id)
+        payload = await self.build_payload(chatroom, language=job.user.language)
+        _, ai_msg = await self.complete_reply(chatroom, user_msg, payload, self.cache_key(payload, job.user.language))
+        return ai_msg
+
+    async def load_turn(self, result):
+        """Fetch the (user, ai) message pair a coalesced turn produced."""
+        messages = {
+            m.id: m async for m in self.message_model.objects.filter(
+                id__in=[result["user_message"], result["ai_message"]]
+            )
+        }
+        return messages[result["user_message"]], messages[result["ai_message"]]
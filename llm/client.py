@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import sys
+import weakref
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# httpx connection pools are bound to the event loop that opened them, so keep
+# one shared client per running loop (Daphne runs a single loop per process).
+_clients = weakref.WeakKeyDictionary()
+
+
+def _build_client():
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(settings.LLM_HTTP_TIMEOUT, connect=settings.LLM_HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = _build_client()
+        if settings.LLM_PREWARM_URL:
+            # Only loops nothing warmed at startup get here (see warm_up());
+            # the request that opened the client still pays the handshake.
+            loop.create_task(prewarm(client))
+    return client
+
+
+async def warm_up():
+    """
+    Open the running loop's client and pre-warm it, so the first request
+    served on this loop finds the TLS and HTTP/2 handshake already done.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = _build_client()
+    if settings.LLM_PREWARM_URL:
+        await prewarm(client)
+
+
+def warm_up_on_server_start():
+    """
+    Run warm_up() as soon as Daphne starts serving. Daphne runs on Twisted's
+    asyncio reactor and sends no ASGI lifespan events, so this hooks the
+    reactor's startup; it does nothing when no such reactor is installed.
+    """
+    reactor = sys.modules.get("twisted.internet.reactor")
+    if reactor is None:
+        return
+    from twisted.internet.asyncioreactor import AsyncioSelectorReactor
+    if isinstance(reactor, AsyncioSelectorReactor):
+        reactor.callWhenRunning(lambda: reactor._asyncioEventloop.create_task(warm_up()))
+
+
+async def prewarm(client=None):
+    client = client or get_client()
+    try:
+        await client.get(settings.LLM_PREWARM_URL)
+    except httpx.HTTPError as e:
+        logger.warning("LLM connection pre-warm failed: %s", e)
+
+
+async def close_clients():
+    loop = asyncio.get_running_loop()
+    client = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .exceptions import LLMError
+from .quotas import quotas
+
+logger = logging.getLogger(__name__)
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Websocket chat on one room of `chat` (the app's ChatService); messages
+    go out through `message_serializer_class`.
+    """
+    chat = None
+    message_serializer_class = None
+    group_name = None
+    reply_task = None
+
+    async def connect(self):
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.chatroom = await self.chat.rooms(user).filter(pk=self.scope["url_route"]["kwargs"]["pk"]).afirst()
+        if self.chatroom is None:
+            await self.close()
+            return
+
+        # Every socket the owner has open on this room joins the group, so
+        # persisted messages reach all of their devices.
+        self.group_name = f"{self.chat.app_label}.room.{self.chatroom.pk}"
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.reply_task is not None:
+            self.reply_task.cancel()
+        if self.group_name is not None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        user_text = str(content.get("message", "")).strip()
+
+        if not user_text:
+            await self.send_json({"type": "error", "error": "Message text is required"})
+            return
+
+        if self.reply_task is not None and not self.reply_task.done():
+            await self.send_json({"type": "error", "error": "A reply is already in progress"})
+            return
+
+        quota = await quotas.consume(self.scope["user"])
+        if not quota.allowed:
+            await self.send_json({"type": "error", "error": "Message quota exceeded", "retry_after": quota.retry_after})
+            return
+
+        # Run the completion outside the receive loop so group events keep
+        # being delivered to this socket while tokens stream.
+        self.reply_task = asyncio.create_task(self.reply(user_text))
+
+    async def reply(self, user_text):
+        # Saved together with the reply once it is complete.
+        user_msg = self.chat.message_model(room=self.chatroom, sender="user", content=user_text)
+        language = self.scope["user"].language
+
+        try:
+            await self.chatroom.arefresh_from_db(fields=self.chat.summary_fields)
+            payload = await self.chat.build_payload(self.chatroom, user_msg, language)
+            cache_key = self.chat.cache_key(payload, language)
+            async for event, data in self.chat.stream_reply(self.chatroom, user_msg, payload, cache_key):
+                if event == "token":
+                    await self.send_json({"type": "token", "content": data})
+                else:
+                    await self.broadcast(event, self.message_serializer_class(data).data)
+        except LLMError as e:
+            await self.send_json({"type": "error", **e.detail})
+        except Exception:
+            # The task has no caller to report to; without an error frame the
+            # client would wait for a reply forever.
+            logger.exception("Reply in %s room %s failed", self.chat.app_label, self.chatroom.pk)
+            await self.send_json({"type": "error", "error": "Reply generation failed"})
+
+    async def broadcast(self, event, data):
+        # The originating socket is written to directly so its events stay in
+        # order with the token stream; the group only carries the fan-out.
+        await self.send_json({"type": event, "message": data})
+        await self.channel_layer.group_send(
+            self.group_name,
+            {"type": "chat.message", "event": event, "message": dict(data), "origin": self.channel_name}
+        )
+
+    async def chat_message(self, event):
+        if event["origin"] != self.channel_name:
+            await self.send_json({"type": event["event"], "message": event["message"]})
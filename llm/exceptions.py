@@ -0,0 +1,29 @@
+import math
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class LLMError(APIException):
+    status_code = status.HTTP_502_BAD_GATEWAY
+    default_detail = "LLM provider request failed"
+
+    def __init__(self, error, details="", upstream_status=None, wait=None):
+        super().__init__({"error": error, "details": details})
+        if upstream_status is not None:
+            # Set after APIException, which would turn it into a string.
+            self.detail["status"] = int(upstream_status)
+        # DRF sends Retry-After with '%d'; round up so a sub-second wait is
+        # not advertised as 0.
+        self.wait = max(1, math.ceil(wait)) if wait is not None else None
+
+
+class ProviderUnavailable(LLMError):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+class CircuitOpen(ProviderUnavailable):
+    pass
+
+
+class Overloaded(ProviderUnavailable):
+    pass
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import random
+import time
+import httpx
+from django.conf import settings
+from django.utils.module_loading import import_string
+from AI_Powered_Insurance_App import deadlines
+from .backends import MalformedResponse, ProviderError
+from .exceptions import CircuitOpen, LLMError, ProviderUnavailable
+from .hedging import hedger
+from . import router
+from .scheduler import PRIORITY_GENERAL, estimate_request_tokens, scheduler
+from .usage import CallRecord
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = settings.LLM_MODEL
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker. Once `threshold` attempts fail in a row the
+    circuit opens and calls fail fast for `reset_timeout` seconds; after that
+    a single probe is let through and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        # An in-flight probe holds the circuit; one that never reported back
+        # (e.g. its request was cancelled) expires after reset_timeout.
+        until = max(self.opened_at, self.probe_started or 0) + self.reset_timeout
+        return max(0, until - time.monotonic())
+
+    def check(self):
+        if self.opened_at is None:
+            return
+        wait = self.retry_after()
+        if wait > 0:
+            raise CircuitOpen("LLM provider is temporarily unavailable", wait=wait)
+        self.probe_started = time.monotonic()
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_started = None
+        if self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning("LLM circuit opened after %d consecutive failures", self.failures)
+            self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_RESET_TIMEOUT)
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        options = dict(settings.LLM_BACKEND)
+        backend_class = import_string(options.pop("BACKEND"))
+        _backend = backend_class(**{k.lower(): v for k, v in options.items()})
+    return _backend
+
+
+def backoff_delay(attempt, retry_after=None):
+    # Full jitter keeps retries from many workers from lining up on the
+    # provider; an explicit Retry-After is honoured up to the cap.
+    delay = random.uniform(0, settings.LLM_RETRY_BACKOFF * (2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return min(delay, settings.LLM_RETRY_BACKOFF_MAX)
+
+
+def _translate(exc):
+    if isinstance(exc, ProviderError):
+        if exc.status == 429 or exc.status >= 500:
+            return ProviderUnavailable(
+                "LLM provider returned an error", exc.details, exc.status, wait=exc.retry_after
+            )
+        return LLMError("LLM provider returned an error", exc.details, exc.status)
+    if isinstance(exc, MalformedResponse):
+        return LLMError("Invalid AI response format", str(exc))
+    return ProviderUnavailable("Failed to connect to LLM provider", str(exc))
+
+
+def _is_retryable(exc):
+    if isinstance(exc, ProviderError):
+        return exc.status in RETRYABLE_STATUSES
+    return isinstance(exc, httpx.TransportError)
+
+
+async def _failed_attempt(exc, attempt, backoff=True):
+    """
+    Record a failed attempt; raise the client-facing error unless another
+    attempt should follow. Without `backoff` the next attempt, on a fallback
+    model, goes out straight away.
+    """
+    if not _is_retryable(exc):
+        # The provider answered; a 4xx or a malformed body says nothing
+        # about its health.
+        breaker.record_success()
+        raise _translate(exc) from exc
+
+    left = deadlines.remaining()
+    if left is not None and left < settings.DEADLINE_MIN_TIMEOUT:
+        # The attempt ran into the request deadline, which may be well short
+        # of LLM_ATTEMPT_TIMEOUT; that is no sign of a provider failure.
+        raise deadlines.DeadlineExceeded("llm") from exc
+
+    breaker.record_failure()
+    if attempt + 1 >= settings.LLM_MAX_ATTEMPTS:
+        raise _translate(exc) from exc
+
+    if not backoff:
+        return
+    delay = backoff_delay(attempt, getattr(exc, "retry_after", None))
+    if left is not None and left < delay + settings.DEADLINE_MIN_TIMEOUT:
+        # Not enough of the request deadline left for another attempt.
+        raise _translate(exc) from exc
+    logger.info("Retrying LLM call in %.2fs after: %s", delay, exc)
+    await asyncio.sleep(delay)
+
+
+async def _retry(exc, attempt, payload):
+    """Handle a failed attempt and return the payload for the next one."""
+    retarget = router.fallback(payload) if _is_retryable(exc) else None
+    await _failed_attempt(exc, attempt, backoff=retarget is None)
+    if retarget is None:
+        return payload
+    logger.info("LLM falling back from %s to %s after: %s", payload["model"], retarget["model"], exc)
+    return retarget
+
+
+async def complete(payload, priority=PRIORITY_GENERAL, context=None, hedge=False):
+    """
+    Return the completion text for `payload`, retrying transient failures.
+    `context` attributes the call in the usage ledger (see llm.usage). With
+    `hedge`, slow attempts are hedged when LLM_HEDGE_ENABLED (see llm.hedging).
+    """
+    tokens = estimate_request_tokens(payload)
+    call = CallRecord(payload, context)
+
+    async def send(body, hedge=False):
+        if hedge:
+            await scheduler.acquire(priority, tokens)
+            # One of the two attempts is cancelled after the provider has
+            # taken its prompt; the hedge's prompt stands in for that spend.
+            call.hedge_tokens += estimate_request_tokens({**body, "max_tokens": 0})
+        call.attempts += 1
+        usage = {}
+        with deadlines.outbound("llm", settings.LLM_ATTEMPT_TIMEOUT) as timeout:
+            try:
+                # httpx timeouts bound each read, not the whole response.
+                text = await asyncio.wait_for(get_backend().complete(body, timeout, usage=usage), timeout)
+            except asyncio.TimeoutError as e:
+                raise httpx.ReadTimeout(f"LLM call exceeded {timeout:.1f}s") from e
+        return text, usage
+
+    call.route = router.route_name(payload.get("model"))
+    try:
+        for attempt in range(settings.LLM_MAX_ATTEMPTS):
+            breaker.check()
+            await scheduler.acquire(priority, tokens)
+            call.model = payload.get("model", "")
+            try:
+                if hedge and hedger.enabled:
+                    (call.text, call.usage), sent = await hedger.run(payload, send)
+                    call.model = sent.get("model", "")
+                else:
+                    call.text, call.usage = await send(payload)
+            except (ProviderError, MalformedResponse, httpx.HTTPError) as e:
+                payload = await _retry(e, attempt, payload)
+            else:
+                breaker.record_success()
+                return call.text
+    except BaseException as e:
+        call.error = type(e).__name__
+        raise
+    finally:
+        await call.save()
+
+
+async def stream(payload, priority=PRIORITY_GENERAL, context=None):
+    """
+    Yield completion deltas for `payload`. Attempts are only retried before
+    the first delta; a stream that breaks midway raises to the caller.
+    """
+    tokens = estimate_request_tokens(payload)
+    call = CallRecord(payload, context, streamed=True)
+    call.route = router.route_name(payload.get("model"))
+    try:
+        for attempt in range(settings.LLM_MAX_ATTEMPTS):
+            breaker.check()
+            await scheduler.acquire(priority, tokens)
+            call.attempts += 1
+            call.model = payload.get("model", "")
+            started = False
+            try:
+                with deadlines.outbound("llm", settings.LLM_ATTEMPT_TIMEOUT) as timeout:
+                    async for delta in get_backend().stream(payload, timeout, usage=call.usage):
+                        started = True
+                        call.token(delta)
+                        yield delta
+            except (ProviderError, MalformedResponse, httpx.HTTPError) as e:
+                if started:
+                    breaker.record_failure()
+                    raise _translate(e) from e
+                payload = await _retry(e, attempt, payload)
+            else:
+                breaker.record_success()
+                return
+    except BaseException as e:
+        call.error = type(e).__name__
+        raise
+    finally:
+        await call.save()
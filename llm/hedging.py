@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+from django.conf import settings
+
+
+class Hedger:
+    """
+    Hedged completions. When the primary request has not answered after the
+    `percentile` latency of recent requests, a second one is sent (to
+    `fallback_model` if set); the first to succeed wins and the other is
+    cancelled. A token bucket that earns `budget` hedges per request, up to
+    `burst`, caps the extra provider spend at roughly that fraction.
+
+    The cancelled attempt has usually been billed for its prompt already;
+    the gateway records that estimate as LLMCall.hedge_tokens. It is a lower
+    bound (completion tokens generated before the cancel are unknown) and is
+    not charged to user quotas, which only see the winning answer.
+    """
+
+    def __init__(self, enabled, percentile, budget, burst, min_delay, window, min_samples, fallback_model=None):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.fallback_model = fallback_model
+        self.latencies = deque(maxlen=window)
+        self.tokens = burst
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Seconds to wait before hedging, or None until enough latencies are known."""
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def _observe(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def _earn(self):
+        with self._lock:
+            self.counters["requests"] += 1
+            self.tokens = min(self.burst, self.tokens + self.budget)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _spend(self):
+        with self._lock:
+            if self.tokens < 1:
+                self.counters["budget_denied"] += 1
+                return False
+            self.tokens -= 1
+            self.counters["hedged"] += 1
+            return True
+
+    def hedge_payload(self, payload):
+        return {**payload, "model": self.fallback_model} if self.fallback_model else payload
+
+    async def run(self, payload, attempt):
+        """
+        Return (result, payload) from `attempt(payload, hedge=False)`, hedged
+        with `attempt(hedge_payload, hedge=True)` when it is slow. Errors only
+        surface once every attempt in flight has failed; the primary's wins.
+        """
+        self._earn()
+        delay = self.delay()
+        started = time.monotonic()
+        primary = asyncio.ensure_future(attempt(payload, hedge=False))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._spend():
+                result = await primary
+                self._observe(time.monotonic() - started)
+                return result, payload
+
+            hedge_payload = self.hedge_payload(payload)
+            hedge = asyncio.ensure_future(attempt(hedge_payload, hedge=True))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (primary, hedge):
+                    if task in done and task.exception() is None:
+                        if task is primary:
+                            self._observe(time.monotonic() - started)
+                            self._count("primary_wins")
+                            return task.result(), payload
+                        self._count("hedge_wins")
+                        return task.result(), hedge_payload
+            return primary.result(), payload
+        finally:
+            if not primary.done():
+                # A lower bound, but leaving slow primaries out would drag
+                # the percentile down and hedge ever more eagerly.
+                self._observe(time.monotonic() - started)
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self):
+        delay = self.delay()
+        with self._lock:
+            counters = dict(self.counters)
+            tokens = self.tokens
+        requests = counters.get("requests", 0)
+        hedged = counters.get("hedged", 0)
+        return {
+            "enabled": self.enabled,
+            "requests": requests,
+            "hedged": hedged,
+            "hedge_rate": hedged / requests if requests else 0,
+            "hedge_wins": counters.get("hedge_wins", 0),
+            "primary_wins": counters.get("primary_wins", 0),
+            "budget_denied": counters.get("budget_denied", 0),
+            "budget_tokens": tokens,
+            "delay_seconds": delay,
+            "fallback_model": self.fallback_model,
+        }
+
+
+hedger = Hedger(
+    enabled=settings.LLM_HEDGE_ENABLED,
+    percentile=settings.LLM_HEDGE_PERCENTILE,
+    budget=settings.LLM_HEDGE_BUDGET,
+    burst=settings.LLM_HEDGE_BURST,
+    min_delay=settings.LLM_HEDGE_MIN_DELAY,
+    window=settings.LLM_HEDGE_WINDOW,
+    min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+    fallback_model=settings.LLM_HEDGE_MODEL,
+)
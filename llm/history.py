@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from django.conf import settings
+from . import gateway
+from .scheduler import PRIORITY_BACKGROUND
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an insurance assistant. "
+    "Merge the previous summary with the new turns into one concise summary. Keep names, dates, "
+    "amounts, claim details and open questions. Reply with the summary only."
+)
+
+_refreshing = set()
+_background_tasks = set()
+
+
+def to_chat_messages(turns):
+    return [
+        {"role": "assistant" if m.sender == "ai" else "user", "content": m.content}
+        for m in turns
+    ]
+
+
+def summary_message(summary):
+    return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+
+
+async def load_history(queryset, summarized_through, budget):
+    """
+    Return (window, fold_before) for the messages newer than `summarized_through`.
+
+    `window` is the newest run of messages (oldest first) that fits in `budget`
+    tokens and always contains the latest message. `fold_before` is the id of
+    the window's oldest message when at least LLM_SUMMARY_BATCH unsummarized
+    messages sit below it and should be folded into the rolling summary (see
+    fold_history), else None. Fewer than that wait for the next batch.
+    """
+    rows = [
+        m async for m in queryset.filter(id__gt=summarized_through)
+        .order_by("-id")
+        .only("id", "sender", "content", "token_count")[:settings.LLM_HISTORY_MAX_MESSAGES]
+    ]
+
+    uncounted = [m for m in rows if m.token_count is None]
+    for m in uncounted:
+        m.token_count = estimate_tokens(m.content)
+    if uncounted:
+        await queryset.model.objects.abulk_update(uncounted, ["token_count"])
+
+    window, used = [], 0
+    for m in rows:
+        if window and used + m.token_count > budget:
+            break
+        used += m.token_count
+        window.append(m)
+
+    fold_before = None
+    if window:
+        below = queryset.filter(id__gt=summarized_through, id__lt=window[-1].id).order_by("id")
+        if await below[settings.LLM_SUMMARY_BATCH - 1:].aexists():
+            fold_before = window[-1].id
+
+    return window[::-1], fold_before
+
+
+async def fold_history(queryset, summary, summarized_through, before, save, context=None):
+    """
+    Fold the unsummarized messages below id `before` into `summary`, oldest
+    first, one LLM_SUMMARY_BATCH per summarization call. Each step is stored
+    with `save(summary, from_id, to_id)`, which returns False when another
+    refresh advanced the room first; folding stops there.
+    """
+    while True:
+        turns = [
+            m async for m in queryset.filter(id__gt=summarized_through, id__lt=before)
+            .order_by("id")
+            .only("id", "sender", "content")[:settings.LLM_SUMMARY_BATCH]
+        ]
+        if len(turns) < settings.LLM_SUMMARY_BATCH:
+            return summary
+        summary = await summarize(summary, turns, context)
+        if not await save(summary, summarized_through, turns[-1].id):
+            return summary
+        summarized_through = turns[-1].id
+
+
+async def summarize(summary, turns, context=None):
+    transcript = "\n".join(f"{m.sender}: {m.content}" for m in turns)
+    payload = {
+        "model": gateway.MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Previous summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+        ]
+    }
+    return await gateway.complete(payload, priority=PRIORITY_BACKGROUND, context=context)
+
+
+def schedule_summary_refresh(key, coro_factory):
+    """Run a summary refresh in the background, at most one per room per process."""
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+
+    async def run():
+        try:
+            await coro_factory()
+        except gateway.LLMError as e:
+            logger.warning("Summary refresh for %s failed: %s", key, e)
+        finally:
+            _refreshing.discard(key)
+
+    task = asyncio.get_running_loop().create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def wait_for_refreshes():
+    """Await the refreshes started on this event loop, before it is closed."""
+    loop = asyncio.get_running_loop()
+    pending = [task for task in _background_tasks if task.get_loop() is loop]
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import threading
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from AI_Powered_Insurance_App.deadlines import DependencyUnavailable
+from .client import close_clients, warm_up
+from .exceptions import LLMError
+from .history import wait_for_refreshes
+from .models import ReplyJob
+
+logger = logging.getLogger(__name__)
+
+# Event loop reply jobs run on in this worker process; see start_worker_loop().
+_worker_loop = None
+
+
+async def enqueue(task, user, app_label, user_msg):
+    """
+    Record a reply job for user_msg and hand it to the worker queue. When the
+    broker cannot take it, the job is marked failed, user_msg is deleted so
+    no unanswered message is left behind, and DependencyUnavailable is raised.
+    """
+    job = await ReplyJob.objects.acreate(
+        user=user,
+        app_label=app_label,
+        room_id=user_msg.room_id,
+        user_message_id=user_msg.id,
+    )
+    try:
+        await sync_to_async(task.delay)(str(job.id))
+    except Exception as e:
+        logger.exception("Could not queue reply job %s", job.pk)
+        job.status = ReplyJob.FAILED
+        job.error = {"error": "Reply could not be queued"}
+        job.finished_at = timezone.now()
+        await job.asave(update_fields=["status", "error", "finished_at"])
+        await user_msg.adelete()
+        raise DependencyUnavailable("queue") from e
+    return job
+
+
+def run(job_id, produce):
+    """
+    Worker side of a reply job: produce(job) is awaited to generate and
+    persist the ai message, and the job row records the outcome.
+    """
+    # Claimed in one UPDATE: Celery may deliver a task twice, and only one
+    # delivery may generate the reply.
+    claimed = ReplyJob.objects.filter(pk=job_id, status=ReplyJob.QUEUED).update(status=ReplyJob.RUNNING)
+    job = ReplyJob.objects.select_related("user").get(pk=job_id)
+    if not claimed:
+        return job.status
+
+    try:
+        ai_msg = _generate(produce, job)
+    except LLMError as e:
+        job.status = ReplyJob.FAILED
+        job.error = e.detail
+    except Exception:
+        logger.exception("Reply job %s failed", job.pk)
+        job.status = ReplyJob.FAILED
+        job.error = {"error": "Reply generation failed"}
+    else:
+        job.status = ReplyJob.SUCCEEDED
+        job.ai_message_id = ai_msg.id
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "ai_message_id", "finished_at"])
+
+    if settings.LLM_JOB_PUSH:
+        notify(job, ai_msg.content if job.status == ReplyJob.SUCCEEDED else "")
+    return job.status
+
+
+def start_worker_loop():
+    """
+    Give this worker process one long-lived event loop, on a thread of its
+    own, and warm its LLM client. Reply jobs then share that loop's warm
+    connection pool; without it (eager mode, pools that skip
+    worker_process_init) each job runs on a loop of its own.
+    """
+    global _worker_loop
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="llm-jobs", daemon=True).start()
+    asyncio.run_coroutine_threadsafe(warm_up(), loop)
+    _worker_loop = loop
+
+
+def _generate(produce, job):
+    if _worker_loop is None:
+        return async_to_sync(_produce)(produce, job)
+    return asyncio.run_coroutine_threadsafe(_produce_on_worker_loop(produce, job), _worker_loop).result()
+
+
+async def _produce(produce, job):
+    try:
+        return await produce(job)
+    finally:
+        # Each async_to_sync call runs on a fresh loop that closes when it
+        # returns: finish the summary refreshes the turn started, then drop
+        # its client pool.
+        await wait_for_refreshes()
+        await close_clients()
+
+
+async def _produce_on_worker_loop(produce, job):
+    try:
+        return await produce(job)
+    finally:
+        await wait_for_refreshes()
+        # The ORM calls ran on sync_to_async's thread, which outlives the
+        # job; Celery only tidies the connections of its own thread.
+        await sync_to_async(close_old_connections)()
+
+
+def notify(job, content):
+    if job.status == ReplyJob.SUCCEEDED:
+        title, body = "New reply", content[:120]
+    else:
+        title, body = "Reply failed", "We couldn't generate a reply. Please try again."
+
+    data = {
+        "type": "chat_reply",
+        "job": str(job.pk),
+        "status": job.status,
+        "app": job.app_label,
+        "room": str(job.room_id),
+        "message": str(job.ai_message_id or ""),
+    }
+    try:
+        from notification.utils import send_push_notification_to_users
+        send_push_notification_to_users([job.user], title, body, data)
+    except Exception:
+        logger.exception("Push notification for reply job %s failed", job.pk)
@@ -0,0 +1,41 @@
+import sys
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from archive.store import SOURCES, aarchived_rows
+from generalchat.export import FORMATS, chain_rows, encode, message_rows
+
+
+class Command(BaseCommand):
+    help = "Stream chat transcripts as NDJSON or CSV, optionally gzip-compressed, in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("app", choices=sorted(SOURCES))
+        parser.add_argument("rooms", nargs="*", type=int, help="Room (or case) ids; all rooms when omitted.")
+        parser.add_argument("--user", type=int, help="Only rooms owned by this user id.")
+        parser.add_argument("--format", dest="fmt", choices=sorted(FORMATS), default="ndjson")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("-o", "--output", default="-", help="Output file, or - for stdout.")
+
+    def handle(self, *args, **options):
+        app = options["app"]
+        model, room_model, owner_field = SOURCES[app]
+        rooms = room_model.objects.order_by("pk")
+        if options["rooms"]:
+            rooms = rooms.filter(pk__in=options["rooms"])
+        if options["user"]:
+            rooms = rooms.filter(**{owner_field: options["user"]})
+
+        # Room by room, each room's archive before its hot rows: a room's
+        # archived ids all sit below its hot ones, so the output is grouped
+        # by room and in id order within each.
+        rows = chain_rows(*(
+            chain_rows(aarchived_rows(app, [room_id]), message_rows(model.objects.filter(room_id=room_id)))
+            for room_id in rooms.values_list("pk", flat=True)
+        ))
+        out = sys.stdout.buffer if options["output"] == "-" else open(options["output"], "wb")
+        with out:
+            async_to_sync(self.write)(out, encode(rows, options["fmt"], options["gzip"]))
+
+    async def write(self, out, chunks):
+        async for chunk in chunks:
+            out.write(chunk)
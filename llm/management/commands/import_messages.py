@@ -0,0 +1,42 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from generalchat.models import Message
+from premiumchat.models import PremiumMessage
+
+MODELS = {
+    "generalchat": Message,
+    "premiumchat": PremiumMessage,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-import chat messages from NDJSON, one {\"room\", \"sender\", \"content\"} object per line, "
+        "in batched transactions. Rooms' activity counters and the retrieval index are updated per batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("app", choices=sorted(MODELS))
+        parser.add_argument("path", help="NDJSON file, or - for stdin.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        model = MODELS[options["app"]]
+        stream = sys.stdin if options["path"] == "-" else open(options["path"], encoding="utf-8")
+        batch, total = [], 0
+        with stream:
+            for lineno, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    batch.append(model(room_id=int(row["room"]), sender=row["sender"], content=row["content"]))
+                except (ValueError, KeyError, TypeError) as e:
+                    raise CommandError(f"Line {lineno}: {e}")
+                if len(batch) >= options["batch_size"]:
+                    total += len(model.objects.add_messages(batch))
+                    batch = []
+            if batch:
+                total += len(model.objects.add_messages(batch))
+        self.stdout.write(f"Imported {total} messages")
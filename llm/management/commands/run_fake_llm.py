@@ -0,0 +1,90 @@
+import asyncio
+import json
+import random
+import time
+import uuid
+from aiohttp import web
+from django.core.management.base import BaseCommand
+
+LOREM = (
+    "Thanks for reaching out. Based on what you described, the next step is to gather your policy "
+    "number, the date of the incident and any photos or receipts, then contact your insurer to open "
+    "a claim. Keep copies of everything you send and note the name of each adjuster you speak with."
+).split()
+
+
+class Command(BaseCommand):
+    help = "Serve a fake OpenAI-compatible chat completions API for offline development and load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument("--ttft", type=float, default=0.3, help="Seconds before the first token.")
+        parser.add_argument("--token-interval", type=float, default=0.02, help="Seconds between streamed tokens.")
+        parser.add_argument("--tokens", type=int, default=60, help="Completion length in tokens.")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+        parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429.")
+
+    def handle(self, *args, **options):
+        app = web.Application()
+        app["options"] = options
+        app.router.add_get("/v1/models", self.models)
+        app.router.add_get("/openai/v1/models", self.models)
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/openai/v1/chat/completions", self.chat_completions)
+        self.stdout.write(f"Fake LLM listening on http://{options['host']}:{options['port']}/v1/chat/completions")
+        web.run_app(app, host=options["host"], port=options["port"], print=None)
+
+    async def models(self, request):
+        return web.json_response({"object": "list", "data": [{"id": "fake", "object": "model"}]})
+
+    async def chat_completions(self, request):
+        options = request.app["options"]
+        body = await request.json()
+
+        roll = random.random()
+        if roll < options["rate_limit_rate"]:
+            return web.json_response({"error": {"message": "Rate limit reached"}}, status=429, headers={"Retry-After": "1"})
+        if roll < options["rate_limit_rate"] + options["error_rate"]:
+            return web.json_response({"error": {"message": "Service unavailable"}}, status=503)
+
+        words = [random.choice(LOREM) for _ in range(options["tokens"])]
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "fake")
+
+        await asyncio.sleep(options["ttft"])
+
+        if not body.get("stream"):
+            await asyncio.sleep(options["token_interval"] * len(words))
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await resp.prepare(request)
+        for i, word in enumerate(words):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else f" {word}"}, "finish_reason": None}],
+            }
+            await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(options["token_interval"])
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "x_groq": {"usage": usage},
+        }
+        await resp.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+        await resp.write_eof()
+        return resp
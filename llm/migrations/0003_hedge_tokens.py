@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('llm', '0002_usage_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmcall',
+            name='hedge_tokens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='modeldailyusage',
+            name='hedge_tokens',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('llm', '0004_quota_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmcall',
+            name='route',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
@@ -0,0 +1,96 @@
+import uuid
+from django.db import models
+from users.models import CustomUser as User
+
+class ReplyJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    statuses = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="reply_jobs")
+    app_label = models.CharField(max_length=50)
+    room_id = models.PositiveBigIntegerField()
+    user_message_id = models.PositiveBigIntegerField()
+    ai_message_id = models.PositiveBigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=statuses, default=QUEUED)
+    error = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.app_label} job {self.id} ({self.status})"
+
+class LLMCall(models.Model):
+    """Append-only ledger row for one gateway call (or one response-cache hit)."""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    app_label = models.CharField(max_length=50, blank=True)
+    room_id = models.PositiveBigIntegerField(null=True, blank=True)
+    model = models.CharField(max_length=100)
+    # Route the request was sent down (see llm.router); `model` is the one
+    # that answered, which differs after a fallback.
+    route = models.CharField(max_length=50, blank=True)
+    streamed = models.BooleanField(default=False)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    ttft_ms = models.PositiveIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Estimated prompt tokens of hedged attempts (see llm.hedging): each
+    # hedge sent puts a second copy of the prompt in front of the provider.
+    hedge_tokens = models.PositiveIntegerField(default=0)
+    cache_hit = models.BooleanField(default=False)
+    error = models.CharField(max_length=50, blank=True)
+
+class UserDailyUsage(models.Model):
+    day = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="llm_usage")
+    calls = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "day"], name="llm_user_daily_usage_unique"),
+        ]
+
+class ModelDailyUsage(models.Model):
+    day = models.DateField()
+    model = models.CharField(max_length=100)
+    calls = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    hedge_tokens = models.PositiveBigIntegerField(default=0)
+    latency_p50_ms = models.PositiveIntegerField(default=0)
+    latency_p95_ms = models.PositiveIntegerField(default=0)
+    latency_max_ms = models.PositiveIntegerField(default=0)
+    ttft_p50_ms = models.PositiveIntegerField(null=True, blank=True)
+    ttft_p95_ms = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["model", "day"], name="llm_model_daily_usage_unique"),
+        ]
+
+class QuotaCounter(models.Model):
+    """Database fallback for the per-user quota counters (see llm.quotas)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    window = models.PositiveIntegerField()
+    messages = models.PositiveIntegerField(default=0)
+    tokens = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "window"], name="llm_quota_counter_unique"),
+        ]
@@ -0,0 +1,121 @@
+"""
+System prompt registry.
+
+Prompts are compiled once at import for every (app, language, case type)
+combination, so a given key always yields the same bytes and the provider
+can reuse its cached prefix across requests. Anything that changes per room
+(case header, retrieval context, summary) goes in the messages after it.
+Bump VERSION when any template text changes; it is stored on each ai
+message so replies can be traced back to the prompt that produced them.
+"""
+import re
+
+VERSION = 1
+
+DEFAULT_LANGUAGE = "en"
+
+BASE = {
+    "generalchat": {
+        "en": (
+            "You are a helpful assistant for an insurance app. Answer questions about "
+            "insurance, claims and the app clearly and concisely. If you are not sure, "
+            "say so instead of guessing."
+        ),
+        "es": (
+            "Eres un asistente útil de una aplicación de seguros. Responde con claridad "
+            "y brevedad a preguntas sobre seguros, reclamaciones y la aplicación. Si no "
+            "estás seguro, dilo en lugar de adivinar. Responde siempre en español."
+        ),
+    },
+    "premiumchat": {
+        "en": (
+            "You are an insurance claims assistant helping the user with their own injury "
+            "case. Use the case details and excerpts provided to give specific, practical "
+            "guidance. Do not invent facts about the case, and recommend a professional "
+            "for legal or medical decisions."
+        ),
+        "es": (
+            "Eres un asistente de reclamaciones de seguros que ayuda al usuario con su "
+            "propio caso de lesiones. Usa los datos y fragmentos del caso para dar "
+            "orientación concreta y práctica. No inventes hechos sobre el caso y recomienda "
+            "a un profesional para decisiones legales o médicas. Responde siempre en español."
+        ),
+    },
+}
+
+# Extra guidance per case type, matched against Case.type_of_injury.
+CASE_TYPES = {
+    "vehicle": {
+        "keywords": ("car", "auto", "vehicle", "motorcycle", "truck", "traffic", "crash", "coche", "tráfico"),
+        "en": "This is a vehicle accident case: police reports, other drivers' insurers and repair estimates matter.",
+        "es": "Es un caso de accidente de tráfico: importan el atestado policial, la aseguradora del otro conductor y los presupuestos de reparación.",
+    },
+    "workplace": {
+        "keywords": ("work", "workplace", "job", "employer", "trabajo", "laboral"),
+        "en": "This is a workplace injury case: employer reporting deadlines and workers' compensation rules matter.",
+        "es": "Es un caso de lesión laboral: importan los plazos para informar al empleador y las normas de compensación laboral.",
+    },
+    "medical": {
+        "keywords": ("medical", "malpractice", "hospital", "surgery", "médica", "médico", "negligencia"),
+        "en": "This is a medical injury case: medical records and expert opinions matter.",
+        "es": "Es un caso de lesión médica: importan los historiales clínicos y las opiniones de expertos.",
+    },
+}
+
+
+class Prompt:
+    __slots__ = ("app_label", "language", "case_type", "text", "version")
+
+    def __init__(self, app_label, language, case_type, text):
+        self.app_label = app_label
+        self.language = language
+        self.case_type = case_type
+        self.text = text
+        self.version = f"{app_label}/{language}/{case_type or 'default'}@{VERSION}"
+
+    def message(self):
+        return {"role": "system", "content": self.text}
+
+
+def _compile():
+    registry = {}
+    for app_label, languages in BASE.items():
+        for language, text in languages.items():
+            registry[app_label, language, None] = Prompt(app_label, language, None, text)
+            if app_label != "premiumchat":
+                continue
+            for case_type, extra in CASE_TYPES.items():
+                registry[app_label, language, case_type] = Prompt(
+                    app_label, language, case_type, f"{text}\n{extra[language]}"
+                )
+    return registry
+
+
+REGISTRY = _compile()
+_BY_TEXT = {p.text: p for p in REGISTRY.values()}
+
+
+def case_type(type_of_injury):
+    """The CASE_TYPES key for a free-text injury type, or None."""
+    words = set(re.findall(r"\w+", (type_of_injury or "").lower()))
+    for name, spec in CASE_TYPES.items():
+        if words.intersection(spec["keywords"]):
+            return name
+    return None
+
+
+def get(app_label, language=None, case_type=None):
+    """The compiled prompt for the key, falling back to the default case type and language."""
+    language = language if (app_label, language, None) in REGISTRY else DEFAULT_LANGUAGE
+    return REGISTRY.get((app_label, language, case_type)) or REGISTRY[app_label, language, None]
+
+
+def lookup(payload):
+    """The registry prompt that opens `payload`, or None."""
+    return _BY_TEXT.get(payload["messages"][0]["content"])
+
+
+def version_of(payload):
+    """The version of the registry prompt that opens `payload`, or "" for anything else."""
+    prompt = lookup(payload)
+    return prompt.version if prompt else ""
@@ -0,0 +1,207 @@
+"""
+Per-user daily message and token quotas, with limits per tier.
+
+Counts live in fixed windows of `period` seconds. The rolling total is
+estimated from the current window plus the part of the previous window
+that still overlaps the last `period` seconds, so every check touches two
+counters at most. Redis holds the counters when LLM_QUOTA_REDIS_URL is set,
+with a per-process map standing in when it is not. The QuotaCounter table
+takes over while Redis is unreachable.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+import weakref
+from asgiref.sync import sync_to_async
+from cachetools import TTLCache
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+from redis import RedisError
+from redis import asyncio as aioredis
+from .models import QuotaCounter
+
+logger = logging.getLogger(__name__)
+
+
+def tier(user):
+    return "subscribed" if user.is_subscribed else "free"
+
+
+class LocalStore:
+    def __init__(self, period, maxsize=100000):
+        self.counters = TTLCache(maxsize=maxsize, ttl=2 * period)
+        self._lock = threading.Lock()
+
+    async def add(self, user_id, window, messages, tokens):
+        with self._lock:
+            current = self.counters.get((user_id, window)) or [0, 0]
+            current = [current[0] + messages, current[1] + tokens]
+            self.counters[user_id, window] = current
+            previous = self.counters.get((user_id, window - 1)) or [0, 0]
+        return current, previous
+
+
+class RedisStore:
+    def __init__(self, url, period, prefix="llm:quota:"):
+        self.url = url
+        self.period = period
+        self.prefix = prefix
+        self._redis = weakref.WeakKeyDictionary()
+
+    def _get_redis(self):
+        loop = asyncio.get_running_loop()
+        client = self._redis.get(loop)
+        if client is None:
+            client = self._redis[loop] = aioredis.from_url(self.url, decode_responses=True)
+        return client
+
+    async def add(self, user_id, window, messages, tokens):
+        key = f"{self.prefix}{user_id}:{window}"
+        async with self._get_redis().pipeline(transaction=True) as pipe:
+            pipe.hincrby(key, "m", messages)
+            pipe.hincrby(key, "t", tokens)
+            pipe.expire(key, 2 * self.period)
+            pipe.hmget(f"{self.prefix}{user_id}:{window - 1}", "m", "t")
+            m, t, _, previous = await pipe.execute()
+        return [m, t], [int(v or 0) for v in previous]
+
+
+class DatabaseStore:
+    async def add(self, user_id, window, messages, tokens):
+        return await sync_to_async(self._add)(user_id, window, messages, tokens)
+
+    def _add(self, user_id, window, messages, tokens):
+        counters = QuotaCounter.objects.filter(user_id=user_id, window=window)
+        if not counters.update(messages=F("messages") + messages, tokens=F("tokens") + tokens):
+            try:
+                with transaction.atomic():
+                    QuotaCounter.objects.create(
+                        user_id=user_id, window=window, messages=max(messages, 0), tokens=max(tokens, 0)
+                    )
+            except IntegrityError:
+                counters.update(messages=F("messages") + messages, tokens=F("tokens") + tokens)
+        rows = dict(
+            (w, [m, t]) for w, m, t in QuotaCounter.objects.filter(
+                user_id=user_id, window__in=[window, window - 1]
+            ).values_list("window", "messages", "tokens")
+        )
+        return rows.get(window, [0, 0]), rows.get(window - 1, [0, 0])
+
+
+class QuotaStatus:
+    """Where a user stands after a check; `headers()` reports it to the client."""
+
+    def __init__(self, tier, limits, used, retry_after=0):
+        self.tier = tier
+        self.limits = limits
+        self.used = used
+        self.retry_after = retry_after
+
+    @property
+    def allowed(self):
+        return not self.retry_after
+
+    def remaining(self, name):
+        return max(0, self.limits[name] - self.used[name])
+
+    def headers(self):
+        headers = {"X-Quota-Tier": self.tier}
+        for name in ("messages", "tokens"):
+            if self.limits.get(name):
+                headers[f"X-Quota-{name.title()}-Limit"] = str(self.limits[name])
+                headers[f"X-Quota-{name.title()}-Remaining"] = str(self.remaining(name))
+        if self.retry_after:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+    def apply(self, response):
+        for name, value in self.headers().items():
+            response[name] = value
+        return response
+
+
+class Quotas:
+    def __init__(self, limits, period, redis_url=None):
+        self.limits = limits
+        self.period = period
+        self.primary = RedisStore(redis_url, period) if redis_url else LocalStore(period)
+        self.fallback = DatabaseStore()
+
+    async def _add(self, user_id, messages=0, tokens=0):
+        now = time.time()
+        window = int(now // self.period)
+        try:
+            current, previous = await self.primary.add(user_id, window, messages, tokens)
+        except RedisError as e:
+            logger.warning("Quota counters unavailable, using the database: %s", e)
+            current, previous = await self.fallback.add(user_id, window, messages, tokens)
+        overlap = 1 - (now % self.period) / self.period
+        used = {
+            "messages": current[0] + previous[0] * overlap,
+            "tokens": current[1] + previous[1] * overlap,
+        }
+        return used, current, previous, now % self.period
+
+    def _retry_after(self, budget, current, previous, elapsed):
+        """
+        Whole seconds until the rolling total, `current` in this window plus
+        the overlapping share of `previous`, is down to `budget`. Rounded past
+        the exact instant so a retry right then is on the allowed side.
+        """
+        if current <= budget:
+            if not previous:
+                return 1
+            wait = self.period * (1 - (budget - current) / previous) - elapsed
+        else:
+            # Over on this window's count alone: after the rollover it is the
+            # previous window's count and has to decay through the next one.
+            wait = self.period - elapsed + self.period * (1 - budget / current)
+        return max(1, math.floor(wait) + 1)
+
+    async def consume(self, user):
+        """Count one message against the user's quota; refused messages are not counted."""
+        name = tier(user)
+        limits = self.limits.get(name, {})
+        if not any(limits.values()):
+            return QuotaStatus(name, limits, {"messages": 0, "tokens": 0})
+
+        used, current, previous, elapsed = await self._add(user.pk, messages=1)
+        retry_after = 0
+        for i, key in enumerate(("messages", "tokens")):
+            limit = limits.get(key)
+            # A message is allowed up to and including the limit; tokens
+            # only need headroom left.
+            if limit and (used[key] > limit if key == "messages" else used[key] >= limit):
+                # Either way the next message needs the total at limit - 1 at
+                # most, not counting the message refused here.
+                counted = current[i] - 1 if key == "messages" else current[i]
+                retry_after = max(retry_after, self._retry_after(limit - 1, counted, previous[i], elapsed))
+        if retry_after:
+            used, *_ = await self._add(user.pk, messages=-1)
+        return QuotaStatus(name, limits, {k: math.ceil(v) for k, v in used.items()}, retry_after)
+
+    async def refund(self, user, status):
+        """Take back the message consume() counted; returns the updated status."""
+        if not any(status.limits.values()):
+            return status
+        used, *_ = await self._add(user.pk, messages=-1)
+        return QuotaStatus(status.tier, status.limits, {k: math.ceil(v) for k, v in used.items()})
+
+    async def charge_tokens(self, user_id, tokens):
+        """Add tokens the user's LLM calls used; called from the usage ledger."""
+        if not user_id or not tokens:
+            return
+        try:
+            await self._add(user_id, tokens=tokens)
+        except DatabaseError as e:
+            logger.warning("Could not charge %d tokens to user %s: %s", tokens, user_id, e)
+
+    def prune(self):
+        """Drop database counters that no longer overlap the rolling window."""
+        QuotaCounter.objects.filter(window__lt=int(time.time() // self.period) - 1).delete()
+
+
+quotas = Quotas(settings.LLM_QUOTAS, settings.LLM_QUOTA_PERIOD, settings.LLM_QUOTA_REDIS_URL)
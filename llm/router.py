@@ -0,0 +1,93 @@
+"""
+Per-request model routing.
+
+Each chat prompt gets a cheap local score from the latest user message
+(length, questions, claim vocabulary) and its context (premium case chat,
+retrieved case excerpts). The highest route in LLM_ROUTES whose min_score
+it reaches picks the model, so the fast model stays on the common path.
+The gateway moves to LLM_MODEL_FALLBACKS[model] when an attempt fails with
+a retryable error. Decisions are logged here; outcomes land in the usage
+ledger with the route name.
+"""
+import logging
+import re
+from django.conf import settings
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+KEYWORDS = {
+    # en
+    "claim", "claims", "coverage", "covered", "liability", "settlement", "deductible", "denied", "denial",
+    "appeal", "lawsuit", "lawyer", "attorney", "negligence", "compensation", "damages", "policy", "premium",
+    "exclusion", "subrogation", "adjuster", "medical", "disability", "statute", "deadline",
+    # es
+    "reclamación", "reclamacion", "cobertura", "responsabilidad", "indemnización", "indemnizacion",
+    "deducible", "denegada", "apelación", "apelacion", "demanda", "abogado", "negligencia",
+    "compensación", "compensacion", "daños", "póliza", "poliza", "discapacidad", "plazo",
+}
+
+_words = re.compile(r"\w+")
+
+
+class Route:
+    def __init__(self, name, model, score, reasons):
+        self.name = name
+        self.model = model
+        self.score = score
+        self.reasons = reasons
+
+
+def score(app_label, messages, case_context=False):
+    """(score, reasons) for the prompt whose last message is the user's."""
+    text = messages[-1]["content"] if messages and messages[-1]["role"] == "user" else ""
+    reasons = []
+
+    tokens = estimate_tokens(text)
+    if tokens > 150:
+        reasons.append(("long", 2))
+    elif tokens > 60:
+        reasons.append(("medium", 1))
+    if text.count("?") > 1:
+        reasons.append(("questions", 1))
+    hits = len(KEYWORDS.intersection(w.lower() for w in _words.findall(text)))
+    if hits:
+        reasons.append(("keywords", min(hits, 3)))
+    if app_label == "premiumchat":
+        reasons.append(("premium", 1))
+    if case_context:
+        reasons.append(("case_context", 1))
+
+    return sum(weight for _, weight in reasons), [name for name, _ in reasons]
+
+
+def route(app_label, messages, case_context=False):
+    """
+    The Route for a chat prompt; `case_context` says retrieved case excerpts
+    are in it. With LLM_ROUTING off everything goes to LLM_MODEL.
+    """
+    if not settings.LLM_ROUTING:
+        return Route("default", settings.LLM_MODEL, 0, [])
+    points, reasons = score(app_label, messages, case_context)
+    routes = sorted(settings.LLM_ROUTES.items(), key=lambda item: item[1]["min_score"])
+    # The lowest route takes scores below every min_score.
+    name, spec = next(
+        ((name, spec) for name, spec in reversed(routes) if points >= spec["min_score"]), routes[0]
+    )
+    logger.info("llm route app=%s route=%s model=%s score=%d reasons=%s",
+                app_label, name, spec["model"], points, ",".join(reasons) or "-")
+    return Route(name, spec["model"], points, reasons)
+
+
+def route_name(model):
+    """The route a requested model belongs to, for the usage ledger."""
+    for name, spec in settings.LLM_ROUTES.items():
+        if spec["model"] == model:
+            return name
+    return ""
+
+
+def fallback(payload):
+    """`payload` retargeted at the fallback for its model, or None if there is none."""
+    model = settings.LLM_MODEL_FALLBACKS.get(payload.get("model"))
+    return {**payload, "model": model} if model else None
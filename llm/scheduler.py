@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from .exceptions import Overloaded
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_PREMIUM = 0
+PRIORITY_GENERAL = 1
+PRIORITY_BACKGROUND = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_PREMIUM: "premium",
+    PRIORITY_GENERAL: "general",
+    PRIORITY_BACKGROUND: "background",
+}
+
+POLL_INTERVAL = 0.05
+
+
+def estimate_request_tokens(payload):
+    prompt = sum(estimate_tokens(m.get("content", "")) for m in payload.get("messages", []))
+    return prompt + payload.get("max_tokens", settings.LLM_EXPECTED_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount):
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class AdmissionScheduler:
+    """
+    Admits outbound completion calls against process-wide requests/min and
+    tokens/min budgets. A caller only draws from the buckets while no caller
+    of a higher priority is waiting, so premium traffic goes first when the
+    budget is tight. Each priority has a bounded queue; callers that would
+    overflow it, or that would wait longer than `max_wait`, are shed with a
+    503 instead of piling up.
+
+    State is guarded by a thread lock rather than tied to an event loop, so
+    the same budget applies to every loop in the process.
+    """
+
+    def __init__(self, rpm, tpm, queue_limits, max_wait):
+        self.buckets = [TokenBucket(rpm), TokenBucket(tpm)] if rpm and tpm else []
+        self.queue_limits = queue_limits
+        self.max_wait = max_wait
+        self.waiting = Counter()
+        self.counters = defaultdict(Counter)
+        self.wait_seconds = Counter()
+        self.max_wait_seconds = Counter()
+        self._lock = threading.Lock()
+
+    def _time_until(self, tokens):
+        return max(
+            self.buckets[0].time_until(1),
+            self.buckets[1].time_until(tokens),
+        )
+
+    def _shed(self, priority, reason, wait):
+        self.counters[priority]["shed"] += 1
+        logger.warning("Shedding %s LLM request: %s", PRIORITY_NAMES[priority], reason)
+        raise Overloaded("Too many requests in flight, please retry shortly", reason, wait=wait)
+
+    async def acquire(self, priority, tokens):
+        """Wait for admission; returns the seconds spent queued."""
+        if not self.buckets:
+            return 0
+
+        with self._lock:
+            if self.waiting[priority] >= self.queue_limits[priority]:
+                self._shed(priority, "queue full", self._time_until(tokens))
+            self.waiting[priority] += 1
+
+        started = time.monotonic()
+        try:
+            while True:
+                with self._lock:
+                    if any(self.waiting[p] for p in range(priority)):
+                        delay = POLL_INTERVAL
+                    else:
+                        delay = self._time_until(tokens)
+                        if delay <= 0:
+                            for bucket, amount in zip(self.buckets, (1, tokens)):
+                                bucket.take(amount)
+                            waited = time.monotonic() - started
+                            self._record_admission(priority, waited)
+                            return waited
+
+                    waited = time.monotonic() - started
+                    if waited + delay > self.max_wait:
+                        self._shed(priority, "budget exhausted", delay)
+
+                await asyncio.sleep(min(delay, POLL_INTERVAL))
+        finally:
+            with self._lock:
+                self.waiting[priority] -= 1
+
+    def _record_admission(self, priority, waited):
+        self.counters[priority]["admitted"] += 1
+        self.wait_seconds[priority] += waited
+        self.max_wait_seconds[priority] = max(self.max_wait_seconds[priority], waited)
+
+    def stats(self):
+        with self._lock:
+            return {
+                PRIORITY_NAMES[p]: {
+                    "queue_depth": self.waiting[p],
+                    "queue_limit": self.queue_limits[p],
+                    "admitted": self.counters[p]["admitted"],
+                    "shed": self.counters[p]["shed"],
+                    "avg_wait_seconds": self.wait_seconds[p] / (self.counters[p]["admitted"] or 1),
+                    "max_wait_seconds": self.max_wait_seconds[p],
+                }
+                for p in PRIORITY_NAMES
+            }
+
+
+scheduler = AdmissionScheduler(
+    rpm=settings.LLM_RATE_LIMIT_RPM,
+    tpm=settings.LLM_RATE_LIMIT_TPM,
+    queue_limits={
+        PRIORITY_PREMIUM: settings.LLM_QUEUE_LIMITS["premium"],
+        PRIORITY_GENERAL: settings.LLM_QUEUE_LIMITS["general"],
+        PRIORITY_BACKGROUND: settings.LLM_QUEUE_LIMITS["background"],
+    },
+    max_wait=settings.LLM_QUEUE_MAX_WAIT,
+)
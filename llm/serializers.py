@@ -0,0 +1,21 @@
+from rest_framework import serializers
+from .models import ModelDailyUsage, ReplyJob, UserDailyUsage
+
+class ReplyJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReplyJob
+        fields = ['id', 'status', 'app_label', 'room_id', 'user_message_id', 'ai_message_id', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
+
+class UserDailyUsageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserDailyUsage
+        fields = ['day', 'calls', 'cache_hits', 'errors', 'prompt_tokens', 'completion_tokens']
+
+class ModelDailyUsageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ModelDailyUsage
+        fields = [
+            'day', 'model', 'calls', 'cache_hits', 'errors', 'prompt_tokens', 'completion_tokens', 'hedge_tokens',
+            'latency_p50_ms', 'latency_p95_ms', 'latency_max_ms', 'ttft_p50_ms', 'ttft_p95_ms'
+        ]
@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import uuid
+import weakref
+from django.conf import settings
+from redis import asyncio as aioredis
+from .exceptions import ProviderUnavailable
+
+LEADER = "leader"
+FOLLOWER = "follower"
+DONE = "done"
+
+POLL_INTERVAL = 0.1
+
+
+class LocalFlightStore:
+    """In-process stand-in for the Redis store; only coalesces within one process."""
+
+    def __init__(self):
+        self.locks = {}
+        self.results = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        for table in (self.locks, self.results):
+            for key in [k for k, (_, expires) in table.items() if expires <= now]:
+                del table[key]
+
+    async def claim(self, key, token, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self.results:
+                return DONE, self.results[key][0]
+            if key in self.locks:
+                return FOLLOWER, None
+            self.locks[key] = (token, now + ttl)
+            return LEADER, None
+
+    async def publish(self, key, token, result, ttl):
+        with self._lock:
+            self.results[key] = (result, time.monotonic() + ttl)
+            if self.locks.get(key, (None,))[0] == token:
+                del self.locks[key]
+
+    async def release(self, key, token):
+        with self._lock:
+            if self.locks.get(key, (None,))[0] == token:
+                del self.locks[key]
+
+    async def poll(self, key):
+        """Return (result, still_in_flight)."""
+        with self._lock:
+            self._expire(time.monotonic())
+            if key in self.results:
+                return self.results[key][0], False
+            return None, key in self.locks
+
+
+class RedisFlightStore:
+    # Compare-and-delete so a leader whose lock already expired cannot drop
+    # the lock of the request that took over.
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url, prefix="llm:flight:"):
+        self.url = url
+        self.prefix = prefix
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _redis(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = aioredis.from_url(self.url, decode_responses=True)
+        return client
+
+    async def claim(self, key, token, ttl):
+        redis = self._redis()
+        if await redis.set(f"{self.prefix}lock:{key}", token, nx=True, px=int(ttl * 1000)):
+            # Lost a race with a just-finished leader: its result still wins.
+            result = await redis.get(f"{self.prefix}result:{key}")
+            if result is not None:
+                await self.release(key, token)
+                return DONE, json.loads(result)
+            return LEADER, None
+        result = await redis.get(f"{self.prefix}result:{key}")
+        if result is not None:
+            return DONE, json.loads(result)
+        return FOLLOWER, None
+
+    async def publish(self, key, token, result, ttl):
+        await self._redis().set(f"{self.prefix}result:{key}", json.dumps(result), px=int(ttl * 1000))
+        await self.release(key, token)
+
+    async def release(self, key, token):
+        await self._redis().eval(self.RELEASE_SCRIPT, 1, f"{self.prefix}lock:{key}", token)
+
+    async def poll(self, key):
+        redis = self._redis()
+        result = await redis.get(f"{self.prefix}result:{key}")
+        if result is not None:
+            return json.loads(result), False
+        return None, bool(await redis.exists(f"{self.prefix}lock:{key}"))
+
+
+class Flights:
+    """
+    Coalesces identical chat turns. The first request for a key becomes the
+    leader and runs the turn; concurrent duplicates, and duplicates arriving
+    within `grace` seconds of it finishing, get the leader's result instead
+    of starting their own turn.
+
+    Keys are the room and message text, so without an idempotency key a user
+    who really does send the same text twice within `grace` gets the first
+    reply back. Clients that send an Idempotency-Key per logical message
+    only have retries of that one message coalesced.
+    """
+
+    def __init__(self, store, lock_ttl, grace):
+        self.store = store
+        self.lock_ttl = lock_ttl
+        self.grace = grace
+
+    def key(self, scope, room_id, text, idempotency_key=None):
+        digest = hashlib.sha256(text.encode())
+        if idempotency_key:
+            digest.update(b"\0" + idempotency_key.encode())
+        return f"{scope}:{room_id}:{digest.hexdigest()}"
+
+    async def claim(self, key):
+        """Return (state, token_or_result): the lock token for the leader, the result when DONE."""
+        token = uuid.uuid4().hex
+        state, result = await self.store.claim(key, token, self.lock_ttl)
+        return state, token if state == LEADER else result
+
+    async def publish(self, key, token, result):
+        await self.store.publish(key, token, result, self.grace)
+
+    async def release(self, key, token):
+        await self.store.release(key, token)
+
+    async def wait(self, key):
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            result, in_flight = await self.store.poll(key)
+            if result is not None:
+                return result
+            if not in_flight:
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+        raise ProviderUnavailable(
+            "The original request for this message did not complete, please retry",
+            wait=1,
+        )
+
+
+flights = Flights(
+    RedisFlightStore(settings.LLM_SINGLEFLIGHT_REDIS_URL) if settings.LLM_SINGLEFLIGHT_REDIS_URL else LocalFlightStore(),
+    lock_ttl=settings.LLM_SINGLEFLIGHT_LOCK_TTL,
+    grace=settings.LLM_SINGLEFLIGHT_GRACE,
+)
@@ -0,0 +1,22 @@
+from datetime import timedelta
+from celery import shared_task
+from celery.signals import worker_process_init
+from django.utils import timezone
+from . import jobs
+from .quotas import quotas
+from .usage import rollup_day
+
+@shared_task
+def rollup_usage():
+    # Yesterday is redone too so calls that landed after its last run count.
+    today = timezone.localdate()
+    for day in (today - timedelta(days=1), today):
+        rollup_day(day)
+
+@shared_task
+def prune_quota_counters():
+    quotas.prune()
+
+@worker_process_init.connect
+def start_reply_loop(**kwargs):
+    jobs.start_worker_loop()
@@ -0,0 +1,714 @@
+import asyncio
+import json
+import os
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import exception_handler
+from generalchat.models import ChatRoom, Message
+from users.models import CustomUser
+from AI_Powered_Insurance_App import deadlines
+from archive.store import archive_room
+from AI_Powered_Insurance_App.deadlines import DeadlineExceeded, DependencyUnavailable
+from . import client, gateway, history, jobs, prompts, router, sse, usage
+from .turns import save_turn
+from .backends import ProviderError
+from .exceptions import CircuitOpen, LLMError, Overloaded, ProviderUnavailable
+from .hedging import Hedger
+from .models import LLMCall, ModelDailyUsage, ReplyJob, UserDailyUsage
+from .quotas import Quotas
+from .singleflight import DONE, FOLLOWER, LEADER, Flights, LocalFlightStore
+from .scheduler import PRIORITY_BACKGROUND, PRIORITY_PREMIUM, AdmissionScheduler, TokenBucket
+
+
+class HistoryTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email="history@example.com", name="History", password="x")
+        self.room = ChatRoom.objects.create(owner=user)
+        # 40 tokens each by the 4-characters-per-token estimate.
+        Message.objects.add_messages([Message(room=self.room, sender="user", content=f"{i:<160}") for i in range(30)])
+        self.ids = list(Message.objects.order_by("id").values_list("id", flat=True))
+        self.messages = self.room.messages.all()
+
+    async def test_window_fits_budget_and_folds_below_it(self):
+        with self.settings(LLM_HISTORY_MAX_MESSAGES=8, LLM_SUMMARY_BATCH=10):
+            window, fold_before = await history.load_history(self.messages, 0, budget=200)
+        self.assertEqual([m.id for m in window], self.ids[-5:])
+        self.assertEqual(fold_before, self.ids[-5])
+
+    async def test_no_fold_until_a_full_batch_is_below_the_window(self):
+        with self.settings(LLM_HISTORY_MAX_MESSAGES=50, LLM_SUMMARY_BATCH=10):
+            window, fold_before = await history.load_history(self.messages, self.ids[15], budget=200)
+        self.assertEqual(len(window), 5)
+        self.assertIsNone(fold_before)
+
+    async def test_fold_walks_up_from_summarized_through(self):
+        saved = []
+
+        async def save(summary, from_id, to_id):
+            saved.append((summary, from_id, to_id))
+            return 1
+
+        async def complete(payload, **kwargs):
+            return f"summary {len(saved)}"
+
+        with self.settings(LLM_SUMMARY_BATCH=10), mock.patch.object(history.gateway, "complete", complete):
+            summary = await history.fold_history(self.messages, "", 0, self.ids[25], save)
+        # 25 messages below the window: two full batches, five left for later.
+        self.assertEqual(saved, [("summary 0", 0, self.ids[9]), ("summary 1", self.ids[9], self.ids[19])])
+        self.assertEqual(summary, "summary 1")
+
+    async def test_fold_stops_when_another_refresh_won(self):
+        calls = []
+
+        async def complete(payload, **kwargs):
+            calls.append(payload)
+            return "summary"
+
+        async def save(summary, from_id, to_id):
+            return 0
+
+        with self.settings(LLM_SUMMARY_BATCH=10), mock.patch.object(history.gateway, "complete", complete):
+            await history.fold_history(self.messages, "", 0, self.ids[25], save)
+        self.assertEqual(len(calls), 1)
+
+
+class QuotaTests(SimpleTestCase):
+    period = 100
+    user = SimpleNamespace(pk=1, is_subscribed=False)
+
+    def setUp(self):
+        self.now = 1000 * self.period
+        patcher = mock.patch("llm.quotas.time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def quotas(self, messages=5, tokens=0):
+        return Quotas({"free": {"messages": messages, "tokens": tokens}}, self.period)
+
+    async def fill(self, quotas, at, count):
+        self.now = at
+        for _ in range(count):
+            self.assertTrue((await quotas.consume(self.user)).allowed)
+
+    async def assert_retry_after_is_tight(self, quotas):
+        refused = await quotas.consume(self.user)
+        self.assertFalse(refused.allowed)
+        start = self.now
+        # Retry-After is rounded up past the exact instant, by at most a second.
+        if refused.retry_after > 2:
+            self.now = start + refused.retry_after - 2
+            self.assertFalse((await quotas.consume(self.user)).allowed)
+        self.now = start + refused.retry_after
+        self.assertTrue((await quotas.consume(self.user)).allowed)
+
+    async def test_retry_after_over_limit_in_current_window(self):
+        for elapsed in (0, 10, 50, 99):
+            with self.subTest(elapsed=elapsed):
+                quotas = self.quotas()
+                await self.fill(quotas, 1000 * self.period + elapsed, 5)
+                await self.assert_retry_after_is_tight(quotas)
+
+    async def test_retry_after_with_previous_window_share(self):
+        for elapsed in (5, 10, 15):
+            with self.subTest(elapsed=elapsed):
+                quotas = self.quotas()
+                await self.fill(quotas, 999 * self.period + 90, 5)
+                self.now = 1000 * self.period + elapsed
+                await self.assert_retry_after_is_tight(quotas)
+
+    async def test_tokens_limit(self):
+        quotas = self.quotas(messages=0, tokens=1000)
+        self.now = 1000 * self.period + 30
+        await quotas._add(self.user.pk, tokens=1000)
+        await self.assert_retry_after_is_tight(quotas)
+
+    async def test_refused_and_refunded_messages_are_not_counted(self):
+        quotas = self.quotas()
+        await self.fill(quotas, 1000 * self.period, 5)
+        self.assertFalse((await quotas.consume(self.user)).allowed)
+        status = await quotas.refund(self.user, await quotas.consume(self.user))
+        self.assertEqual(status.remaining("messages"), 1)
+
+
+class EnqueueTests(TestCase):
+    async def test_broker_failure_fails_the_job_and_drops_the_message(self):
+        user = await CustomUser.objects.acreate(email="jobs@example.com", name="Jobs")
+        room = await ChatRoom.objects.acreate(owner=user)
+        user_msg = await Message.objects.acreate(room=room, sender="user", content="hello")
+        message_id = user_msg.pk
+        task = mock.Mock(**{"delay.side_effect": ConnectionError("broker down")})
+
+        with self.assertRaises(DependencyUnavailable), self.assertLogs("llm.jobs", "ERROR"):
+            await jobs.enqueue(task, user, "generalchat", user_msg)
+
+        job = await ReplyJob.objects.aget(user_message_id=message_id)
+        self.assertEqual(job.status, ReplyJob.FAILED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertFalse(await Message.objects.filter(pk=message_id).aexists())
+        await room.arefresh_from_db()
+        self.assertEqual(room.message_count, 0)
+
+
+@override_settings(LLM_JOB_PUSH=False)
+class JobRunTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email="run@example.com", name="Run", password="x")
+        self.job = ReplyJob.objects.create(user=user, app_label="generalchat", room_id=1, user_message_id=1)
+        self.calls = 0
+
+    async def produce(self, job):
+        self.calls += 1
+        return SimpleNamespace(id=42, content="Hi!")
+
+    def test_redelivered_job_is_produced_once(self):
+        self.assertEqual(jobs.run(str(self.job.pk), self.produce), ReplyJob.SUCCEEDED)
+        self.assertEqual(jobs.run(str(self.job.pk), self.produce), ReplyJob.SUCCEEDED)
+        self.assertEqual(self.calls, 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.ai_message_id, 42)
+
+    def test_running_job_is_not_claimed_again(self):
+        ReplyJob.objects.filter(pk=self.job.pk).update(status=ReplyJob.RUNNING)
+        self.assertEqual(jobs.run(str(self.job.pk), self.produce), ReplyJob.RUNNING)
+        self.assertEqual(self.calls, 0)
+
+    @override_settings(LLM_PREWARM_URL="")
+    def test_jobs_share_the_worker_loop(self):
+        loops = []
+
+        async def produce(job):
+            loops.append(asyncio.get_running_loop())
+            return await self.produce(job)
+
+        with mock.patch.object(jobs, "_worker_loop", None):
+            jobs.start_worker_loop()
+            second = ReplyJob.objects.create(user=self.job.user, app_label="generalchat", room_id=1, user_message_id=2)
+            jobs.run(str(self.job.pk), produce)
+            jobs.run(str(second.pk), produce)
+            self.assertEqual(loops, [jobs._worker_loop] * 2)
+            jobs._worker_loop.call_soon_threadsafe(jobs._worker_loop.stop)
+
+
+class LLMErrorTests(SimpleTestCase):
+    def test_sub_second_wait_rounds_up(self):
+        response = exception_handler(ProviderUnavailable("busy", wait=0.2), {})
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(exception_handler(ProviderUnavailable("busy", wait=2.1), {})["Retry-After"], "3")
+
+    def test_upstream_status_stays_an_int(self):
+        response = exception_handler(LLMError("failed", "boom", 503), {})
+        self.assertEqual(response.data, {"error": "failed", "details": "boom", "status": 503})
+        self.assertNotIn("Retry-After", response)
+
+
+class ScriptedBackend:
+    """
+    Plays back one outcome per attempt: an exception to raise, or the reply
+    (for stream(), a list of deltas and exceptions).
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.models = []
+
+    def next(self, payload):
+        self.models.append(payload["model"])
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def complete(self, payload, timeout, usage=None):
+        return self.next(payload)
+
+    async def stream(self, payload, timeout, usage=None):
+        for delta in self.next(payload):
+            if isinstance(delta, Exception):
+                raise delta
+            yield delta
+
+
+@override_settings(LLM_MAX_ATTEMPTS=3, LLM_MODEL_FALLBACKS={}, LLM_RETRY_BACKOFF=1, LLM_RETRY_BACKOFF_MAX=4)
+class GatewayTests(TestCase):
+    payload = {"model": "fast", "messages": [{"role": "user", "content": "hi"}]}
+
+    def setUp(self):
+        self.breaker = gateway.CircuitBreaker(threshold=5, reset_timeout=30)
+        for patcher in (
+            mock.patch.object(gateway, "breaker", self.breaker),
+            mock.patch.object(gateway, "backoff_delay", return_value=0),
+            mock.patch.object(gateway, "logger"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def backend(self, *outcomes):
+        backend = ScriptedBackend(*outcomes)
+        patcher = mock.patch.object(gateway, "_backend", backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return backend
+
+    async def test_retries_429_and_5xx(self):
+        backend = self.backend(ProviderError(429, "slow down"), ProviderError(502, "bad gateway"), "Hello")
+        self.assertEqual(await gateway.complete(self.payload), "Hello")
+        self.assertEqual(len(backend.models), 3)
+        self.assertEqual(self.breaker.failures, 0)
+
+    async def test_stops_at_max_attempts(self):
+        backend = self.backend(*[ProviderError(503, "down")] * 5)
+        with self.assertRaises(ProviderUnavailable) as raised:
+            await gateway.complete(self.payload)
+        self.assertEqual(len(backend.models), 3)
+        self.assertEqual(raised.exception.detail["status"], 503)
+        self.assertEqual(self.breaker.failures, 3)
+
+    async def test_client_errors_are_not_retried(self):
+        backend = self.backend(ProviderError(400, "bad request"), "unused")
+        with self.assertRaises(LLMError) as raised:
+            await gateway.complete(self.payload)
+        self.assertEqual(raised.exception.status_code, 502)
+        self.assertEqual(len(backend.models), 1)
+        self.assertEqual(self.breaker.failures, 0)
+
+    @override_settings(LLM_MODEL_FALLBACKS={"fast": "backup"})
+    async def test_falls_back_to_another_model_without_backoff(self):
+        backend = self.backend(ProviderError(503, "down"), "Hello")
+        self.assertEqual(await gateway.complete(self.payload), "Hello")
+        self.assertEqual(backend.models, ["fast", "backup"])
+        gateway.backoff_delay.assert_not_called()
+
+    async def test_open_circuit_fails_fast_with_a_wait(self):
+        self.breaker.threshold = 2
+        backend = self.backend(*[ProviderError(503, "down")] * 3)
+        with self.assertRaises(ProviderUnavailable):
+            await gateway.complete(self.payload)
+        with self.assertRaises(CircuitOpen) as raised:
+            await gateway.complete(self.payload)
+        self.assertEqual(raised.exception.wait, 30)
+        self.assertEqual(len(backend.models), 2)
+
+    async def test_hedged_call_records_the_extra_prompt(self):
+        hedger = Hedger(enabled=True, percentile=90, budget=0.1, burst=1, min_delay=0.01,
+                        window=10, min_samples=1, fallback_model="backup")
+        hedger._observe(0.01)
+
+        class SlowPrimary:
+            async def complete(self, payload, timeout, usage=None):
+                await asyncio.sleep(1 if payload["model"] == "fast" else 0)
+                return payload["model"]
+
+        with mock.patch.object(gateway, "hedger", hedger), mock.patch.object(gateway, "_backend", SlowPrimary()):
+            self.assertEqual(await gateway.complete(self.payload, hedge=True), "backup")
+
+        call = await LLMCall.objects.aget()
+        self.assertEqual((call.model, call.attempts), ("backup", 2))
+        self.assertGreater(call.hedge_tokens, 0)
+
+    async def test_stream_retries_only_before_the_first_delta(self):
+        backend = self.backend(ProviderError(503, "down"), ["Hel", "lo"], ["Hi", ProviderError(503, "cut off")])
+        self.assertEqual([delta async for delta in gateway.stream(self.payload)], ["Hel", "lo"])
+
+        deltas = []
+        with self.assertRaises(ProviderUnavailable):
+            async for delta in gateway.stream(self.payload):
+                deltas.append(delta)
+        self.assertEqual(deltas, ["Hi"])
+        self.assertEqual(len(backend.models), 3)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        for patcher in (
+            mock.patch.object(gateway.time, "monotonic", lambda: self.now),
+            mock.patch.object(gateway, "logger"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breaker = gateway.CircuitBreaker(threshold=2, reset_timeout=30)
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.breaker.check()
+        self.breaker.record_failure()
+        with self.assertRaises(CircuitOpen) as raised:
+            self.breaker.check()
+        self.assertEqual(raised.exception.wait, 30)
+        self.now += 10
+        self.assertEqual(self.breaker.retry_after(), 20)
+
+    def test_half_open_probe(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now += 30
+        self.breaker.check()
+        # The probe holds the circuit until it reports back.
+        with self.assertRaises(CircuitOpen):
+            self.breaker.check()
+        self.breaker.record_success()
+        self.breaker.check()
+        self.assertIsNone(self.breaker.opened_at)
+
+    def test_failed_probe_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now += 30
+        self.breaker.check()
+        self.breaker.record_failure()
+        with self.assertRaises(CircuitOpen) as raised:
+            self.breaker.check()
+        self.assertEqual(raised.exception.wait, 30)
+
+    def test_stale_probe_expires(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now += 30
+        self.breaker.check()
+        self.now += 29
+        with self.assertRaises(CircuitOpen):
+            self.breaker.check()
+        self.now += 1
+        self.breaker.check()
+
+
+class BackoffTests(SimpleTestCase):
+    @override_settings(LLM_RETRY_BACKOFF=1, LLM_RETRY_BACKOFF_MAX=4)
+    def test_full_jitter_capped_and_honours_retry_after(self):
+        with mock.patch.object(gateway.random, "uniform", side_effect=lambda low, high: high) as uniform:
+            self.assertEqual(gateway.backoff_delay(1), 2)
+            uniform.assert_called_with(0, 2)
+            self.assertEqual(gateway.backoff_delay(5), 4)
+            self.assertEqual(gateway.backoff_delay(0, retry_after=3), 3)
+            self.assertEqual(gateway.backoff_delay(0, retry_after=60), 4)
+        for _ in range(20):
+            self.assertTrue(0 <= gateway.backoff_delay(1) <= 2)
+
+
+class RouterTests(SimpleTestCase):
+    routes = {"fast": {"model": "small", "min_score": 0}, "strong": {"model": "large", "min_score": 4}}
+
+    def user(self, text):
+        return [{"role": "system", "content": "prompt"}, {"role": "user", "content": text}]
+
+    def test_score(self):
+        self.assertEqual(router.score("generalchat", self.user("hi")), (0, []))
+        points, reasons = router.score(
+            "premiumchat", self.user("My claim was denied. Can I appeal? Is there a deadline?"), case_context=True
+        )
+        self.assertEqual(points, 6)
+        self.assertEqual(reasons, ["questions", "keywords", "premium", "case_context"])
+
+    def test_route_picks_highest_reached(self):
+        with self.settings(LLM_ROUTING=True, LLM_ROUTES=self.routes):
+            self.assertEqual(router.route("generalchat", self.user("hi")).model, "small")
+            self.assertEqual(router.route("premiumchat", self.user("denied claim appeal?"), True).model, "large")
+
+    def test_low_score_without_a_zero_route_uses_the_lowest(self):
+        routes = {"fast": {"model": "small", "min_score": 1}, "strong": {"model": "large", "min_score": 4}}
+        with self.settings(LLM_ROUTING=True, LLM_ROUTES=routes):
+            self.assertEqual(router.route("generalchat", self.user("hi")).name, "fast")
+
+
+class SSETests(SimpleTestCase):
+    def test_event_framing(self):
+        frame = sse.format_event("token", "two\nlines")
+        self.assertEqual(frame, 'event: token\ndata: "two\\nlines"\n\n')
+        self.assertEqual(frame.count("\n\n"), 1)
+
+    def test_error_renderer(self):
+        body = sse.EventStreamRenderer().render({"error": "failed"})
+        self.assertEqual(body, b'event: error\ndata: {"error": "failed"}\n\n')
+
+    def test_wants_stream(self):
+        factory = APIRequestFactory()
+
+        def request(path, **extra):
+            return Request(factory.post(path, {}, format="json", **extra), parsers=[JSONParser()])
+
+        self.assertTrue(sse.wants_stream(request("/?stream=1")))
+        self.assertTrue(sse.wants_stream(request("/", HTTP_ACCEPT="text/event-stream")))
+        self.assertFalse(sse.wants_stream(request("/?stream=0")))
+
+
+class SchedulerTests(SimpleTestCase):
+    def scheduler(self, rpm=60, tpm=6000, max_wait=5):
+        limits = {PRIORITY_PREMIUM: 10, 1: 10, PRIORITY_BACKGROUND: 10}
+        return AdmissionScheduler(rpm, tpm, limits, max_wait)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(per_minute=60)
+        bucket.take(60)
+        self.assertAlmostEqual(bucket.time_until(30), 30, delta=0.1)
+        # Requests larger than the whole budget wait for a full bucket, not forever.
+        self.assertAlmostEqual(bucket.time_until(500), 60, delta=0.1)
+
+    async def test_sheds_when_the_wait_exceeds_max_wait(self):
+        scheduler = self.scheduler(rpm=1, tpm=6000, max_wait=0.5)
+        await scheduler.acquire(PRIORITY_BACKGROUND, 10)
+        with self.assertRaises(Overloaded) as raised, self.assertLogs("llm.scheduler", "WARNING"):
+            await scheduler.acquire(PRIORITY_BACKGROUND, 10)
+        self.assertGreaterEqual(raised.exception.wait, 59)
+        self.assertEqual(scheduler.stats()["background"]["shed"], 1)
+
+    async def test_lower_priority_waits_for_higher(self):
+        scheduler = self.scheduler()
+        scheduler.waiting[PRIORITY_PREMIUM] = 1
+        background = asyncio.ensure_future(scheduler.acquire(PRIORITY_BACKGROUND, 10))
+        await asyncio.sleep(0.15)
+        self.assertFalse(background.done())
+        scheduler.waiting[PRIORITY_PREMIUM] = 0
+        await asyncio.wait_for(background, 1)
+        self.assertEqual(scheduler.stats()["background"]["admitted"], 1)
+
+
+class FlightTests(SimpleTestCase):
+    def flights(self):
+        return Flights(LocalFlightStore(), lock_ttl=1, grace=5)
+
+    async def test_leader_follower_and_done(self):
+        flights = self.flights()
+        key = flights.key("generalchat", 1, "hello")
+        state, token = await flights.claim(key)
+        self.assertEqual(state, LEADER)
+        self.assertEqual((await flights.claim(key))[0], FOLLOWER)
+
+        waiter = asyncio.ensure_future(flights.wait(key))
+        await flights.publish(key, token, {"ai_message": 2})
+        self.assertEqual(await waiter, {"ai_message": 2})
+        self.assertEqual(await flights.claim(key), (DONE, {"ai_message": 2}))
+
+    async def test_released_leader_fails_waiters_fast(self):
+        flights = self.flights()
+        key = flights.key("generalchat", 1, "hello")
+        _, token = await flights.claim(key)
+        await flights.release(key, token)
+        with self.assertRaises(ProviderUnavailable):
+            await flights.wait(key)
+        self.assertEqual((await flights.claim(key))[0], LEADER)
+
+    def test_keys_are_scoped_by_room(self):
+        flights = self.flights()
+        self.assertNotEqual(flights.key("generalchat", 1, "hi"), flights.key("generalchat", 2, "hi"))
+
+
+class UsageTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="usage@example.com", name="Usage", password="x")
+
+    async def test_successful_calls_defer_to_the_turn(self):
+        context = {"user_id": self.user.id, "deferred": []}
+        await usage.record(context, "gpt-4o-mini", prompt_tokens=10)
+        await usage.record(context, "gpt-4o-mini", error="timeout")
+        self.assertEqual(len(context["deferred"]), 1)
+        self.assertEqual(await LLMCall.objects.acount(), 1)
+
+    def test_rollup_day_is_idempotent_and_skips_cache_hits_in_latency(self):
+        LLMCall.objects.bulk_create([
+            LLMCall(user=self.user, model="m", prompt_tokens=5, completion_tokens=1, latency_ms=100),
+            LLMCall(user=self.user, model="m", prompt_tokens=5, completion_tokens=1, latency_ms=300, hedge_tokens=4),
+            LLMCall(user=self.user, model="m", cache_hit=True, latency_ms=1),
+            LLMCall(model="m", error="timeout", latency_ms=9000),
+        ])
+        day = timezone.localdate()
+        usage.rollup_day(day)
+        usage.rollup_day(day)
+
+        row = UserDailyUsage.objects.get(day=day, user=self.user)
+        self.assertEqual((row.calls, row.cache_hits, row.errors, row.prompt_tokens), (3, 1, 0, 10))
+        model = ModelDailyUsage.objects.get(day=day, model="m")
+        self.assertEqual((model.calls, model.errors, model.hedge_tokens), (4, 1, 4))
+        self.assertEqual((model.latency_p50_ms, model.latency_max_ms), (300, 300))
+
+
+class PromptTests(SimpleTestCase):
+    def test_case_type_matches_words(self):
+        self.assertEqual(prompts.case_type("Car crash on the highway"), "vehicle")
+        self.assertEqual(prompts.case_type("Accidente de trabajo"), "workplace")
+        self.assertIsNone(prompts.case_type("Scarf"))
+        self.assertIsNone(prompts.case_type(None))
+
+    def test_get_falls_back_to_defaults(self):
+        self.assertIs(prompts.get("generalchat", "fr"), prompts.get("generalchat", "en"))
+        self.assertIs(prompts.get("generalchat", "es", "vehicle"), prompts.get("generalchat", "es"))
+        self.assertEqual(prompts.get("premiumchat", "es", "medical").version, f"premiumchat/es/medical@{prompts.VERSION}")
+
+    def test_version_of_payload(self):
+        prompt = prompts.get("premiumchat", "en", "workplace")
+        payload = {"messages": [prompt.message(), {"role": "user", "content": "hi"}]}
+        self.assertEqual(prompts.version_of(payload), prompt.version)
+        self.assertEqual(prompts.version_of({"messages": [{"role": "system", "content": "custom"}]}), "")
+
+
+class HedgerTests(SimpleTestCase):
+    def hedger(self, **kwargs):
+        options = dict(enabled=True, percentile=90, budget=0.1, burst=1, min_delay=0.01,
+                       window=10, min_samples=3, fallback_model="fallback")
+        return Hedger(**{**options, **kwargs})
+
+    def test_delay_needs_samples_and_respects_minimum(self):
+        hedger = self.hedger()
+        self.assertIsNone(hedger.delay())
+        for seconds in (0.001, 0.002, 0.003):
+            hedger._observe(seconds)
+        self.assertEqual(hedger.delay(), 0.01)
+        hedger._observe(0.5)
+        self.assertEqual(hedger.delay(), 0.5)
+
+    async def test_slow_primary_loses_to_hedge(self):
+        hedger = self.hedger()
+        for _ in range(3):
+            hedger._observe(0.01)
+
+        async def attempt(payload, hedge):
+            await asyncio.sleep(0 if hedge else 1)
+            return payload["model"]
+
+        result, payload = await hedger.run({"model": "primary"}, attempt)
+        self.assertEqual((result, payload["model"]), ("fallback", "fallback"))
+        self.assertEqual(hedger.stats()["hedge_wins"], 1)
+
+        # The single burst token is spent, so the next slow call is not hedged.
+        hedger.min_delay = 0
+        hedger.latencies.clear()
+        for _ in range(3):
+            hedger._observe(0)
+
+        async def quick(payload, hedge):
+            await asyncio.sleep(0.01)
+            return payload["model"]
+
+        self.assertEqual((await hedger.run({"model": "primary"}, quick))[0], "primary")
+        self.assertEqual(hedger.stats()["budget_denied"], 1)
+
+    async def test_primary_error_surfaces_only_after_hedge_fails(self):
+        hedger = self.hedger()
+        for _ in range(3):
+            hedger._observe(0.01)
+
+        async def attempt(payload, hedge):
+            await asyncio.sleep(0.05)
+            raise ProviderUnavailable("hedge" if hedge else "primary")
+
+        with self.assertRaises(ProviderUnavailable):
+            await hedger.run({"model": "primary"}, attempt)
+
+
+@override_settings(REQUEST_DEADLINES={"default": 10, "chat": 60}, DEADLINE_MIN_TIMEOUT=0.5)
+class DeadlineTests(SimpleTestCase):
+    def run_in_request(self, view):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = deadlines.DeadlineMiddleware(get_response)
+        return middleware(RequestFactory().get("/"))
+
+    def test_outbound_outside_a_request_keeps_its_cap(self):
+        with deadlines.outbound("groq", 5) as seconds:
+            self.assertEqual(seconds, 5)
+
+    def test_outbound_is_cut_to_the_time_left(self):
+        def view(request):
+            deadlines.current().started -= 8
+            with deadlines.outbound("groq", 5) as seconds:
+                self.assertLessEqual(seconds, 2)
+            return HttpResponse()
+
+        response = self.run_in_request(view)
+        self.assertTrue(response["Server-Timing"].startswith("groq;dur="))
+
+    def test_view_deadline_class_picks_the_budget(self):
+        def view(request):
+            self.assertEqual(deadlines.current().budget, 60)
+            return HttpResponse()
+
+        view.cls = SimpleNamespace(deadline_class="chat")
+        self.assertNotIn("Server-Timing", self.run_in_request(view))
+
+    def test_timeout_errors_map_to_deadline_or_unavailable(self):
+        def view(request):
+            with self.assertRaises(DependencyUnavailable), self.assertLogs("AI_Powered_Insurance_App.deadlines", "WARNING"):
+                with deadlines.outbound("stripe", 5, timeout_errors=(TimeoutError,)):
+                    raise TimeoutError
+            deadlines.current().started -= 9.8
+            with self.assertRaises(DeadlineExceeded):
+                deadlines.timeout("stripe", 5)
+            return HttpResponse()
+
+        self.run_in_request(view)
+
+
+class TurnTests(TestCase):
+    async def test_turn_and_deferred_usage_saved_together(self):
+        user = await CustomUser.objects.acreate(email="turn@example.com", name="Turn")
+        room = await ChatRoom.objects.acreate(owner=user)
+        saved = await Message.objects.acreate(room=room, sender="user", content="earlier")
+        context = {"user_id": user.id, "deferred": []}
+        await usage.record(context, "m", prompt_tokens=3)
+
+        user_msg = Message(room=room, sender="user", content="hello there")
+        ai_msg = Message(room=room, sender="ai", content="Hi!")
+        await save_turn([saved, user_msg, ai_msg], context)
+
+        self.assertIsNotNone(ai_msg.pk)
+        self.assertEqual(user_msg.token_count, history.estimate_tokens("hello there"))
+        self.assertNotIn("deferred", context)
+        self.assertEqual(await LLMCall.objects.filter(user=user).acount(), 1)
+        room = await ChatRoom.objects.aget(pk=room.pk)
+        self.assertEqual((room.message_count, room.last_message_preview), (3, "Hi!"))
+        self.assertEqual(await room.messages.acount(), 3)
+
+
+@override_settings(LLM_PREWARM_URL="")
+class ClientTests(SimpleTestCase):
+    async def test_one_client_per_loop_until_closed(self):
+        first = client.get_client()
+        self.assertIs(client.get_client(), first)
+        await client.close_clients()
+        self.assertTrue(first.is_closed)
+        second = client.get_client()
+        self.assertIsNot(second, first)
+        await client.close_clients()
+
+    @override_settings(LLM_PREWARM_URL="http://llm.test/models")
+    async def test_warm_up_opens_the_client_the_requests_use(self):
+        with mock.patch.object(client, "prewarm", mock.AsyncMock()) as prewarm:
+            await client.warm_up()
+            warmed = prewarm.await_args.args[0]
+            self.assertIs(client.get_client(), warmed)
+        # get_client() found the warm client, so it did not warm another.
+        self.assertEqual(prewarm.call_count, 1)
+        await client.close_clients()
+
+
+class ExportCommandTests(TestCase):
+    def test_rooms_are_exported_one_after_another_in_id_order(self):
+        user = CustomUser.objects.create_user(email="export-all@example.com", name="Export", password="x")
+        rooms = [ChatRoom.objects.create(owner=user) for _ in range(2)]
+        # Interleaved ids, so a global id order would mix the rooms.
+        for i in range(4):
+            for room in rooms:
+                Message.objects.add_messages([Message(room=room, sender="user", content=f"{room.pk}-{i}")])
+        with self.settings(CHAT_ARCHIVE_KEEP_RECENT=2):
+            for room in rooms:
+                archive_room("generalchat", room.pk, timezone.now() + timedelta(days=1))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "export.ndjson")
+            call_command("export_messages", "generalchat", "--user", str(user.pk), "-o", path)
+            with open(path) as f:
+                exported = [json.loads(line) for line in f]
+        self.assertEqual(
+            [row["content"] for row in exported],
+            [f"{room.pk}-{i}" for room in rooms for i in range(4)],
+        )
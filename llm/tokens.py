@@ -0,0 +1,4 @@
+def estimate_tokens(text):
+    # Llama-family tokenizers average roughly four characters per token on
+    # English/Spanish prose, which is close enough for budgeting.
+    return max(1, len(text) // 4)
@@ -0,0 +1,23 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from .models import LLMCall
+
+
+async def save_turn(messages, context=None):
+    """
+    Persist a chat turn in one short transaction, after the LLM call is
+    over: the turn's unsaved messages go through their manager's
+    add_messages(), together with any usage rows deferred in `context`.
+    """
+    return await sync_to_async(_save_turn)(messages, context or {})
+
+
+def _save_turn(messages, context):
+    new = [m for m in messages if m.pk is None]
+    usage_rows = context.pop("deferred", [])
+    with transaction.atomic():
+        if new:
+            type(new[0]).objects.add_messages(new)
+        if usage_rows:
+            LLMCall.objects.bulk_create(usage_rows)
+    return messages
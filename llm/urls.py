@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import LLMStatsView, ModelUsageView, ReplyJobView, UserUsageView
+
+urlpatterns = [
+    path('stats/', LLMStatsView.as_view(), name='llm-stats'),
+    path('jobs/<uuid:pk>/', ReplyJobView.as_view(), name='llm-reply-job'),
+    path('usage/', UserUsageView.as_view(), name='llm-usage'),
+    path('usage/models/', ModelUsageView.as_view(), name='llm-usage-models'),
+]
@@ -0,0 +1,145 @@
+"""Per-call usage ledger (LLMCall) and the daily rollups the usage endpoints read."""
+import logging
+import time
+from datetime import datetime, time as dt_time, timedelta
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from .models import LLMCall, ModelDailyUsage, UserDailyUsage
+from .quotas import quotas
+from .scheduler import estimate_request_tokens
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class CallRecord:
+    """
+    Collects what one gateway call did. `context` attributes the call:
+    {"app_label", "room_id", "user_id"}, all optional, plus "deferred"
+    (see record()).
+    """
+
+    def __init__(self, payload, context=None, streamed=False):
+        self.payload = payload
+        self.model = payload.get("model", "")
+        self.route = ""
+        self.context = context or {}
+        self.streamed = streamed
+        self.started = time.monotonic()
+        self.first_token_at = None
+        self.attempts = 0
+        self.hedge_tokens = 0
+        self.usage = {}
+        self.text = ""
+        self.error = ""
+
+    def token(self, delta):
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+        self.text += delta
+
+    async def save(self):
+        usage = self.usage
+        if not usage and not self.error:
+            # Providers that leave out usage are billed at our own estimate.
+            usage = {
+                "prompt_tokens": estimate_request_tokens({**self.payload, "max_tokens": 0}),
+                "completion_tokens": estimate_tokens(self.text),
+            }
+        ttft = self.first_token_at - self.started if self.first_token_at else None
+        await record(
+            self.context,
+            self.model,
+            route=self.route,
+            streamed=self.streamed,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            latency=time.monotonic() - self.started,
+            ttft=ttft,
+            attempts=self.attempts,
+            hedge_tokens=self.hedge_tokens,
+            error=self.error,
+        )
+        await quotas.charge_tokens(
+            self.context.get("user_id"), usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+        )
+
+
+async def record(context, model, *, route="", streamed=False, prompt_tokens=0, completion_tokens=0,
+                 latency=0, ttft=None, attempts=0, hedge_tokens=0, cache_hit=False, error=""):
+    """
+    Append a ledger row. Successful calls whose context carries a "deferred"
+    list are queued there instead, to be written with the chat turn they
+    produced (see llm.turns.save_turn).
+    """
+    context = context or {}
+    row = LLMCall(
+        user_id=context.get("user_id"),
+        app_label=context.get("app_label", ""),
+        room_id=context.get("room_id"),
+        model=model,
+        route=route,
+        streamed=streamed,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency_ms=round(latency * 1000),
+        ttft_ms=round(ttft * 1000) if ttft is not None else None,
+        attempts=attempts,
+        hedge_tokens=hedge_tokens,
+        cache_hit=cache_hit,
+        error=error,
+    )
+    if not error and context.get("deferred") is not None:
+        context["deferred"].append(row)
+        return
+    try:
+        await row.asave()
+    except DatabaseError:
+        # The ledger is for reporting; never fail a chat turn over it.
+        logger.exception("Could not record LLM usage")
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def rollup_day(day):
+    """(Re)build the per-user and per-model rollups for `day`; safe to run repeatedly."""
+    start = timezone.make_aware(datetime.combine(day, dt_time.min))
+    calls = LLMCall.objects.filter(created_at__gte=start, created_at__lt=start + timedelta(days=1))
+    totals = dict(
+        calls=Count("id"),
+        cache_hits=Count("id", filter=Q(cache_hit=True)),
+        errors=Count("id", filter=~Q(error="")),
+        prompt_tokens=Sum("prompt_tokens"),
+        completion_tokens=Sum("completion_tokens"),
+    )
+
+    with transaction.atomic():
+        UserDailyUsage.objects.filter(day=day).delete()
+        UserDailyUsage.objects.bulk_create([
+            UserDailyUsage(day=day, **row)
+            for row in calls.exclude(user=None).values("user_id").annotate(**totals).order_by()
+        ])
+
+        ModelDailyUsage.objects.filter(day=day).delete()
+        rows = []
+        for row in calls.values("model").annotate(**totals, hedge_tokens=Sum("hedge_tokens")).order_by():
+            # Cache hits never reach the provider, so they stay out of latency.
+            upstream = calls.filter(model=row["model"], cache_hit=False, error="")
+            latencies = list(upstream.values_list("latency_ms", flat=True))
+            ttfts = list(upstream.exclude(ttft_ms=None).values_list("ttft_ms", flat=True))
+            rows.append(ModelDailyUsage(
+                day=day,
+                latency_p50_ms=_percentile(latencies, 0.5) or 0,
+                latency_p95_ms=_percentile(latencies, 0.95) or 0,
+                latency_max_ms=max(latencies, default=0),
+                ttft_p50_ms=_percentile(ttfts, 0.5),
+                ttft_p95_ms=_percentile(ttfts, 0.95),
+                **row,
+            ))
+        ModelDailyUsage.objects.bulk_create(rows)
@@ -0,0 +1,6 @@
+def request_flag(request, name):
+    """Read a boolean option from the query string or the request body."""
+    flag = request.query_params.get(name, request.data.get(name, False))
+    if isinstance(flag, str):
+        flag = flag.lower() in ("1", "true", "yes")
+    return bool(flag)
@@ -0,0 +1,185 @@
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
+from . import jobs
+from .cache import response_cache
+from .exceptions import LLMError
+from .hedging import hedger
+from .models import ModelDailyUsage, ReplyJob, UserDailyUsage
+from .quotas import quotas
+from .serializers import ModelDailyUsageSerializer, ReplyJobSerializer, UserDailyUsageSerializer
+from .scheduler import scheduler
+from .singleflight import LEADER, flights
+from .sse import EventStreamRenderer, event_stream, format_event, wants_stream
+from .utils import request_flag
+
+class LLMStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "scheduler": scheduler.stats(),
+            "response_cache": response_cache.stats(),
+            "hedging": hedger.stats(),
+        }, status=status.HTTP_200_OK)
+
+class ReplyJobView(RetrieveAPIView):
+    serializer_class = ReplyJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ReplyJob.objects.filter(user=self.request.user)
+
+class UsageDaysMixin:
+    """Limit rollup rows to the last ?days= days (default 30, at most a year)."""
+    default_days = 30
+    max_days = 366
+
+    def since(self):
+        try:
+            days = int(self.request.query_params.get("days", self.default_days))
+        except ValueError:
+            days = self.default_days
+        return timezone.localdate() - timedelta(days=max(1, min(days, self.max_days)) - 1)
+
+class UserUsageView(UsageDaysMixin, ListAPIView):
+    serializer_class = UserDailyUsageSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UserDailyUsage.objects.filter(user=self.request.user, day__gte=self.since()).order_by("-day")
+
+class ModelUsageView(UsageDaysMixin, ListAPIView):
+    serializer_class = ModelDailyUsageSerializer
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        return ModelDailyUsage.objects.filter(day__gte=self.since()).order_by("-day", "model")
+
+class SendMessageMixin:
+    """
+    The send_message action of a chat viewset. `chat` is the app's
+    ChatService, `reply_job` the Celery task that runs background turns and
+    `message_serializer_class` serializes its messages.
+    """
+    chat = None
+    reply_job = None
+    message_serializer_class = None
+
+    @action(
+        detail=True,
+        methods=["post"],
+        renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer],
+    )
+    async def send_message(self, request, pk=None):
+        chatroom = await self.aget_object()
+        user_text = request.data.get("message", "").strip()
+
+        if not user_text:
+            return Response({"error": "Message text is required"}, status=400)
+
+        self.quota = await quotas.consume(request.user)
+        if not self.quota.allowed:
+            return self.quota.apply(Response({"error": "Message quota exceeded"}, status=429))
+        try:
+            response = await self._send(request, chatroom, user_text)
+        except APIException as e:
+            # The message stays counted, so errors report the quota too.
+            response = self.handle_exception(e)
+        return self.quota.apply(response)
+
+    async def _send(self, request, chatroom, user_text):
+        if request_flag(request, "background"):
+            return await self._queue_turn(request, chatroom, user_text)
+
+        flight_key = flights.key(
+            self.chat.app_label, chatroom.pk, user_text, request.headers.get("Idempotency-Key")
+        )
+        state, flight = await flights.claim(flight_key)
+
+        if state != LEADER:
+            # An identical request for this room is in flight or just
+            # finished: share its turn instead of writing a duplicate. The
+            # owner's quota was charged for that turn already, not again.
+            self.quota = await quotas.refund(request.user, self.quota)
+            user_msg, ai_msg = await self.chat.load_turn(flight or await flights.wait(flight_key))
+            if wants_stream(request):
+                return event_stream(self._replay_turn(user_msg, ai_msg))
+            return await self.turn_response(request, chatroom, user_msg, ai_msg)
+
+        try:
+            return await self._run_turn(request, chatroom, user_text, flight_key, flight)
+        except BaseException:
+            await flights.release(flight_key, flight)
+            raise
+
+    async def _queue_turn(self, request, chatroom, user_text):
+        user_msg = await self.chat.message_model.objects.acreate(
+            room=chatroom,
+            sender="user",
+            content=user_text
+        )
+        job = await jobs.enqueue(self.reply_job, request.user, self.chat.app_label, user_msg)
+        return Response(
+            {
+                **ReplyJobSerializer(job).data,
+                "user_message": self.message_serializer_class(user_msg).data
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    async def _run_turn(self, request, chatroom, user_text, flight_key, flight):
+        # Saved together with the reply once it is complete, so a failed
+        # call leaves no orphan user message behind.
+        user_msg = self.chat.message_model(room=chatroom, sender="user", content=user_text)
+
+        payload = await self.chat.build_payload(chatroom, user_msg, request.user.language)
+        cache_key = self.chat.cache_key(payload, request.user.language)
+
+        if wants_stream(request):
+            return event_stream(self._stream_reply(chatroom, user_msg, payload, flight_key, flight, cache_key))
+
+        user_msg, ai_msg = await self.chat.complete_reply(chatroom, user_msg, payload, cache_key)
+
+        await flights.publish(flight_key, flight, {"user_message": user_msg.id, "ai_message": ai_msg.id})
+        return await self.turn_response(request, chatroom, user_msg, ai_msg)
+
+    async def turn_response(self, request, chatroom, user_msg, ai_msg):
+        return Response(
+            {
+                "user_message": self.message_serializer_class(user_msg).data,
+                "ai_message": self.message_serializer_class(ai_msg).data
+            },
+            status=200
+        )
+
+    async def _stream_reply(self, chatroom, user_msg, payload, flight_key, flight, cache_key=None):
+        published = False
+        try:
+            async for event, data in self.chat.stream_reply(chatroom, user_msg, payload, cache_key):
+                if event == "token":
+                    yield format_event("token", {"content": data})
+                    continue
+                if event == "ai_message":
+                    await flights.publish(flight_key, flight, {"user_message": user_msg.id, "ai_message": data.id})
+                    published = True
+                yield format_event(event, self.message_serializer_class(data).data)
+            yield format_event("done", {})
+        except LLMError as e:
+            yield format_event("error", e.detail)
+        finally:
+            if not published:
+                await flights.release(flight_key, flight)
+
+    async def _replay_turn(self, user_msg, ai_msg):
+        yield format_event("token", {"content": ai_msg.content})
+        yield format_event("user_message", self.message_serializer_class(user_msg).data)
+        yield format_event("ai_message", self.message_serializer_class(ai_msg).data)
+        yield format_event("done", {})
@@ -1,6 +1,10 @@
+from django.conf import settings
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 import datetime
+import httplib2
+from AI_Powered_Insurance_App.deadlines import DeadlineExceeded, DependencyUnavailable, outbound
 
 SERVICE_ACCOUNT_FILE = "credentials/google-play.json"
 PACKAGE_NAME = "com.yourapp"
@@ -11,19 +15,22 @@ def verify_android_purchase(purchase_token, product_id):
         scopes=['https://www.googleapis.com/auth/androidpublisher']
     )
 
-    service = build('androidpublisher', 'v3', credentials=credentials)
-    
     try:
-        result = service.purchases().products().get(
-            packageName=PACKAGE_NAME,
-            productId=product_id,
-            token=purchase_token
-        ).execute()
+        with outbound("google_play", settings.GOOGLE_PLAY_TIMEOUT, (TimeoutError, ConnectionError)) as timeout:
+            http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=timeout))
+            service = build('androidpublisher', 'v3', http=http)
+            result = service.purchases().products().get(
+                packageName=PACKAGE_NAME,
+                productId=product_id,
+                token=purchase_token
+            ).execute()
 
         if result.get("purchaseState") == 0:
             return {"valid": True, "expiry": None}
         else:
             return {"valid": False}
+    except (DeadlineExceeded, DependencyUnavailable):
+        raise
     except Exception:
         return {"valid": False}
     
@@ -5,6 +5,8 @@ from .serializers import IAPVerifySerializer
 from .utils import verify_android_purchase#, verify_ios_purchase
 
 class IAPVerifyView(APIView):
+    deadline_class = "payments"
+
     def post(self, request):
         serializer = IAPVerifySerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
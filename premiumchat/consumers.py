@@ -0,0 +1,7 @@
+from llm.consumers import ChatConsumer
+from .serializers import MessageSerializer
+from .services import chat
+
+class ChatRoomConsumer(ChatConsumer):
+    chat = chat
+    message_serializer_class = MessageSerializer
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from case.models import Case
+from premiumchat.models import CaseChunk
+from premiumchat import retrieval
+
+
+class Command(BaseCommand):
+    help = "Rebuild the premium chat retrieval index for existing cases, files and messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("case_ids", nargs="*", type=int, help="Only reindex these cases.")
+
+    def handle(self, *args, **options):
+        cases = Case.objects.all()
+        if options["case_ids"]:
+            cases = cases.filter(pk__in=options["case_ids"])
+
+        for case in cases.iterator():
+            retrieval.index_source(case.pk, CaseChunk.CASE, case.pk, retrieval.case_text(case))
+            for case_file in case.files.all():
+                retrieval.index_source(case.pk, CaseChunk.FILE, case_file.pk, retrieval.file_text(case_file))
+            for message in case.premium_messages.order_by("id").iterator():
+                retrieval.index_source(case.pk, CaseChunk.MESSAGE, message.pk, message.content)
+            self.stdout.write(f"Indexed case {case.pk}")
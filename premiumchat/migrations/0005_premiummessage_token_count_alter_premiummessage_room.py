@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('case', '0005_case_chat_summarized_through_case_chat_summary'),
+        ('premiumchat', '0004_premiummessage_delete_premiumchatmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='premiummessage',
+            name='token_count',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='premiummessage',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='premium_messages', to='case.case'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('case', '0005_case_chat_summarized_through_case_chat_summary'),
+        ('premiumchat', '0005_premiummessage_token_count_alter_premiummessage_room'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='premiummessage',
+            index=models.Index(fields=['room', 'id'], name='premiumchat_msg_room_id_idx'),
+        ),
+        migrations.AlterField(
+            model_name='premiummessage',
+            name='room',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='premium_messages', to='case.case'),
+        ),
+    ]
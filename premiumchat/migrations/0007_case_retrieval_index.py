@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('case', '0005_case_chat_summarized_through_case_chat_summary'),
+        ('premiumchat', '0006_alter_premiummessage_room_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('case', 'Case'), ('file', 'Case file'), ('message', 'Message')], max_length=10)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('text', models.TextField()),
+                ('length', models.PositiveIntegerField()),
+                ('case', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='case.case')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CaseTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('tf', models.PositiveIntegerField()),
+                ('case', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='case.case')),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='premiumchat.casechunk')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='casechunk',
+            index=models.Index(fields=['case', 'source', 'source_id'], name='premiumchat_chunk_source_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caseterm',
+            index=models.Index(fields=['case', 'term'], name='premiumchat_term_case_idx'),
+        ),
+    ]
@@ -1,9 +1,74 @@
-from django.db import models
+from django.db import models, transaction
 from users.models import CustomUser as User
 from case.models import Case
+from llm.history import estimate_tokens
+
+class PremiumMessageManager(models.Manager):
+    def add_messages(self, messages):
+        """Insert new messages with one bulk_create and index them for retrieval, in one transaction."""
+        from .retrieval import index_source
+
+        for m in messages:
+            if m.token_count is None:
+                m.token_count = estimate_tokens(m.content)
+        with transaction.atomic():
+            created = self.bulk_create(messages)
+            # bulk_create skips post_save, so index here instead of in signals.
+            for m in created:
+                index_source(m.room_id, CaseChunk.MESSAGE, m.pk, m.content)
+        return created
 
 class PremiumMessage(models.Model):
-    room = models.ForeignKey(Case, on_delete=models.CASCADE, related_name="premium_messages")
+    # Indexed through the (room, id) composite index below.
+    room = models.ForeignKey(Case, on_delete=models.CASCADE, related_name="premium_messages", db_index=False)
     sender = models.CharField(max_length=50)
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    timestamp = models.DateTimeField(auto_now_add=True)
+    token_count = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Registry version of the system prompt an ai reply was generated with.
+    prompt_version = models.CharField(max_length=64, blank=True, default="", editable=False)
+
+    objects = PremiumMessageManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["room", "id"], name="premiumchat_msg_room_id_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.token_count is None:
+            self.token_count = estimate_tokens(self.content)
+        super().save(*args, **kwargs)
+
+class CaseChunk(models.Model):
+    """A retrievable slice of case text, a case file or a chat turn."""
+    CASE = 'case'
+    FILE = 'file'
+    MESSAGE = 'message'
+    sources = (
+        (CASE, 'Case'),
+        (FILE, 'Case file'),
+        (MESSAGE, 'Message'),
+    )
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name="chunks", db_index=False)
+    source = models.CharField(max_length=10, choices=sources)
+    source_id = models.PositiveBigIntegerField()
+    text = models.TextField()
+    length = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["case", "source", "source_id"], name="premiumchat_chunk_source_idx"),
+        ]
+
+class CaseTerm(models.Model):
+    """Inverted-index posting: how often `term` occurs in `chunk`."""
+    chunk = models.ForeignKey(CaseChunk, on_delete=models.CASCADE, related_name="terms")
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name="+", db_index=False)
+    term = models.CharField(max_length=64)
+    tf = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["case", "term"], name="premiumchat_term_case_idx"),
+        ]
@@ -0,0 +1,132 @@
+"""
+Per-case BM25 retrieval over case details, uploaded file text and chat turns.
+
+Every source is split into chunks when it is written, and each chunk's term
+frequencies go into CaseTerm. That gives an inverted index per case in the
+database that grows with each write. A query only reads the postings for its
+own terms.
+"""
+import logging
+import math
+import os
+import re
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count
+from llm.tokens import estimate_tokens
+from .models import CaseChunk, CaseTerm
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.2
+B = 0.75
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 20
+TEXT_EXTENSIONS = {'.txt', '.md', '.csv', '.json', '.log', '.xml', '.html', '.htm'}
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i in is it its me my of on or our so that the their them
+they this to was we were what when where which who will with you your
+de del el en es la las lo los me mi por que se su un una y
+""".split())
+
+_word = re.compile(r"\w+", re.UNICODE)
+
+
+def terms(text):
+    return [w for w in _word.findall(text.lower()) if len(w) > 1 and w not in STOPWORDS]
+
+
+def chunk(text):
+    words = text.split()
+    step = CHUNK_WORDS - CHUNK_OVERLAP
+    for start in range(0, max(len(words) - CHUNK_OVERLAP, 1), step):
+        yield " ".join(words[start:start + CHUNK_WORDS])
+
+
+def index_source(case_id, source, source_id, text):
+    """(Re)index one source, replacing whatever was indexed for it before."""
+    with transaction.atomic():
+        remove_source(case_id, source, source_id)
+        for piece in chunk(text):
+            counts = Counter(t[:64] for t in terms(piece))
+            if not counts:
+                continue
+            row = CaseChunk.objects.create(
+                case_id=case_id,
+                source=source,
+                source_id=source_id,
+                text=piece,
+                length=sum(counts.values())
+            )
+            CaseTerm.objects.bulk_create([
+                CaseTerm(chunk=row, case_id=case_id, term=term, tf=tf) for term, tf in counts.items()
+            ])
+
+
+def remove_source(case_id, source, source_id):
+    CaseChunk.objects.filter(case_id=case_id, source=source, source_id=source_id).delete()
+
+
+def case_text(case):
+    return "\n".join(filter(None, [
+        f"Type of injury: {case.type_of_injury}",
+        f"Date of incident: {case.date_of_incident}",
+        case.description,
+    ]))
+
+
+def file_text(case_file):
+    """Text of an uploaded case file, or "" when it is not a text format we can read."""
+    if not case_file.file or os.path.splitext(case_file.file.name)[1].lower() not in TEXT_EXTENSIONS:
+        return ""
+    try:
+        with case_file.file.open("rb") as f:
+            data = f.read(settings.LLM_RETRIEVAL_MAX_FILE_BYTES)
+    except OSError as e:
+        logger.warning("Could not read case file %s for indexing: %s", case_file.pk, e)
+        return ""
+    return data.decode("utf-8", errors="ignore")
+
+
+def search(case_id, query, k=None, exclude_message_ids=()):
+    """Return the top-k chunks of the case for `query`, best first."""
+    k = k or settings.LLM_RETRIEVAL_TOP_K
+    query_terms = set(t[:64] for t in terms(query))
+    if not query_terms:
+        return []
+
+    stats = CaseChunk.objects.filter(case_id=case_id).aggregate(n=Count("id"), avgdl=Avg("length"))
+    if not stats["n"]:
+        return []
+
+    postings = CaseTerm.objects.filter(case_id=case_id, term__in=query_terms)
+    df = dict(postings.values_list("term").annotate(df=Count("id")).order_by())
+    idf = {t: math.log(1 + (stats["n"] - n + 0.5) / (n + 0.5)) for t, n in df.items()}
+
+    if exclude_message_ids:
+        postings = postings.exclude(chunk__source=CaseChunk.MESSAGE, chunk__source_id__in=exclude_message_ids)
+
+    scores = Counter()
+    for chunk_id, term, tf, length in postings.values_list("chunk_id", "term", "tf", "chunk__length"):
+        norm = K1 * (1 - B + B * length / stats["avgdl"])
+        scores[chunk_id] += idf[term] * tf * (K1 + 1) / (tf + norm)
+
+    top = [chunk_id for chunk_id, _ in scores.most_common(k)]
+    chunks = CaseChunk.objects.in_bulk(top)
+    return [chunks[chunk_id] for chunk_id in top]
+
+
+def context_message(chunks, budget):
+    """System message carrying as many retrieved chunks as fit in `budget` tokens."""
+    parts, used = [], 0
+    for c in chunks:
+        cost = estimate_tokens(c.text)
+        if used + cost > budget:
+            break
+        parts.append(f"[{c.get_source_display()}] {c.text}")
+        used += cost
+    if not parts:
+        return None
+    return {"role": "system", "content": "Relevant information from this case:\n" + "\n\n".join(parts)}
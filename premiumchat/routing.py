@@ -0,0 +1,6 @@
+from django.urls import path
+from .consumers import ChatRoomConsumer
+
+websocket_urlpatterns = [
+    path('ws/premiumchats/chatrooms/<int:pk>/', ChatRoomConsumer.as_asgi()),
+]
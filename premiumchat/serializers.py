@@ -14,4 +14,10 @@ class CaseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Case
         fields = ['id', 'type_of_injury', 'description', 'premium_messages']
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+class CaseDetailSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Case
+        fields = ['id', 'type_of_injury', 'description']
+        read_only_fields = ['id']
@@ -0,0 +1,83 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from llm import prompts, router
+from llm.chat import ChatService
+from llm.scheduler import PRIORITY_PREMIUM
+from llm.history import (
+    estimate_tokens, fold_history, load_history, schedule_summary_refresh, summary_message, to_chat_messages
+)
+from case.models import Case
+from .models import PremiumMessage
+from . import retrieval
+
+async def build_payload(chatroom, pending=None, language=None):
+    """
+    Assemble the prompt from the system prompt for `language` and the case
+    type, the case header, the case chunks most relevant to the latest turn,
+    the rolling summary and the recent turns. The new user message is either
+    already saved or passed unsaved as `pending`.
+    """
+    prompt = prompts.get("premiumchat", language, prompts.case_type(chatroom.type_of_injury))
+    header = {"role": "system", "content": case_header(chatroom)}
+    budget = (
+        settings.LLM_HISTORY_TOKEN_BUDGET - settings.LLM_RETRIEVAL_TOKEN_BUDGET
+        - estimate_tokens(prompt.text) - estimate_tokens(header["content"]) - estimate_tokens(chatroom.chat_summary)
+    )
+    if pending is not None:
+        budget -= estimate_tokens(pending.content)
+    window, fold_before = await load_history(chatroom.premium_messages.all(), chatroom.chat_summarized_through, budget)
+    if pending is not None:
+        window.append(pending)
+
+    if fold_before:
+        schedule_summary_refresh(("premiumchat", chatroom.pk), lambda: refresh_summary(chatroom, fold_before))
+
+    # The registry prompt stays first and byte-identical; per-case text follows it.
+    messages = [prompt.message(), header]
+    context = None
+    if window:
+        # Turns already in the window are not worth a second copy.
+        chunks = await sync_to_async(retrieval.search)(
+            chatroom.pk, window[-1].content, exclude_message_ids=[m.id for m in window if m.id]
+        )
+        context = retrieval.context_message(chunks, settings.LLM_RETRIEVAL_TOKEN_BUDGET)
+        if context:
+            messages.append(context)
+    if chatroom.chat_summary:
+        messages.append(summary_message(chatroom.chat_summary))
+    messages += to_chat_messages(window)
+
+    return {
+        "model": router.route("premiumchat", messages, case_context=bool(context)).model,
+        "messages": messages
+    }
+
+def case_header(case):
+    return f"The user's case: {case.type_of_injury}, incident on {case.date_of_incident}."
+
+async def refresh_summary(chatroom, before):
+    async def save(summary, from_id, to_id):
+        # Only advance from the state the summary was built on; a concurrent
+        # refresh that got there first wins.
+        return await Case.objects.filter(pk=chatroom.pk, chat_summarized_through=from_id).aupdate(
+            chat_summary=summary,
+            chat_summarized_through=to_id
+        )
+
+    await fold_history(
+        chatroom.premium_messages.all(), chatroom.chat_summary, chatroom.chat_summarized_through,
+        before, save, chat.usage_context(chatroom)
+    )
+
+class CaseChat(ChatService):
+    app_label = "premiumchat"
+    room_model = Case
+    message_model = PremiumMessage
+    owner_field = "user"
+    summary_fields = ("chat_summary", "chat_summarized_through")
+    priority = PRIORITY_PREMIUM
+
+    async def build_payload(self, chatroom, pending=None, language=None):
+        return await build_payload(chatroom, pending, language)
+
+chat = CaseChat()
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from case.models import Case, CaseFile
+from .models import CaseChunk, PremiumMessage
+from . import retrieval
+
+@receiver(post_save, sender=Case)
+def index_case(sender, instance, raw=False, **kwargs):
+    if not raw:
+        retrieval.index_source(instance.pk, CaseChunk.CASE, instance.pk, retrieval.case_text(instance))
+
+@receiver(post_save, sender=CaseFile)
+def index_case_file(sender, instance, raw=False, **kwargs):
+    if not raw:
+        retrieval.index_source(instance.case_id, CaseChunk.FILE, instance.pk, retrieval.file_text(instance))
+
+@receiver(post_delete, sender=CaseFile)
+def unindex_case_file(sender, instance, **kwargs):
+    retrieval.remove_source(instance.case_id, CaseChunk.FILE, instance.pk)
+
+@receiver(post_save, sender=PremiumMessage)
+def index_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        retrieval.index_source(instance.room_id, CaseChunk.MESSAGE, instance.pk, instance.content)
+
+@receiver(post_delete, sender=PremiumMessage)
+def unindex_message(sender, instance, **kwargs):
+    retrieval.remove_source(instance.room_id, CaseChunk.MESSAGE, instance.pk)
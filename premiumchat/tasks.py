@@ -0,0 +1,7 @@
+from celery import shared_task
+from llm import jobs
+from .services import chat
+
+@shared_task
+def complete_reply_job(job_id):
+    return jobs.run(job_id, chat.reply_to_job)
@@ -1,3 +1,85 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from case.models import Case, CaseFile
+from llm import gateway
+from llm import views as llm_views
+from llm.scheduler import PRIORITY_PREMIUM
+from llm.singleflight import Flights, LocalFlightStore
+from users.models import CustomUser
+from . import retrieval
+from .models import CaseChunk, PremiumMessage
 
-# Create your tests here.
+
+class ChunkingTests(SimpleTestCase):
+    def test_terms_drop_stopwords_and_single_letters(self):
+        self.assertEqual(retrieval.terms("The X-ray of my LEFT knee, y la rodilla"), ["ray", "left", "knee", "rodilla"])
+
+    def test_chunks_overlap(self):
+        words = [f"w{i}" for i in range(250)]
+        chunks = [c.split() for c in retrieval.chunk(" ".join(words))]
+        step = retrieval.CHUNK_WORDS - retrieval.CHUNK_OVERLAP
+        self.assertEqual([c[0] for c in chunks], [words[0], words[step], words[2 * step]])
+        self.assertEqual(chunks[0][-retrieval.CHUNK_OVERLAP:], chunks[1][:retrieval.CHUNK_OVERLAP])
+        self.assertEqual(chunks[-1][-1], words[-1])
+        self.assertEqual(list(retrieval.chunk("short text")), ["short text"])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email="retrieval@example.com", name="Retrieval", password="x")
+        self.case = Case.objects.create(
+            user=user, type_of_injury="whiplash", date_of_incident=datetime.date(2025, 3, 1),
+            description="Rear-ended at a red light on the highway.",
+        )
+        self.physio = PremiumMessage.objects.create(room=self.case, sender="user", content="Physiotherapy twice a week for my neck")
+        PremiumMessage.objects.create(room=self.case, sender="user", content="The other driver's insurer called about the highway crash")
+
+    def test_ranks_the_matching_chunk_first(self):
+        [best, *_] = retrieval.search(self.case.pk, "how much physiotherapy for the neck?")
+        self.assertEqual((best.source, best.source_id), (CaseChunk.MESSAGE, self.physio.pk))
+
+    def test_excluded_messages_and_unknown_terms(self):
+        chunks = retrieval.search(self.case.pk, "physiotherapy", exclude_message_ids=[self.physio.pk])
+        self.assertEqual(chunks, [])
+        self.assertEqual(retrieval.search(self.case.pk, "the of and"), [])
+
+    def test_deleted_message_is_unindexed(self):
+        self.physio.delete()
+        self.assertEqual(retrieval.search(self.case.pk, "physiotherapy"), [])
+
+    def test_file_without_a_stored_file_has_no_text(self):
+        self.assertEqual(retrieval.file_text(CaseFile(case=self.case)), "")
+
+    def test_context_message_respects_the_budget(self):
+        chunks = retrieval.search(self.case.pk, "highway physiotherapy neck")
+        message = retrieval.context_message(chunks, budget=12)
+        self.assertEqual(message["content"].count("\n\n"), 0)
+        self.assertIsNone(retrieval.context_message(chunks, budget=0))
+
+
+class SendMessageTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="premium@example.com", name="Premium", password="x")
+        self.case = Case.objects.create(user=self.user, type_of_injury="car crash", date_of_incident=datetime.date(2025, 3, 1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch.object(llm_views, "flights", Flights(LocalFlightStore(), lock_ttl=1, grace=5))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reply_runs_at_premium_priority_and_is_saved_on_the_case(self):
+        complete = mock.AsyncMock(return_value="Call the other driver's insurer.")
+        with mock.patch.object(gateway, "complete", complete):
+            response = self.client.post(
+                f"/api/premiumchats/chatrooms/{self.case.pk}/send_message/", {"message": "What now?"}, format="json"
+            )
+        body = response.json()
+        self.assertEqual(set(body), {"user_message", "ai_message"})
+        self.assertEqual(complete.await_args.kwargs["priority"], PRIORITY_PREMIUM)
+        self.assertEqual(complete.await_args.kwargs["context"]["user_id"], self.user.pk)
+        self.assertEqual(
+            list(self.case.premium_messages.values_list("sender", "content")),
+            [("user", "What now?"), ("ai", "Call the other driver's insurer.")],
+        )
@@ -1,92 +1,52 @@
-import os
-import requests
-from rest_framework import viewsets, permissions, status
+from adrf import viewsets
+from rest_framework import permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import PremiumMessage
-from case.models import Case
-from .serializers import CaseSerializer, MessageSerializer
-from django.conf import settings
-
-MODEL_NAME = "llama-3.1-8b-instant"
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_API_KEY = settings.GROQ_API_KEY
-
-HEADERS = {
-    "Authorization": f"Bearer {GROQ_API_KEY}",
-    "Content-Type": "application/json",
-}
-
-class ChatRoomViewSet(viewsets.ModelViewSet):
+from .serializers import CaseSerializer, CaseDetailSerializer, MessageSerializer
+from generalchat.export import FORMATS, chain_rows, export_response, message_rows
+from generalchat.pagination import MessageCursorPagination
+from .services import chat
+from .tasks import complete_reply_job
+from archive.store import ArchivedHistory, aarchived_rows
+from llm.utils import request_flag
+from llm.views import SendMessageMixin
+
+class ChatRoomViewSet(SendMessageMixin, viewsets.ModelViewSet):
     serializer_class = CaseSerializer
     permission_classes = [permissions.IsAuthenticated]
+    deadline_class = "chat"
+    chat = chat
+    reply_job = complete_reply_job
+    message_serializer_class = MessageSerializer
 
     def get_queryset(self):
-        return Case.objects.filter(user=self.request.user)
+        return self.chat.rooms(self.request.user)
+
+    def get_serializer_class(self):
+        if self.action == "retrieve":
+            return CaseDetailSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-    @action(detail=True, methods=["post"])
-    def send_message(self, request, pk=None):
+    @action(detail=True, methods=["get"])
+    def messages(self, request, pk=None):
         chatroom = self.get_object()
-        user_text = request.data.get("message", "").strip()
-
-        if not user_text:
-            return Response({"error": "Message text is required"}, status=400)
-
-        user_msg = PremiumMessage.objects.create(
-            room=chatroom,
-            sender="user",
-            content=user_text
-        )
+        paginator = MessageCursorPagination()
+        history = ArchivedHistory(chatroom.premium_messages.all(), "premiumchat", chatroom.pk)
+        page = paginator.paginate_queryset(history, request, view=self)
+        return paginator.get_paginated_response(MessageSerializer(page, many=True).data)
 
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": user_text}
-            ]
-        }
-
-        try:
-            resp = requests.post(GROQ_API_URL, headers=HEADERS, json=payload)
-        except Exception as e:
-            return Response(
-                {"error": "Failed to connect to Groq API", "details": str(e)},
-                status=500
-            )
-
-        if resp.status_code != 200:
-            return Response(
-                {
-                    "error": "Groq API returned an error",
-                    "status": resp.status_code,
-                    "details": resp.text
-                },
-                status=resp.status_code
-            )
-
-        data = resp.json()
-
-        try:
-            ai_text = data["choices"][0]["message"]["content"]
-        except Exception:
-            return Response(
-                {"error": "Invalid AI response format", "data": data},
-                status=500
-            )
-
-        ai_msg = PremiumMessage.objects.create(
-            room=chatroom,
-            sender="ai",
-            content=ai_text
+    @action(detail=True, methods=["get"])
+    def export(self, request, pk=None):
+        chatroom = self.get_object()
+        fmt = request.query_params.get("fmt", "ndjson")
+        if fmt not in FORMATS:
+            return Response({"error": f"fmt must be one of: {', '.join(FORMATS)}"}, status=400)
+        return export_response(
+            chain_rows(aarchived_rows("premiumchat", [chatroom.pk]), message_rows(chatroom.premium_messages.all())),
+            fmt,
+            request_flag(request, "gzip"),
+            f"premiumchat-{chatroom.pk}"
         )
-
-        return Response(
-            {
-                "user_message": MessageSerializer(user_msg).data,
-                "ai_message": MessageSerializer(ai_msg).data
-            },
-            status=200
-        )
\ No newline at end of file
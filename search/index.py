@@ -0,0 +1,35 @@
+"""Direct maintenance of the chat_search FTS5 table for rows the triggers don't see."""
+from django.db import connection
+
+APP_PARITY = {
+    "generalchat": 0,
+    "premiumchat": 1,
+}
+
+
+def rowid(app_label, message_id):
+    return 2 * message_id + APP_PARITY[app_label]
+
+
+def add(app_label, owner_id, rows):
+    """Index (id, room_id, sender, content, timestamp) rows, e.g. messages moved to the archive."""
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT OR REPLACE INTO chat_search (rowid, content, owner, app, room_id, sender, timestamp) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [
+                (
+                    rowid(app_label, id), content, f"u{owner_id}", app_label, room_id, sender,
+                    connection.ops.adapt_datetimefield_value(timestamp)
+                )
+                for id, room_id, sender, content, timestamp in rows
+            ]
+        )
+
+
+def remove(app_label, message_ids):
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "DELETE FROM chat_search WHERE rowid = %s",
+            [(rowid(app_label, id),) for id in message_ids]
+        )
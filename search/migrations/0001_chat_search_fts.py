@@ -0,0 +1,74 @@
+from django.db import migrations
+
+# One FTS5 index over both chat apps. Rowids are derived from the message id
+# (2 * id for general chat, 2 * id + 1 for premium chat) so triggers can
+# delete an entry without a lookup. The owner column holds a "u<user id>"
+# token, so a user's scope is part of the MATCH and no post-filter is needed.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE chat_search USING fts5(
+        content,
+        owner,
+        app UNINDEXED,
+        room_id UNINDEXED,
+        sender UNINDEXED,
+        timestamp UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER chat_search_general_ai AFTER INSERT ON generalchat_message BEGIN
+        INSERT INTO chat_search (rowid, content, owner, app, room_id, sender, timestamp)
+        SELECT 2 * new.id, new.content, 'u' || owner_id, 'generalchat', new.room_id, new.sender, new.timestamp
+        FROM generalchat_chatroom WHERE id = new.room_id;
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_general_ad AFTER DELETE ON generalchat_message BEGIN
+        DELETE FROM chat_search WHERE rowid = 2 * old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_premium_ai AFTER INSERT ON premiumchat_premiummessage BEGIN
+        INSERT INTO chat_search (rowid, content, owner, app, room_id, sender, timestamp)
+        SELECT 2 * new.id + 1, new.content, 'u' || user_id, 'premiumchat', new.room_id, new.sender, new.timestamp
+        FROM case_case WHERE id = new.room_id;
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_premium_ad AFTER DELETE ON premiumchat_premiummessage BEGIN
+        DELETE FROM chat_search WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+    """
+    INSERT INTO chat_search (rowid, content, owner, app, room_id, sender, timestamp)
+    SELECT 2 * m.id, m.content, 'u' || r.owner_id, 'generalchat', m.room_id, m.sender, m.timestamp
+    FROM generalchat_message m JOIN generalchat_chatroom r ON r.id = m.room_id
+    """,
+    """
+    INSERT INTO chat_search (rowid, content, owner, app, room_id, sender, timestamp)
+    SELECT 2 * m.id + 1, m.content, 'u' || c.user_id, 'premiumchat', m.room_id, m.sender, m.timestamp
+    FROM premiumchat_premiummessage m JOIN case_case c ON c.id = m.room_id
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS chat_search_general_ai",
+    "DROP TRIGGER IF EXISTS chat_search_general_ad",
+    "DROP TRIGGER IF EXISTS chat_search_premium_ai",
+    "DROP TRIGGER IF EXISTS chat_search_premium_ad",
+    "DROP TABLE IF EXISTS chat_search",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generalchat', '0007_chatroom_activity'),
+        ('premiumchat', '0007_case_retrieval_index'),
+        ('case', '0005_case_chat_summarized_through_case_chat_summary'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
@@ -0,0 +1,82 @@
+import re
+from datetime import timezone as dt_timezone
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.html import escape
+
+# Private-use markers survive FTS5 snippet() untouched and are swapped for
+# <mark> after the surrounding text has been HTML-escaped.
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_END = "\ue001"
+SNIPPET_TOKENS = 16
+
+_word = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(query, user_id):
+    """
+    FTS5 MATCH expression for free text `query`, scoped to the user's rooms.
+    Every word is quoted so user input is never parsed as FTS5 syntax; the
+    last one is a prefix match so results keep up with typing.
+    """
+    words = _word.findall(query)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return f'owner:u{user_id} AND content:({" ".join(terms)})'
+
+
+def parse_timestamp(value):
+    # Trigger-copied values skip Django's converters; sqlite stores naive UTC.
+    parsed = parse_datetime(value)
+    if parsed is not None and settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def highlight(snippet):
+    return escape(snippet).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+
+
+def search_messages(user_id, query, limit, after=None):
+    """
+    Return up to `limit` hits, best first, as dicts with a `position` that
+    can be passed back as `after` to continue from that hit.
+    """
+    expression = match_expression(query, user_id)
+    if expression is None:
+        return []
+
+    score = "bm25(chat_search, 1.0, 0.0)"
+    sql = (
+        f"SELECT rowid, app, room_id, sender, timestamp, {score}, "
+        f"snippet(chat_search, 0, %s, %s, %s, %s) "
+        f"FROM chat_search WHERE chat_search MATCH %s"
+    )
+    params = [HIGHLIGHT_START, HIGHLIGHT_END, "\u2026", SNIPPET_TOKENS, expression]
+    if after is not None:
+        sql += f" AND ({score} > %s OR ({score} = %s AND rowid > %s))"
+        params += [after[0], after[0], after[1]]
+    sql += f" ORDER BY {score}, rowid LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [
+        {
+            "app": app,
+            "room": room_id,
+            "message": rowid // 2,
+            "sender": sender,
+            "timestamp": parse_timestamp(timestamp),
+            "snippet": highlight(snippet),
+            "score": score,
+            "position": (score, rowid),
+        }
+        for rowid, app, room_id, sender, timestamp, score, snippet in rows
+    ]
@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase, TestCase
+from generalchat.models import ChatRoom, Message
+from users.models import CustomUser
+from .query import match_expression, search_messages
+
+
+class MatchExpressionTests(SimpleTestCase):
+    def test_words_are_quoted_and_last_is_a_prefix(self):
+        self.assertEqual(match_expression('deduct OR "x" NEAR(', 7), 'owner:u7 AND content:("deduct" "OR" "x" "NEAR"*)')
+        self.assertIsNone(match_expression("?!", 7))
+
+
+class SearchMessagesTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="search@example.com", name="Search", password="x")
+        other = CustomUser.objects.create_user(email="other@example.com", name="Other", password="x")
+        room = ChatRoom.objects.create(owner=self.user)
+        for text in ("My <b>deductible</b> is 500", "deductible deductible waived?", "nothing relevant"):
+            Message.objects.create(room=room, sender="user", content=text)
+        Message.objects.create(room=ChatRoom.objects.create(owner=other), sender="user", content="deductible")
+
+    def test_scoped_to_owner_and_highlighted(self):
+        hits = search_messages(self.user.pk, "deduct", 10)
+        self.assertEqual(len(hits), 2)
+        self.assertTrue(all(hit["room"] for hit in hits))
+        snippet = next(hit["snippet"] for hit in hits if "500" in hit["snippet"])
+        self.assertIn("&lt;b&gt;<mark>deductible</mark>&lt;/b&gt;", snippet)
+
+    def test_positions_page_through_results(self):
+        first, second = search_messages(self.user.pk, "deductible", 10)
+        self.assertEqual(search_messages(self.user.pk, "deductible", 1, after=first["position"])[0]["message"], second["message"])
+        self.assertEqual(search_messages(self.user.pk, "deductible", 1, after=second["position"]), [])
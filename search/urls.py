@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import MessageSearchView
+
+urlpatterns = [
+    path('messages/', MessageSearchView.as_view(), name='message-search'),
+]
@@ -0,0 +1,24 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from .pagination import SearchCursorPagination
+from .query import search_messages
+
+class MessageSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "Query parameter q is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchCursorPagination()
+        page_size = paginator.get_page_size(request)
+        hits = search_messages(request.user.id, query, page_size + 1, paginator.decode_cursor(request))
+
+        next_position = hits[page_size - 1]["position"] if len(hits) > page_size else None
+        results = hits[:page_size]
+        for hit in results:
+            del hit["position"]
+        return paginator.get_paginated_response(request, results, next_position)
@@ -0,0 +1,29 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+jwt_authentication = JWTAuthentication()
+
+@database_sync_to_async
+def get_user_from_token(raw_token):
+    try:
+        validated_token = jwt_authentication.get_validated_token(raw_token)
+        return jwt_authentication.get_user(validated_token)
+    except (InvalidToken, AuthenticationFailed):
+        return AnonymousUser()
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Authenticates websocket connections from a `?token=` query param or a Bearer Authorization header."""
+
+    async def __call__(self, scope, receive, send):
+        raw_token = parse_qs(scope.get("query_string", b"").decode()).get("token", [None])[0]
+        if raw_token is None:
+            header = dict(scope.get("headers", [])).get(b"authorization", b"").decode()
+            if header.startswith("Bearer "):
+                raw_token = header[len("Bearer "):]
+
+        scope = dict(scope, user=await get_user_from_token(raw_token) if raw_token else AnonymousUser())
+        return await super().__call__(scope, receive, send)
@@ -1,5 +1,12 @@
+import smtplib
+from django.conf import settings
+from django.core import mail
+from google.auth.exceptions import TransportError
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
 from rest_framework.response import Response
 from django.utils.timezone import now
+from AI_Powered_Insurance_App.deadlines import outbound
 
 class ResponseMixin:
     def success_response(self, message, data=None, status_code=200):
@@ -18,4 +25,25 @@ class ResponseMixin:
             "message": message,
             "errors": data or {},
             "timestamp": now().isoformat()
-        }, status=status_code)
\ No newline at end of file
+        }, status=status_code)
+
+def send_mail(subject, message, from_email, recipient_list, **kwargs):
+    """django.core.mail.send_mail with the SMTP timeout cut to the request deadline."""
+    timeout_errors = (TimeoutError, ConnectionError, smtplib.SMTPServerDisconnected)
+    with outbound("smtp", settings.EMAIL_TIMEOUT, timeout_errors) as timeout:
+        connection = mail.get_connection(timeout=timeout)
+        return mail.send_mail(subject, message, from_email, recipient_list, connection=connection, **kwargs)
+
+class GoogleRequest(google_requests.Request):
+    """Transport for google.auth that applies a fixed timeout to every call."""
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+        return super().__call__(url, method=method, body=body, headers=headers, timeout=self.timeout, **kwargs)
+
+def verify_google_id_token(token):
+    """id_token.verify_oauth2_token, with the certificate fetch bounded by the request deadline."""
+    with outbound("google_auth", settings.GOOGLE_AUTH_TIMEOUT, (TransportError,)) as timeout:
+        return id_token.verify_oauth2_token(token, GoogleRequest(timeout))
@@ -1,16 +1,14 @@
 from rest_framework import status
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiResponse
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from google.auth.exceptions import GoogleAuthError
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.core.mail import send_mail
 from django.conf import settings
 from .models import CustomUser, EmailVerificationOTP, PasswordResetOTP
-from .utils import ResponseMixin
+from .utils import ResponseMixin, send_mail, verify_google_id_token
 from .serializers import (
     RegisterSerializer, LoginSerializer, CustomUserSerializer, EmailVerificationSerializer,
     ResendVerificationEmailSerializer,ForgotPasswordSerializer, ResetPasswordSerializer,
@@ -19,6 +17,7 @@ from .serializers import (
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
+    deadline_class = "auth"
     
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
@@ -57,7 +56,7 @@ class RegisterView(APIView):
                 return Response({
                     'error': 'Failed to send verification email. Please try again later.',
                     'details': str(e)
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                }, status=getattr(e, 'status_code', status.HTTP_500_INTERNAL_SERVER_ERROR))
             
             return Response({
                 'message': 'User registered successfully. Please check your email for the verification code.',
@@ -143,6 +142,7 @@ class VerifyEmailView(APIView):
 
 class ResendVerificationEmailView(APIView):
     permission_classes = [AllowAny]
+    deadline_class = "auth"
     
     def post(self, request):
         serializer = ResendVerificationEmailSerializer(data=request.data)
@@ -181,7 +181,7 @@ class ResendVerificationEmailView(APIView):
                 return Response({
                     'error': 'Failed to send verification email. Please try again later.',
                     'details': str(e)
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                }, status=getattr(e, 'status_code', status.HTTP_500_INTERNAL_SERVER_ERROR))
             
             return Response({
                 'message': 'Verification code sent successfully. Please check your email.'
@@ -191,6 +191,7 @@ class ResendVerificationEmailView(APIView):
 
 class ForgotPasswordView(APIView):
     permission_classes = [AllowAny]
+    deadline_class = "auth"
     
     def post(self, request):
         serializer = ForgotPasswordSerializer(data=request.data)
@@ -229,7 +230,7 @@ class ForgotPasswordView(APIView):
                 return Response({
                     'error': 'Failed to send password reset email. Please try again later.',
                     'details': str(e)
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                }, status=getattr(e, 'status_code', status.HTTP_500_INTERNAL_SERVER_ERROR))
             
             return Response({
                 'message': 'Password reset code sent to your email.'
@@ -283,6 +284,7 @@ class ResetPasswordView(APIView):
     
 class ResendResetPasswordEmailView(APIView):
     permission_classes = [AllowAny]
+    deadline_class = "auth"
     
     def post(self, request):
         serializer = ResendResetPasswordEmailSerializer(data=request.data)
@@ -321,7 +323,7 @@ class ResendResetPasswordEmailView(APIView):
                 return Response({
                     'error': 'Failed to send password reset email. Please try again later.',
                     'details': str(e)
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                }, status=getattr(e, 'status_code', status.HTTP_500_INTERNAL_SERVER_ERROR))
             
             return Response({
                 'message': 'Password reset code sent successfully. Please check your email.'
@@ -344,6 +346,7 @@ def generate_tokens_for_user(user):
  
 class GoogleLoginAPIView(ResponseMixin, APIView):
     permission_classes = [AllowAny]
+    deadline_class = "auth"
  
     @extend_schema(
         request=SocialLoginRequestSerializer,
@@ -401,10 +404,7 @@ class GoogleLoginAPIView(ResponseMixin, APIView):
             )
         token = serializer.validated_data['id_token']
         try:
-            idinfo = id_token.verify_oauth2_token(
-                token, 
-                google_requests.Request()
-            )
+            idinfo = verify_google_id_token(token)
 
             email = idinfo.get("email")
             name = idinfo.get("name", "")
@@ -445,6 +445,12 @@ class GoogleLoginAPIView(ResponseMixin, APIView):
                 data=tokens_data,
                 status_code=status.HTTP_200_OK
             )
+        except APIException as e:
+            return self.error_response(
+                message='Google token verification is unavailable',
+                data=e.detail,
+                status_code=e.status_code
+            )
         except GoogleAuthError as e:
             return self.error_response(
                 message='Invalid Google token',